@@ -1,6 +1,13 @@
 import streamlit as st
+from utils.startup_utils import PageTimer
+
+# Se crea antes de las importaciones pesadas para medirlas
+timer = PageTimer("app")
+
 from config.config import apply_custom_css, show_header
 
+timer.mark("imports")
+
 # Configuración inicial
 st.set_page_config(page_title="Churn Prediction Dashboard", layout="wide")
 apply_custom_css()
@@ -52,3 +59,5 @@ y anticipar el churn permite diseñar estrategias de retención más efectivas y
 ---
 Navega en el **menú lateral** para explorar las funcionalidades del dashboard.
 """)
+
+timer.finish()
@@ -1,4 +1,6 @@
 # Configuración del dashboard
+import os
+from pathlib import Path
 import streamlit as st
 
 # Configuración de la página
@@ -42,10 +44,130 @@ FORM_OPTIONS = {
 NUMERIC_RANGES = {
     'tenure': {'min': 0, 'max': 72, 'default': 12},
     'MonthlyCharges': {'min': 18.0, 'max': 120.0, 'default': 65.0},
-    'TotalCharges': {'min': 18.0, 'max': 8500.0, 'default': 1500.0},
+    'TotalCharges': {'min': 18.0, 'max': 9000.0, 'default': 1500.0},
     'MultipleServices': {'min': 0, 'max': 10, 'default': 3}
 }
 
+# Niveles de riesgo: umbrales de probabilidad de churn (límite inferior de cada nivel)
+RISK_LEVELS = {
+    'labels': ['BAJO', 'MEDIO', 'ALTO'],
+    'thresholds': [0.3, 0.6]
+}
+
+# Procesamiento por bloques de archivos grandes
+STREAMING_CONFIG = {
+    'chunk_size': 100_000,
+    'top_n': 10
+}
+
+# Exportación de resultados por bloques a archivos temporales
+# (directory None: directorio privado del proceso, creado con mkdtemp)
+EXPORT_CONFIG = {
+    'directory': None,
+    'chunk_rows': 100_000,
+    'compression': 'zstd',
+    'gzip_level': 6,
+    'max_age_seconds': 24 * 3600
+}
+
+# Scoring paralelo en varios procesos
+PARALLEL_CONFIG = {
+    'workers': os.cpu_count() or 1,
+    'partition_size': 250_000
+}
+
+# Servicio HTTP de scoring
+SERVICE_CONFIG = {
+    'host': '127.0.0.1',
+    'port': 8080,
+    'max_batch_size': 512,
+    'max_wait_ms': 5.0
+}
+
+# Caché de resultados de scoring masivo (memoria y desbordamiento a disco)
+RESULT_CACHE_CONFIG = {
+    'max_memory_bytes': 1 * 1024 ** 3,
+    'max_disk_bytes': 4 * 1024 ** 3
+}
+
+# Lotes puntuados disponibles para Insights y Monitoreo
+BATCH_STORE_CONFIG = {
+    'max_batches': 5
+}
+
+# Límites de los gráficos: acotan el tamaño del JSON enviado al navegador
+CHART_CONFIG = {
+    'max_bins': 100,
+    'max_categories': 30
+}
+
+# Scoring en sombra de los modelos challenger del registro
+SHADOW_CONFIG = {
+    'enabled': True,
+    'histogram_bins': 10
+}
+
+# Desempeño real: predicciones registradas y resultados observados
+PERFORMANCE_CONFIG = {
+    'directory': Path(__file__).parent.parent.parent / 'logs' / 'performance',
+    'score_bins': 100,
+    'threshold': 0.5,
+    'rolling_days': 7,
+    # Partes del índice de pendientes que se acumulan antes de compactarlo al registrar
+    'max_pending_parts': 64
+}
+
+# Drift de datos frente a los histogramas de referencia del entrenamiento
+DRIFT_CONFIG = {
+    'numeric_bins': 20,
+    'epsilon': 1e-4,
+    'psi_warning': 0.1,
+    'psi_alert': 0.25,
+    'heatmap_batches': 30
+}
+
+# Resúmenes diarios combinables del tráfico puntuado
+SKETCH_CONFIG = {
+    'directory': Path(__file__).parent.parent.parent / 'logs' / 'sketches',
+    'quantile_bins': 256,
+    'segment_columns': ['Contract', 'InternetService', 'tenure_group'],
+    'windows': [7, 30, 90, 365]
+}
+
+# Detectores de cambios en series diarias (CUSUM y Page-Hinkley sobre valores
+# estandarizados con los primeros días; ADWIN sobre valores en [0, 1])
+CHANGEPOINT_CONFIG = {
+    'warmup': 14,
+    'min_std': 1e-6,
+    'cusum_k': 0.5,
+    'cusum_h': 7.0,
+    'ph_delta': 0.5,
+    'ph_lambda': 8.0,
+    'adwin_delta': 0.002,
+    'adwin_max_buckets': 5,
+    'adwin_min_window': 5,
+    'max_changes': 50,
+    # Métricas de desempeño: días desde el scoring hasta dar las etiquetas por
+    # completas y resultados mínimos para evaluar un día
+    'label_delay_days': 30,
+    'min_labels': 50
+}
+
+# Motivos de riesgo por cliente: contribuciones del modelo lineal, por bloques de filas
+EXPLAIN_CONFIG = {
+    'top_k': 3,
+    'block_rows': 1_000_000
+}
+
+# Versión del dashboard (se registra junto a los tiempos de arranque)
+APP_VERSION = "1.1.0"
+
+# Arranque: precarga en segundo plano y registro de tiempos por página
+STARTUP_CONFIG = {
+    'prewarm': os.environ.get('CHURN_DASHBOARD_PREWARM', '1') != '0',
+    'log_timings': True
+}
+
 # Textos para el dashboard
 TEXTS = {
     'app_title': '📊 Predictor de Churn - Telco Customer',
@@ -1,4 +1,9 @@
 import streamlit as st
+from utils.startup_utils import PageTimer
+
+# Se crea antes de las importaciones pesadas para medirlas
+timer = PageTimer("01_inicio")
+
 import pandas as pd
 from utils.dashboard_utils import get_dashboard_metrics, get_risk_factors
 from utils.plot_utils import (
@@ -9,6 +14,8 @@ from utils.plot_utils import (
 )
 from config.config import apply_custom_css
 
+timer.mark("imports")
+
 # Configuración inicial
 st.set_page_config(page_title="Home | Churn Dashboard", layout="wide")
 apply_custom_css()
@@ -99,3 +106,5 @@ without_model = [180, 185, 190, 195, 200, 205]
 with_model = [180, 160, 145, 130, 115, 100]
 fig_line = plot_churn_reduction(months, without_model, with_model)
 st.plotly_chart(fig_line, use_container_width=True)
+
+timer.finish()
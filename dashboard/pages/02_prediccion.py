@@ -1,16 +1,26 @@
 import streamlit as st
-import pandas as pd
+from utils.startup_utils import PageTimer
+
+# Se crea antes de las importaciones pesadas para medirlas
+timer = PageTimer("02_prediccion")
+
 from utils.model_utils import (
     load_model_components, preprocess_input, predict_churn, interpret_prediction, validate_input_data
 )
 from config.config import FORM_OPTIONS, NUMERIC_RANGES, apply_custom_css, show_header
 from utils.translations import translate_dataframe, translate_options, reverse_translate
 from utils.prediction_utils import build_input_dataframe
+from utils.explain_utils import get_reason_explainer
+
+timer.mark("imports")
 
 st.set_page_config(page_title="Predicción | Churn Dashboard", layout="wide")
 apply_custom_css()
 
 model, categorical_columns, feature_names, ohe = load_model_components()
+# Con un modelo lineal las contribuciones por variable explican la predicción
+explainer = get_reason_explainer()
+timer.mark("model")
 
 st.title("Predicción individual de churn")
 st.markdown(
@@ -164,6 +174,21 @@ if submitted:
                 }[interpretation['risk_level']]
             )
 
+            if explainer is not None:
+                contributions = explainer.explain_row(input_data)
+                drivers = contributions[contributions["Contribucion"] > 0].head(explainer.top_k)
+                st.write("### Principales motivos de riesgo:")
+                if drivers.empty:
+                    st.info("Ninguna variable aumenta el riesgo de este cliente.")
+                else:
+                    for _, driver in drivers.iterrows():
+                        st.markdown(f"- **{driver['Variable']}**: {driver['Valor']} "
+                                    f"(+{driver['Contribucion']:.2f} en el logit frente al cliente medio)")
+                with st.expander("Contribución de cada variable frente al cliente medio de entrenamiento"):
+                    st.dataframe(contributions.round(4), use_container_width=True)
+
             st.write("### Datos del cliente analizado:")
             st.dataframe(translate_dataframe(input_data),
                          use_container_width=True)
+
+timer.finish()
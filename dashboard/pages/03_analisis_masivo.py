@@ -1,20 +1,52 @@
 import streamlit as st
+from utils.startup_utils import PageTimer
+
+# Se crea antes de las importaciones pesadas para medirlas
+timer = PageTimer("03_analisis_masivo")
+
 import pandas as pd
-import io
-import plotly.express as px
-from utils.model_utils import load_model_components, preprocess_input, predict_churn
-from utils.translations import translate_dataframe
-from config.config import apply_custom_css
+from pathlib import Path
+from utils.model_utils import load_model_components
+from utils.registry_utils import get_model_registry
+from utils.cache_utils import get_result_cache, content_digest, result_cache_key
+from utils.chart_utils import category_bar_figure
+from utils.ingestion_utils import ID_COLUMN, UPLOAD_TYPES, read_upload
+from utils.validation_utils import split_valid_rows
+from utils.export_utils import EXPORT_FORMATS, export_file_name, export_results, new_export_path
+from utils.store_utils import publish_session_batch
+from utils.performance_utils import get_performance_store, log_results
+from utils.drift_utils import append_drift_record, drift_record, get_reference_profile
+from utils.sketch_utils import get_sketch_store
+from utils.scoring_utils import build_scoring_kernel, score_raw_data
+from utils.explain_utils import ReasonExplainer, reason_columns, with_reasons
+from utils.streaming_utils import stream_score_csv
+from utils.parallel_utils import get_parallel_scorer, benchmark_scaling
+from utils.simulation_utils import simulate_policy
+from utils.translations import translate_dataframe, translation_dict, value_translation
+from config.config import DRIFT_CONFIG, FORM_OPTIONS, RISK_LEVELS, STREAMING_CONFIG, PARALLEL_CONFIG, apply_custom_css
 from utils.bulk_analysis_utils import (
     get_example_dataframe, validate_uploaded_dataframe,
-    add_predictions_and_risk_levels, classify_risk_level
+    add_predictions_and_risk_levels
 )
+timer.mark("imports")
+
 apply_custom_css()
 
 st.set_page_config(
     page_title="Análisis Masivo | Churn Dashboard", layout="wide")
 
-model, categorical_columns, feature_names, ohe = load_model_components()
+# El registro recarga el champion si se promovió otra versión
+registry = get_model_registry()
+registry.refresh()
+
+# Con el kernel lineal no hace falta deserializar los pickles del modelo
+kernel = registry.champion_kernel
+if kernel is not None:
+    model, categorical_columns, feature_names, ohe = (
+        None, kernel.categorical_columns, None, None)
+else:
+    model, categorical_columns, feature_names, ohe = load_model_components()
+timer.mark("model")
 
 st.title("Análisis masivo de clientes")
 
@@ -27,35 +59,230 @@ st.download_button(
     mime="text/csv"
 )
 
-st.markdown("Sube un archivo CSV con clientes para predecir churn en lote.")
-uploaded_file = st.file_uploader("Selecciona tu archivo CSV", type=["csv"])
+st.markdown("Sube un archivo CSV, Parquet o Feather con clientes para predecir churn en lote.")
+uploaded_file = st.file_uploader("Selecciona tu archivo", type=UPLOAD_TYPES)
+
+streaming_mode = st.toggle(
+    "Modo streaming (archivos grandes)",
+    help="Procesa el archivo por bloques: la memoria depende del tamaño de bloque, no del archivo."
+)
+if streaming_mode:
+    chunk_size = st.number_input(
+        "Filas por bloque", min_value=1_000, max_value=5_000_000,
+        value=STREAMING_CONFIG['chunk_size'], step=10_000)
+
+parallel_mode = st.toggle(
+    "Scoring paralelo (multinúcleo)",
+    help="Reparte el lote en particiones y las puntúa en varios procesos."
+)
+if parallel_mode:
+    col_workers, col_partition = st.columns(2)
+    workers = col_workers.number_input(
+        "Procesos", min_value=1, max_value=256,
+        value=PARALLEL_CONFIG['workers'], step=1)
+    partition_size = col_partition.number_input(
+        "Filas por partición", min_value=1_000, max_value=10_000_000,
+        value=PARALLEL_CONFIG['partition_size'], step=10_000)
+    if kernel is not None:
+        # Los procesos puntúan champion y challengers; el registro registra la sombra
+        def score_func(data):
+            pool = get_parallel_scorer()
+            return registry.score(data, parallel=lambda data_, bundle_dirs: pool.predict_proba(
+                data_, workers, partition_size, bundle_dirs))
+    else:
+        # Un solo pool por servidor; la partición se elige en cada llamada
+        def score_func(data):
+            return get_parallel_scorer().score(
+                data, workers, partition_size, registry.champion_version)
+elif kernel is not None:
+    # Champion y challengers en una sola pasada sobre las tablas de pesos plegadas
+    score_func = registry.score
+else:
+    def score_func(data):
+        return score_raw_data(
+            data, kernel, model, categorical_columns, feature_names, ohe)
+
+# Motivos de riesgo por cliente: solo con modelos lineales (contribuciones exactas)
+explain_kernel = kernel if kernel is not None else build_scoring_kernel(
+    model, categorical_columns, feature_names, ohe)
+explainer = ReasonExplainer(explain_kernel, get_reference_profile(registry.champion_version)) \
+    if explain_kernel is not None else None
+explained_score_func = with_reasons(score_func, explainer)
 
 if uploaded_file:
     try:
-        df_raw = pd.read_csv(uploaded_file)
-        st.success(f"Archivo cargado: {uploaded_file.name}")
-        st.write("Primeras filas del dataset:")
-        st.dataframe(translate_dataframe(df_raw.head()),
-                     use_container_width=True)
-
         required_cols = example_df.columns.tolist()
-        missing_cols = validate_uploaded_dataframe(df_raw, required_cols)
-        if missing_cols:
-            st.error(f"Faltan columnas: {missing_cols}")
-            st.stop()
+        # Un rerun o una nueva subida del mismo archivo reutilizan el resultado
+        result_cache = get_result_cache()
+        digests = st.session_state.setdefault("upload_digests", {})
+        if uploaded_file.file_id not in digests:
+            digests[uploaded_file.file_id] = content_digest(uploaded_file)
+        cache_key = result_cache_key(
+            digests[uploaded_file.file_id], registry.champion_version,
+            RISK_LEVELS['thresholds'], streaming=streaming_mode, validated=True,
+            explained=explainer is not None)
+        cached = result_cache.get(cache_key) \
+            if registry.champion_version is not None else None
+        if cached is not None and any(
+                cached.get(key) and not Path(cached[key]).exists()
+                for key in ("results_path", "quarantine_path")):
+            # Los archivos del resultado caducaron: se vuelve a puntuar
+            cached = None
+
+        scored_now = cached is None
+        reference_profile = get_reference_profile(registry.champion_version) if scored_now else None
+        if cached is not None:
+            st.success(f"Resultados recuperados de caché: {uploaded_file.name}")
+        elif streaming_mode:
+            progress = st.progress(0.0, text="Procesando archivo por bloques...")
+            # Los resultados quedan en un Parquet en disco; la descarga se genera a partir de él
+            output_path = new_export_path("parquet")
+            quarantine_path = new_export_path("csv", stem="cuarentena_churn")
+            aggregates = stream_score_csv(
+                uploaded_file,
+                explained_score_func,
+                required_cols,
+                output_path,
+                chunk_size=chunk_size,
+                name=uploaded_file.name,
+                output_format="parquet",
+                quarantine_path=quarantine_path,
+                reference_profile=reference_profile,
+                sketch_layout=get_sketch_store().layout,
+                progress_callback=lambda fraction, rows: progress.progress(
+                    fraction, text=f"{rows:,} filas procesadas")
+            )
+            progress.progress(1.0, text=f"{aggregates.total:,} filas procesadas")
+            st.success(f"Archivo procesado por bloques: {uploaded_file.name}")
+
+            cached = {
+                "total": aggregates.total,
+                "tier_counts": aggregates.tier_series(),
+                "top_clients": aggregates.top_clients,
+                "results_path": str(output_path),
+                "rejected": aggregates.rejected,
+                "reason_counts": aggregates.reason_counts,
+                "quarantine_path": str(quarantine_path) if aggregates.rejected else None,
+                "drift_counts": aggregates.drift_counts,
+                "sketch": aggregates.sketch
+            }
+        else:
+            # Lectura tipada: solo las columnas del modelo y el identificador
+            df_raw = read_upload(uploaded_file, required_cols, name=uploaded_file.name)
+            st.success(f"Archivo cargado: {uploaded_file.name}")
+
+            missing_cols = validate_uploaded_dataframe(df_raw, required_cols)
+            if missing_cols:
+                st.error(f"Faltan columnas: {missing_cols}")
+                st.stop()
+
+            # Las filas con valores fuera de dominio o rango van a cuarentena
+            df_raw, df_rejected, validation = split_valid_rows(df_raw, required_cols)
+            if df_raw.empty:
+                st.error("Ninguna fila superó la validación")
+                st.dataframe(validation.reason_counts().rename_axis("Motivo").reset_index())
+                st.stop()
+
+            scores = explained_score_func(df_raw)
+            if scores is None:
+                st.stop()
+
+            df_results = add_predictions_and_risk_levels(df_raw, scores)
 
-        df_processed = preprocess_input(
-            df_raw, categorical_columns, feature_names, ohe)
-        preds, probs = predict_churn(model, df_processed)
+            cached = {
+                "total": len(df_results),
+                "tier_counts": df_results["Nivel_Riesgo"].value_counts().reindex(
+                    RISK_LEVELS['labels'], fill_value=0),
+                "top_clients": df_results.nlargest(STREAMING_CONFIG['top_n'], "Probabilidad_Churn"),
+                "df_results": df_results,
+                "rejected": validation.rejected,
+                "reason_counts": validation.reason_counts(),
+                "quarantine_path": str(export_results(df_rejected, "csv", stem="cuarentena_churn"))
+                if len(df_rejected) else None,
+                "drift_counts": reference_profile.batch_counts(df_results)
+                if reference_profile is not None else None,
+                "sketch": get_sketch_store().layout.summarize(df_results)
+            }
 
-        df_results = add_predictions_and_risk_levels(
-            df_raw, preds, probs, classify_risk_level)
+        if scored_now:
+            # Drift de las variables de entrada frente al entrenamiento
+            drift_counts = cached.pop("drift_counts")
+            cached["drift"] = None if drift_counts is None else reference_profile.drift(drift_counts)
+
+            # Resumen del día para las ventanas de Monitoreo. El mismo archivo con el
+            # mismo modelo (otro modo, caché expirada o reinicio) ya se registró hoy:
+            # no se vuelve a sumar al día ni a los logs de drift y predicciones
+            batch_id = f"{digests[uploaded_file.file_id]}:{registry.champion_version}"
+            try:
+                first_time = get_sketch_store().add(cached.pop("sketch"), batch_id=batch_id)
+            except OSError:
+                first_time = True
+
+            if first_time:
+                if cached["drift"] is not None:
+                    append_drift_record(drift_record(
+                        cached["drift"], cached["total"], uploaded_file.name, registry.champion_version))
+
+                # Predicciones con customerID: Monitoreo las une después a los resultados observados
+                log_source = cached["results_path"] if streaming_mode else cached["df_results"]
+                try:
+                    logged = log_results(get_performance_store(), log_source, registry.champion_version)
+                except OSError:
+                    logged = 0
+                if logged:
+                    st.caption(f"{logged:,} predicciones registradas para el monitoreo de desempeño.")
+
+        if cached is not None and registry.champion_version is not None:
+            result_cache.put(cache_key, cached)
+
+        total = cached["total"]
+        tier_counts = cached["tier_counts"]
+        top_clients = cached["top_clients"]
+
+        if cached["rejected"]:
+            st.warning(f"{cached['rejected']:,} filas no superaron la validación y no se puntuaron.")
+            with st.expander("Filas en cuarentena"):
+                st.dataframe(cached["reason_counts"].rename_axis("Motivo").reset_index(),
+                             use_container_width=True)
+                with open(cached["quarantine_path"], "rb") as f:
+                    st.download_button(
+                        label="Descargar filas en cuarentena (CSV)",
+                        data=f,
+                        file_name="cuarentena_churn.csv",
+                        mime="text/csv"
+                    )
+
+        drift = cached.get("drift")
+        if drift is not None:
+            drifted = drift.index[drift["PSI"] >= DRIFT_CONFIG['psi_alert']].tolist()
+            if drifted:
+                st.warning(f"Distribución distinta a la de entrenamiento (PSI ≥ "
+                           f"{DRIFT_CONFIG['psi_alert']}): {', '.join(drifted)}")
+            with st.expander("Drift de datos frente al entrenamiento"):
+                st.caption("PSI de cada variable; KS en las numéricas y chi-cuadrado en las categóricas.")
+                st.dataframe(drift.sort_values("PSI", ascending=False).round(4),
+                             use_container_width=True)
+
+        if not streaming_mode:
+            df_results = cached["df_results"]
+            # Insights y Monitoreo leen el lote publicado sin volver a puntuar
+            publish_session_batch(
+                df_results, cache_key, uploaded_file.name, registry.champion_version)
+            st.write("Primeras filas del dataset:")
+            st.dataframe(translate_dataframe(df_results.head().drop(
+                columns=["Probabilidad_Churn", "Prediccion", "Nivel_Riesgo"] + reason_columns(),
+                errors="ignore")), use_container_width=True)
+
+            if parallel_mode:
+                with st.expander("Escalabilidad del scoring paralelo"):
+                    if st.button("Medir throughput de 1 a N procesos"):
+                        with st.spinner("Midiendo throughput..."):
+                            st.dataframe(benchmark_scaling(df_results[required_cols], worker_counts=sorted(
+                                {1, *range(2, workers + 1, 2), workers})), use_container_width=True)
 
         st.subheader("Resumen del análisis")
-        total = len(df_results)
-        altos = (df_results["Nivel_Riesgo"] == "ALTO").sum()
-        medios = (df_results["Nivel_Riesgo"] == "MEDIO").sum()
-        bajos = (df_results["Nivel_Riesgo"] == "BAJO").sum()
+        altos = tier_counts["ALTO"]
+        medios = tier_counts["MEDIO"]
 
         col1, col2, col3 = st.columns(3)
         col1.metric("Clientes en lote", total)
@@ -63,33 +290,101 @@ if uploaded_file:
         col3.metric("Riesgo MEDIO", medios, delta=f"{(medios/total)*100:.1f}%")
 
         st.subheader("Distribución por nivel de riesgo")
-        fig = px.histogram(
-            df_results,
+        tier_df = tier_counts.rename_axis("Nivel_Riesgo").reset_index(name="count")
+        fig = category_bar_figure(
+            tier_df,
             x="Nivel_Riesgo",
+            y="count",
             color="Nivel_Riesgo",
-            category_orders={"Nivel_Riesgo": ["BAJO", "MEDIO", "ALTO"]},
+            category_orders={"Nivel_Riesgo": RISK_LEVELS['labels']},
             title="Distribución de clientes por nivel de riesgo"
         )
         st.plotly_chart(fig, use_container_width=True)
 
-        st.subheader("Top 10 clientes ordenados por riesgo")
-        top_clients = df_results.sort_values(
-            by="Probabilidad_Churn", ascending=False).head(10)
+        st.subheader(f"Top {STREAMING_CONFIG['top_n']} clientes ordenados por riesgo")
+        id_cols = [ID_COLUMN] if ID_COLUMN in top_clients.columns else []
+        reason_cols = [col for col in reason_columns() if col in top_clients.columns]
         st.dataframe(
             translate_dataframe(
-                top_clients[["Probabilidad_Churn", "Nivel_Riesgo"] + required_cols]),
+                top_clients[["Probabilidad_Churn", "Nivel_Riesgo"] + reason_cols + id_cols + required_cols]),
             use_container_width=True
         )
 
         st.subheader("Descargar resultados")
-        buffer = io.BytesIO()
-        df_results.to_csv(buffer, index=False)
-        buffer.seek(0)
-        st.download_button(
-            label="Descargar CSV con resultados",
-            data=buffer,
-            file_name="predicciones_churn.csv",
-            mime="text/csv"
-        )
+        export_format = st.selectbox(
+            "Formato", list(EXPORT_FORMATS),
+            format_func=lambda fmt: EXPORT_FORMATS[fmt]["label"])
+        # El archivo solo se genera bajo demanda y se reutiliza en los reruns
+        export = st.session_state.get("export")
+        if st.button("Generar archivo de resultados"):
+            with st.spinner("Generando archivo..."):
+                export_path = export_results(
+                    cached.get("df_results", cached.get("results_path")), export_format)
+            if export is not None:
+                Path(export["path"]).unlink(missing_ok=True)
+            export = st.session_state["export"] = {
+                "key": (cache_key, export_format), "path": str(export_path)}
+        if export is not None and export["key"] == (cache_key, export_format) \
+                and Path(export["path"]).exists():
+            with open(export["path"], "rb") as f:
+                st.download_button(
+                    label=f"Descargar {EXPORT_FORMATS[export_format]['label']}",
+                    data=f,
+                    file_name=export_file_name(export_format),
+                    mime=EXPORT_FORMATS[export_format]["mime"]
+                )
+
+        if not streaming_mode:
+            st.subheader("Simulador de políticas (what-if)")
+            st.markdown(
+                "Aplica un cambio a los clientes que cumplan las condiciones y compara el riesgo antes y después.")
+            policy_cols = [col for col in FORM_OPTIONS if col in categorical_columns]
+
+            col_when, col_set = st.columns(2)
+            with col_when:
+                when_cols = st.multiselect(
+                    "Condiciones", policy_cols, default=["Contract", "PaymentMethod"],
+                    format_func=lambda c: translation_dict.get(c, c))
+                when = {col: st.multiselect(
+                    translation_dict.get(col, col), FORM_OPTIONS[col],
+                    format_func=lambda v: value_translation.get(v, v), key=f"when_{col}")
+                    for col in when_cols}
+            with col_set:
+                set_cols = st.multiselect(
+                    "Cambios", policy_cols, default=["Contract", "PaymentMethod"],
+                    format_func=lambda c: translation_dict.get(c, c))
+                changes = {col: st.selectbox(
+                    f"Nuevo valor de {translation_dict.get(col, col)}", FORM_OPTIONS[col],
+                    format_func=lambda v: value_translation.get(v, v), key=f"set_{col}")
+                    for col in set_cols}
+
+            if st.button("Simular política") and changes:
+                rules = [{"when": {col: values for col, values in when.items() if values},
+                          "set": changes}]
+                simulation = simulate_policy(
+                    df_results, rules, kernel=kernel, score_func=score_func)
+
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Clientes afectados", f"{simulation['affected_rows']:,}")
+                col2.metric("Churn esperado (clientes)",
+                            f"{simulation['expected_churn_after']:,.0f}",
+                            delta=f"{simulation['expected_churn_after'] - simulation['expected_churn_before']:,.0f}",
+                            delta_color="inverse")
+                col3.metric("Ingreso mensual en riesgo",
+                            f"${simulation['expected_loss_after']:,.0f}",
+                            delta=f"{simulation['expected_loss_after'] - simulation['expected_loss_before']:,.0f}",
+                            delta_color="inverse")
+
+                tiers_df = pd.DataFrame({
+                    "Antes": simulation["tier_counts_before"],
+                    "Después": simulation["tier_counts_after"]
+                }).rename_axis("Nivel_Riesgo").reset_index().melt(
+                    id_vars="Nivel_Riesgo", var_name="Escenario", value_name="Clientes")
+                fig_sim = category_bar_figure(
+                    tiers_df, x="Nivel_Riesgo", y="Clientes", color="Escenario",
+                    barmode="group", title="Clientes por nivel de riesgo antes y después")
+                st.plotly_chart(fig_sim, use_container_width=True)
     except Exception as e:
         st.error(f"Error procesando el archivo: {e}")
+
+timer.finish()
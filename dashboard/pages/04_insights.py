@@ -1,19 +1,22 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import plotly.express as px
-from pathlib import Path
+from utils.startup_utils import PageTimer
+
+# Se crea antes de las importaciones pesadas para medirlas
+timer = PageTimer("04_insights")
 
 from config.config import apply_custom_css, show_header
 from utils.model_utils import load_model_components, get_feature_importance
 from utils.translations import translate_dataframe, translate_features
+from utils.store_utils import select_batch
 from utils.insights_utils import (
-    load_fallback_dataset, get_analysis_dataframe,
+    get_analysis_dataframe, get_analysis_cube,
     map_columns, summarize_feature_importance,
     plot_feature_importance, plot_variable_distribution,
     plot_segment_comparison
 )
 
+timer.mark("imports")
+
 st.set_page_config(page_title="Insights | Churn Dashboard", layout="wide")
 apply_custom_css()
 
@@ -27,7 +30,9 @@ st.markdown(
 st.markdown("---")
 
 # Cargar datos y preparar DataFrames
-df = get_analysis_dataframe()
+batch_id = select_batch()
+df = get_analysis_dataframe(batch_id)
+cube = get_analysis_cube(batch_id)
 df_display = translate_dataframe(df)
 
 col_map, col_map_reverse = map_columns(df, df_display)
@@ -37,6 +42,7 @@ with st.expander("Dataset utilizado en los gráficos de esta vista"):
 
 # Cargar modelo e importancia de características
 model, categorical_columns, feature_names, ohe = load_model_components()
+timer.mark("model")
 feat_imp_df = get_feature_importance(model, feature_names)
 
 if feat_imp_df.empty:
@@ -60,8 +66,7 @@ st.markdown("---")
 
 # Sección 2: Exploración interactiva
 st.subheader("Exploración interactiva por variable")
-excluded_cols = {"Probabilidad_Churn", "Nivel_Riesgo"}
-eda_cols = [c for c in df_display.columns if c not in excluded_cols]
+eda_cols = [col_map.get(c, c) for c in cube.columns]
 
 default_idx = eda_cols.index(
     "Tipo de Contrato") if "Tipo de Contrato" in eda_cols else 0
@@ -69,7 +74,7 @@ selected_var = st.selectbox(
     "Selecciona una variable:", eda_cols, index=default_idx)
 selected_var_original = col_map_reverse.get(selected_var, selected_var)
 
-plot_variable_distribution(df, df_display, selected_var, selected_var_original)
+plot_variable_distribution(cube, selected_var, selected_var_original)
 st.markdown("---")
 
 # Sección 3: Segmentos clave
@@ -79,8 +84,10 @@ segment_cols = [c for c in ["Tipo de Contrato", "Método de Pago",
 
 if segment_cols:
     seg_col = st.selectbox("Segmento a comparar:", segment_cols)
-    plot_segment_comparison(df_display, seg_col)
+    plot_segment_comparison(cube, seg_col, col_map_reverse.get(seg_col, seg_col))
 else:
     st.warning("No se encontraron columnas de segmento clave.")
 
 st.markdown("---")
+
+timer.finish()
@@ -1,29 +1,60 @@
 import streamlit as st
+from utils.startup_utils import PageTimer
+
+# Se crea antes de las importaciones pesadas para medirlas
+timer = PageTimer("05_monitoreo")
+
 import pandas as pd
-import numpy as np
-from datetime import datetime
-import plotly.graph_objects as go
 
-from config.config import apply_custom_css, show_header
+from config.config import CHANGEPOINT_CONFIG, DRIFT_CONFIG, PERFORMANCE_CONFIG, RISK_LEVELS, SKETCH_CONFIG, apply_custom_css, show_header
 from utils.monitoring_utils import (
     simulate_metrics_data, calculate_drift,
-    plot_metrics_evolution
+    plot_metrics_evolution, plot_batch_score_distribution, plot_feature_drift_heatmap
 )
+from utils.drift_utils import load_drift_log
+from utils.sketch_utils import get_sketch_store
+from utils.changepoint_utils import detect_change_points, get_changepoint_monitor, score_series
+from utils.ingestion_utils import UPLOAD_TYPES
+from utils.performance_utils import METRIC_COLUMNS, get_performance_store, ingest_outcome_file
+from utils.store_utils import get_batch_store, select_batch
+from utils.startup_utils import load_startup_timings, summarize_startup_timings
+from utils.registry_utils import (
+    get_model_registry, load_shadow_log, summarize_shadow_log, promote_model
+)
+
+timer.mark("imports")
 
 # Configuración de página
 st.set_page_config(page_title="Monitoreo | Churn Dashboard", layout="wide")
 apply_custom_css()
 
 st.title("Monitoreo de métricas del modelo en el tiempo")
-st.warning(
-    "**Nota:** Los datos mostrados son *simulados* con fines demostrativos."
-)
-st.markdown("---")
+
+# Resultados observados: se unen a las predicciones registradas en Análisis masivo
+store = get_performance_store()
+with st.expander("Registrar resultados observados"):
+    st.markdown("Sube un archivo con `customerID` y `Churn` (Yes/No o 1/0) de clientes "
+                "puntuados anteriormente en Análisis masivo.")
+    outcome_file = st.file_uploader("Resultados observados", type=UPLOAD_TYPES)
+    if outcome_file is not None and st.button("Registrar resultados"):
+        try:
+            summary = ingest_outcome_file(store, outcome_file)
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            st.success(f"{summary['unidos']:,} de {summary['resultados']:,} resultados "
+                       "unidos a predicciones registradas.")
+            if summary["sin_prediccion"] or summary["no_validos"]:
+                st.caption(f"Sin predicción pendiente: {summary['sin_prediccion']:,} · "
+                           f"Etiqueta no reconocida: {summary['no_validos']:,}")
+    st.caption(f"Predicciones pendientes de resultado: {store.pending_count():,}")
 
 # Sidebar: configuración
 with st.sidebar:
     st.header("Configuración de monitoreo")
     window_days = st.slider("Ventana reciente (días)", 3, 30, 7, step=1)
+    rolling_days = st.slider("Ventana móvil de métricas (días)", 1, 30,
+                             PERFORMANCE_CONFIG['rolling_days'], step=1)
     st.markdown("**Umbrales mínimos aceptables**")
     thr_acc = st.number_input("Accuracy mín.", 0.0,
                               1.0, 0.75, 0.01, format="%.2f")
@@ -32,20 +63,45 @@ with st.sidebar:
     thr_f1 = st.number_input("F1 Score mín.", 0.0, 1.0,
                              0.62, 0.01, format="%.2f")
 
-# Datos simulados
-df_metrics = simulate_metrics_data()
-
-# Datos recientes según ventana
-df_recent = df_metrics.tail(window_days)
+changepoint_monitor = get_changepoint_monitor()
+counts = store.daily_counts()
+if counts.empty:
+    st.warning(
+        "**Nota:** Todavía no hay resultados observados unidos a predicciones. "
+        "Los datos mostrados son *simulados* con fines demostrativos."
+    )
+    df_metrics = simulate_metrics_data()
+    df_recent = df_metrics.tail(window_days)
+    change_points = detect_change_points(df_metrics[METRIC_COLUMNS])
+    last = df_metrics.iloc[-1]
+    if len(df_metrics) > window_days:
+        prev_mean = df_metrics.iloc[:-window_days].mean()
+    else:
+        prev_mean = df_metrics.mean()
+else:
+    # Métricas móviles por fecha de scoring a partir de los conteos diarios
+    df_metrics = counts.rolling_metrics(rolling_days)
+    window_start = df_metrics.index.max() - pd.Timedelta(days=window_days - 1)
+    df_recent = df_metrics[df_metrics.index >= window_start]
+    last = counts.window_metrics(start=window_start)
+    prev_mean = counts.window_metrics(end=window_start - pd.Timedelta(days=1))
+    if pd.isna(prev_mean["Accuracy"]):
+        prev_mean = last
+    # Los detectores consumen las métricas diarias (no las móviles) de los días
+    # cuyas etiquetas ya maduraron y con resultados suficientes
+    daily_metrics = counts.rolling_metrics(1)
+    changepoint_monitor.update(
+        {metric: daily_metrics[metric] for metric in METRIC_COLUMNS},
+        mature_until=pd.Timestamp.today().normalize() - pd.Timedelta(
+            days=CHANGEPOINT_CONFIG['label_delay_days']),
+        counts=daily_metrics["Clientes"])
+    change_points = changepoint_monitor.changes(METRIC_COLUMNS)
+    st.caption(f"{counts.total:,} predicciones con resultado observado. Métricas por "
+               f"fecha de scoring sobre ventanas móviles de {rolling_days} días.")
+st.markdown("---")
 
 # Mostrar KPIs
 st.subheader("Métricas recientes")
-last = df_metrics.iloc[-1]
-
-if len(df_metrics) > window_days:
-    prev_mean = df_metrics.iloc[:-window_days].mean()
-else:
-    prev_mean = df_metrics.mean()
 
 c1, c2, c3 = st.columns(3)
 c1.metric("Accuracy", f"{last['Accuracy']:.3f}",
@@ -57,7 +113,7 @@ c3.metric("F1 Score", f"{last['F1 Score']:.3f}",
 
 # Gráfico histórico
 st.subheader("Evolución histórica de métricas")
-plot_metrics_evolution(df_metrics, df_recent, thr_acc, thr_auc, thr_f1)
+plot_metrics_evolution(df_metrics, df_recent, thr_acc, thr_auc, thr_f1, change_points)
 
 # Detección de drift
 st.subheader("Detección de drift")
@@ -75,6 +131,21 @@ if drift_acc or drift_auc or drift_f1:
 else:
     st.success("No se detecta drift significativo en las métricas recientes.")
 
+# Cambios detectados online en métricas y en la distribución de scores por segmento
+sketch_store = get_sketch_store()
+changepoint_monitor.update(score_series(sketch_store))
+with st.expander("Cambios detectados (CUSUM, Page-Hinkley, ADWIN)"):
+    all_changes = changepoint_monitor.changes()
+    if counts.empty:
+        all_changes = pd.concat([change_points, all_changes], ignore_index=True)
+    if all_changes.empty:
+        st.info("No se han detectado cambios en las series monitorizadas.")
+    else:
+        st.caption("Series diarias de métricas y de scores por segmento; cada día se evalúa "
+                   "una vez cerrado y el estado de los detectores se conserva entre ejecuciones.")
+        st.dataframe(all_changes.sort_values("Fecha", ascending=False).head(50),
+                     use_container_width=True, hide_index=True)
+
 # Explicación drift
 with st.expander("¿Qué es drift y cómo monitorearlo?"):
     st.markdown(
@@ -89,3 +160,92 @@ with st.expander("¿Qué es drift y cómo monitorearlo?"):
         - Reentrenar cuando el desempeño caiga por debajo del umbral.
         """
     )
+
+# Drift de las variables de entrada: no necesita esperar a los resultados observados
+st.subheader("Drift de datos por variable")
+drift_log = load_drift_log(last=DRIFT_CONFIG['heatmap_batches'])
+if drift_log.empty:
+    st.info("Todavía no hay lotes analizados con drift registrado.")
+else:
+    st.caption(f"PSI frente a los histogramas de entrenamiento de los últimos "
+               f"{drift_log['timestamp'].nunique()} lotes: < {DRIFT_CONFIG['psi_warning']} estable, "
+               f"≥ {DRIFT_CONFIG['psi_alert']} cambio relevante.")
+    plot_feature_drift_heatmap(drift_log)
+
+# Tráfico puntuado: ventanas combinando los resúmenes diarios
+st.subheader("Tráfico puntuado por ventana")
+if not sketch_store.days():
+    st.info("Todavía no hay lotes analizados en Análisis masivo.")
+else:
+    col_window, col_segment = st.columns([1, 2])
+    sketch_days = col_window.radio("Días", SKETCH_CONFIG['windows'], horizontal=True)
+    segment = col_segment.selectbox("Segmento", sketch_store.layout.segments)
+    window = sketch_store.window(sketch_days, segment=segment)
+    if window.total == 0:
+        st.info("No hay clientes puntuados en esta ventana y segmento.")
+    else:
+        tiers = window.category_counts("Nivel_Riesgo")
+        cols = st.columns(len(RISK_LEVELS['labels']) + 1)
+        cols[0].metric("Clientes puntuados", f"{window.total:,}")
+        for col, tier in zip(cols[1:], RISK_LEVELS['labels']):
+            col.metric(f"Riesgo {tier}", f"{tiers[tier] / window.total:.1%}")
+        st.caption(f"{window.days} días con lotes en la ventana. Cuantiles aproximados "
+                   "a partir de histogramas diarios.")
+        st.dataframe(window.quantile_table().round(3), use_container_width=True)
+    st.markdown("---")
+
+# Lote analizado en Análisis masivo
+batch_id = select_batch("Lote a monitorear", allow_reference=False)
+if batch_id is not None:
+    st.subheader("Scores del último lote analizado")
+    batch_table = get_batch_store().get_table(batch_id)
+    tier_counts = {item["values"]: item["counts"]
+                   for item in batch_table["Nivel_Riesgo"].value_counts().to_pylist()}
+    cols = st.columns(len(RISK_LEVELS['labels']) + 1)
+    cols[0].metric("Clientes", f"{batch_table.num_rows:,}")
+    for col, tier in zip(cols[1:], RISK_LEVELS['labels']):
+        col.metric(f"Riesgo {tier}", f"{tier_counts.get(tier, 0):,}")
+    plot_batch_score_distribution(batch_table)
+    st.markdown("---")
+
+# Champion/challenger
+st.subheader("Modelos champion/challenger")
+registry = get_model_registry()
+registry.refresh()
+
+if not registry.versions:
+    st.info("No hay bundles de modelo disponibles para el registro.")
+else:
+    st.write(f"**Champion:** {registry.champion_version}")
+    challengers = registry.versions[1:]
+    if not challengers:
+        st.info("No hay challengers puntuando en sombra. Regístralos con "
+                "`python -m utils.registry_utils register`.")
+    else:
+        shadow_summary = summarize_shadow_log(load_shadow_log())
+        if not shadow_summary.empty:
+            shadow_summary = shadow_summary[shadow_summary.index.isin(registry.versions)]
+            st.caption("Scores en sombra sobre los mismos lotes que el champion "
+                       "(desacuerdo = predicción distinta a la del champion).")
+            st.dataframe(shadow_summary.rename(columns={
+                "rows": "Clientes", "lotes": "Lotes", "mean": "Prob. media",
+                "disagreement_rate": "Desacuerdo", "tier_disagreement_rate": "Desacuerdo de nivel",
+                "mean_abs_diff": "Dif. media abs."}), use_container_width=True)
+
+        col_version, col_button = st.columns([3, 1])
+        candidate = col_version.selectbox("Challenger a promover", challengers)
+        if col_button.button("Promover a champion"):
+            promote_model(candidate)
+            registry.refresh()
+            st.success(f"{candidate} es el nuevo champion.")
+
+# Tiempos de arranque del dashboard por versión
+with st.expander("Tiempos de arranque por página (ms)"):
+    startup_summary = summarize_startup_timings(load_startup_timings())
+    if startup_summary.empty:
+        st.info("Todavía no hay tiempos de arranque registrados.")
+    else:
+        st.caption("Mediana del primer render de cada página por proceso del servidor.")
+        st.dataframe(startup_summary, use_container_width=True)
+
+timer.finish()
@@ -0,0 +1,25 @@
+"""
+Arranca el dashboard con la precarga de cachés ya en marcha.
+
+Con `streamlit run app.py` la precarga empieza cuando la primera sesión
+ejecuta una página. Este lanzador la inicia en el mismo proceso antes de
+levantar el servidor, de modo que el modelo, el registro y el dataset de
+referencia se cargan mientras nadie ha abierto aún el dashboard.
+
+Uso (acepta las mismas opciones que streamlit run):
+    python dashboard/serve.py --server.port 8501
+"""
+import sys
+from pathlib import Path
+
+from streamlit.web import cli as stcli
+
+from utils.startup_utils import start_prewarm
+
+APP_PATH = Path(__file__).parent / "app.py"
+
+
+if __name__ == "__main__":
+    start_prewarm()
+    sys.argv = ["streamlit", "run", str(APP_PATH), *sys.argv[1:]]
+    sys.exit(stcli.main())
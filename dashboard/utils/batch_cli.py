@@ -0,0 +1,386 @@
+"""
+Scoring masivo de churn desde línea de comandos, pensado para jobs programados.
+
+Procesa el archivo por bloques y guarda un checkpoint tras cada bloque, de
+modo que un job interrumpido continúa desde el último bloque confirmado. En
+CSV el checkpoint guarda la posición en bytes del siguiente bloque y la
+reanudación empieza con un seek; en Parquet guarda el grupo de filas y la
+fila dentro del grupo, y la lectura empieza en ese grupo. En ambos casos no
+se vuelven a leer las filas procesadas.
+
+Uso (desde la carpeta dashboard/):
+    python -m utils.batch_cli clientes.csv --output predicciones.csv
+    python -m utils.batch_cli clientes.parquet --output predicciones.csv --chunk-size 500000
+"""
+import argparse
+import codecs
+import io
+import json
+import os
+import shutil
+import sys
+import time
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config.config import RISK_LEVELS, STREAMING_CONFIG
+from utils.bulk_analysis_utils import get_example_dataframe, validate_uploaded_dataframe
+from utils.model_utils import read_model_components
+from utils.bundle_utils import read_scoring_kernel
+from utils.scoring_utils import score_raw_data
+from utils.feature_utils import derive_features
+from utils.validation_utils import split_valid_rows
+
+STATE_FILE = "state.json"
+
+
+def read_csv_block(f, chunk_size: int) -> bytes:
+    """
+    Lee las siguientes chunk_size líneas de un CSV abierto en binario.
+
+    Si el bloque termina dentro de un campo entre comillas con saltos de
+    línea (número impar de comillas), se completa el registro.
+    """
+    block = b"".join(islice(f, chunk_size))
+    while block.count(b'"') % 2:
+        line = f.readline()
+        if not line:
+            break
+        block += line
+    return block
+
+
+def _next_row_group(group_rows: list, row_group: int, row: int) -> list:
+    # Normaliza la posición para que la fila caiga dentro de su grupo
+    while row_group < len(group_rows) and row >= group_rows[row_group]:
+        row -= group_rows[row_group]
+        row_group += 1
+    return [row_group, row]
+
+
+def iter_parquet_chunks(path: Path, chunk_size: int, skip_chunks: int = 0, position=None):
+    """
+    Itera sobre un Parquet en bloques de chunk_size filas a partir de una
+    posición [grupo de filas, fila dentro del grupo].
+
+    Los grupos anteriores a la posición no se leen (row_groups= de
+    iter_batches); solo se decodifican las filas ya procesadas del grupo en
+    curso. Sin posición (checkpoints antiguos) se calcula con los bloques
+    ya procesados y el número de filas de cada grupo en los metadatos.
+
+    Yields:
+        tuple: (DataFrame del bloque, posición [grupo, fila] tras el bloque)
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    metadata = parquet_file.metadata
+    group_rows = [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+    row_group, row = _next_row_group(
+        group_rows, *(position if position is not None else (0, skip_chunks * chunk_size)))
+    if row_group >= len(group_rows):
+        return
+
+    skip = row
+    pending, buffered = [], 0
+    for batch in parquet_file.iter_batches(batch_size=chunk_size,
+                                           row_groups=range(row_group, len(group_rows))):
+        if skip >= batch.num_rows:
+            skip -= batch.num_rows
+            continue
+        if skip:
+            batch, skip = batch.slice(skip), 0
+        pending.append(batch)
+        buffered += batch.num_rows
+        # Bloques de chunk_size filas aunque crucen el límite entre grupos
+        while buffered >= chunk_size:
+            table = pa.Table.from_batches(pending)
+            row_group, row = _next_row_group(group_rows, row_group, row + chunk_size)
+            yield table.slice(0, chunk_size).to_pandas(), [row_group, row]
+            rest = table.slice(chunk_size)
+            pending, buffered = rest.to_batches(), rest.num_rows
+    if buffered:
+        row_group, row = _next_row_group(group_rows, row_group, row + buffered)
+        yield pa.Table.from_batches(pending).to_pandas(), [row_group, row]
+
+
+def iter_input_chunks(path: Path, chunk_size: int, skip_chunks: int = 0, position=None, dtype=None):
+    """
+    Itera sobre el archivo de entrada (CSV o Parquet) en bloques de chunk_size filas.
+
+    Args:
+        path: Ruta del archivo de entrada
+        chunk_size: Filas por bloque
+        skip_chunks: Bloques ya procesados que se saltan
+        position: Posición del siguiente bloque guardada en el checkpoint (bytes
+            en CSV, [grupo de filas, fila] en Parquet); evita releer los saltados
+        dtype: Tipos de columnas para la lectura de CSV
+
+    Yields:
+        tuple: (DataFrame del bloque, posición tras el bloque)
+    """
+    if path.suffix.lower() == ".parquet":
+        yield from iter_parquet_chunks(path, chunk_size, skip_chunks, position)
+        return
+
+    with open(path, "rb") as f:
+        header = f.readline().removeprefix(codecs.BOM_UTF8)
+        if position is not None:
+            f.seek(position)
+        else:
+            # Checkpoint sin posición: se saltan los bloques leyendo líneas, sin analizarlas
+            for _ in range(skip_chunks):
+                read_csv_block(f, chunk_size)
+        while True:
+            block = read_csv_block(f, chunk_size)
+            if not block.strip():
+                return
+            yield pd.read_csv(io.BytesIO(header + block), dtype=dtype), f.tell()
+
+
+def input_signature(path: Path) -> dict:
+    """
+    Identifica el archivo de entrada para no reanudar sobre un archivo distinto.
+    """
+    stat = path.stat()
+    return {"path": str(path.resolve()), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def write_json_atomic(path: Path, data: dict):
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def load_state(checkpoint_dir: Path, signature: dict, chunk_size: int, restart: bool) -> dict:
+    """
+    Lee el checkpoint existente o crea uno nuevo.
+    """
+    state_path = checkpoint_dir / STATE_FILE
+    if state_path.exists() and not restart:
+        with open(state_path, encoding="utf-8") as f:
+            state = json.load(f)
+        if state["input"] != signature or state["chunk_size"] != chunk_size:
+            raise ValueError(
+                "El checkpoint corresponde a otro archivo o tamaño de bloque; usa --restart")
+        return state
+
+    if checkpoint_dir.exists():
+        shutil.rmtree(checkpoint_dir)
+    checkpoint_dir.mkdir(parents=True)
+    return {
+        "input": signature,
+        "chunk_size": chunk_size,
+        "columns": None,
+        "chunks_done": 0,
+        "rows_done": 0,
+        "position": None,
+        "tier_counts": [0] * len(RISK_LEVELS['labels']),
+        "probability_sum": 0.0,
+        "quarantine_columns": None,
+        "rows_rejected": 0,
+        "reason_counts": {}
+    }
+
+
+def merge_parts(checkpoint_dir: Path, chunks_done: int, columns: list, output_path: Path,
+                prefix="part"):
+    """
+    Une los bloques confirmados en el archivo de salida final.
+    """
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    with open(tmp_path, "wb") as out:
+        out.write((pd.DataFrame(columns=columns).to_csv(index=False)).encode("utf-8"))
+        for i in range(chunks_done):
+            with open(checkpoint_dir / f"{prefix}-{i:06d}.csv", "rb") as part:
+                shutil.copyfileobj(part, out)
+    os.replace(tmp_path, output_path)
+
+
+def write_part(df: pd.DataFrame, part_path: Path):
+    """
+    Escribe un bloque sin cabecera de forma atómica.
+    """
+    tmp_path = part_path.with_suffix(".tmp")
+    df.to_csv(tmp_path, header=False, index=False)
+    os.replace(tmp_path, part_path)
+
+
+def build_summary(state: dict, output_path: Path, elapsed: float, quarantine_path=None) -> dict:
+    total = state["rows_done"] - state["rows_rejected"]
+    tier_counts = dict(zip(RISK_LEVELS['labels'], state["tier_counts"]))
+    return {
+        "input": state["input"]["path"],
+        "output": str(output_path.resolve()),
+        "rows": total,
+        "tier_counts": tier_counts,
+        "tier_pct": {tier: (count / total if total else 0.0) for tier, count in tier_counts.items()},
+        "mean_probability": state["probability_sum"] / total if total else 0.0,
+        "rows_rejected": state["rows_rejected"],
+        "reason_counts": state["reason_counts"],
+        "quarantine": str(quarantine_path.resolve()) if quarantine_path else None,
+        "elapsed_seconds": elapsed
+    }
+
+
+def run_batch(input_path, output_path, checkpoint_dir=None, chunk_size=None,
+              workers=None, restart=False, keep_checkpoints=False) -> dict:
+    """
+    Puntúa un archivo completo por bloques con checkpoints.
+
+    Args:
+        input_path: Archivo CSV o Parquet con clientes
+        output_path: CSV con los resultados
+        checkpoint_dir: Carpeta de checkpoints (por defecto junto a la salida)
+        chunk_size: Filas por bloque
+        workers: Procesos para scoring paralelo (None = un solo proceso)
+        restart: Ignora un checkpoint existente
+        keep_checkpoints: Conserva los bloques al terminar
+
+    Returns:
+        dict con el resumen del scoring
+    """
+    start = time.perf_counter()
+    input_path, output_path = Path(input_path), Path(output_path)
+    chunk_size = chunk_size or STREAMING_CONFIG['chunk_size']
+    checkpoint_dir = Path(checkpoint_dir) if checkpoint_dir else \
+        output_path.with_name(output_path.name + ".checkpoint")
+
+    state = load_state(checkpoint_dir, input_signature(
+        input_path), chunk_size, restart)
+    if state["chunks_done"]:
+        print(f"Reanudando desde el bloque {state['chunks_done']} "
+              f"({state['rows_done']:,} filas ya procesadas)", file=sys.stderr)
+
+    required_cols = get_example_dataframe().columns.tolist()
+
+    # Con el bundle disponible no se cargan los pickles ni scikit-learn
+    kernel = read_scoring_kernel()
+    if kernel is not None:
+        model, categorical_columns, feature_names, ohe = (
+            None, kernel.categorical_columns, None, None)
+    else:
+        model, categorical_columns, feature_names, ohe = read_model_components()
+
+    if workers:
+        from utils.parallel_utils import ParallelScorer
+        scorer = ParallelScorer(workers=workers)
+        score_func = scorer.score
+    else:
+        scorer = None
+
+        def score_func(data):
+            return score_raw_data(data, kernel, model, categorical_columns, feature_names, ohe)
+
+    try:
+        chunks = iter_input_chunks(
+            input_path, chunk_size, skip_chunks=state["chunks_done"],
+            position=state.get("position", state.get("byte_offset")),
+            dtype={col: "category" for col in categorical_columns})
+        for chunk, position in chunks:
+            # Las exportaciones crudas llegan sin tenure_group ni MultipleServices
+            chunk = derive_features(chunk)
+            missing_cols = validate_uploaded_dataframe(chunk, required_cols)
+            if missing_cols:
+                raise ValueError(f"Faltan columnas: {missing_cols}")
+
+            # Las filas inválidas no se puntúan: van al archivo de cuarentena
+            rows_read = len(chunk)
+            chunk, rejected, validation = split_valid_rows(chunk, required_cols)
+
+            # Cada bloque se escribe completo antes de confirmarlo en el checkpoint
+            part_path = checkpoint_dir / f"part-{state['chunks_done']:06d}.csv"
+            quarantine_part = checkpoint_dir / f"quarantine-{state['chunks_done']:06d}.csv"
+            write_part(rejected, quarantine_part)
+
+            if len(chunk):
+                scores = score_func(chunk)
+                if scores is None:
+                    raise ValueError(
+                        f"No se pudo puntuar el bloque {state['chunks_done'] + 1}")
+                chunk_results = chunk.assign(
+                    **{col: scores[col].to_numpy() for col in scores.columns})
+                write_part(chunk_results, part_path)
+
+                codes = scores["Nivel_Riesgo"].cat.codes.to_numpy()
+                state["columns"] = chunk_results.columns.tolist()
+                state["tier_counts"] = (np.asarray(state["tier_counts"]) + np.bincount(
+                    codes, minlength=len(RISK_LEVELS['labels']))).tolist()
+                state["probability_sum"] += float(scores["Probabilidad_Churn"].sum())
+            else:
+                write_part(chunk, part_path)
+
+            if validation.rejected:
+                state["quarantine_columns"] = rejected.columns.tolist()
+                for reason, count in validation.reason_counts().items():
+                    state["reason_counts"][reason] = state["reason_counts"].get(reason, 0) + int(count)
+            state["rows_rejected"] += validation.rejected
+            state["rows_done"] += rows_read
+            state["chunks_done"] += 1
+            state["position"] = position
+            write_json_atomic(checkpoint_dir / STATE_FILE, state)
+
+            print(f"Bloque {state['chunks_done']}: {state['rows_done']:,} filas procesadas",
+                  file=sys.stderr)
+    finally:
+        if scorer is not None:
+            scorer.close()
+
+    if not state["rows_done"]:
+        raise ValueError("El archivo no contiene clientes")
+    if state["columns"] is None:
+        raise ValueError("Ninguna fila superó la validación")
+
+    merge_parts(checkpoint_dir, state["chunks_done"],
+                state["columns"], output_path)
+    quarantine_path = None
+    if state["rows_rejected"]:
+        quarantine_path = output_path.with_name(output_path.name + ".quarantine.csv")
+        merge_parts(checkpoint_dir, state["chunks_done"], state["quarantine_columns"],
+                    quarantine_path, prefix="quarantine")
+    summary = build_summary(state, output_path, time.perf_counter() - start, quarantine_path)
+    write_json_atomic(output_path.with_name(
+        output_path.name + ".summary.json"), summary)
+
+    if not keep_checkpoints:
+        shutil.rmtree(checkpoint_dir)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Scoring masivo de churn con checkpoints por bloque.")
+    parser.add_argument("input", help="Archivo CSV o Parquet con clientes")
+    parser.add_argument("--output", required=True,
+                        help="CSV de salida con las predicciones")
+    parser.add_argument("--checkpoint-dir",
+                        help="Carpeta de checkpoints (por defecto <output>.checkpoint)")
+    parser.add_argument("--chunk-size", type=int,
+                        default=STREAMING_CONFIG['chunk_size'], help="Filas por bloque")
+    parser.add_argument("--workers", type=int,
+                        help="Procesos para scoring paralelo")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignora el checkpoint existente y empieza de cero")
+    parser.add_argument("--keep-checkpoints", action="store_true",
+                        help="Conserva los bloques al terminar")
+    args = parser.parse_args(argv)
+
+    try:
+        summary = run_batch(args.input, args.output, args.checkpoint_dir, args.chunk_size,
+                            args.workers, args.restart, args.keep_checkpoints)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
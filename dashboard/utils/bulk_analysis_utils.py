@@ -1,9 +1,6 @@
 import pandas as pd
 
 
-import pandas as pd
-
-
 def get_example_dataframe() -> pd.DataFrame:
     data = [
         ["Female", 0, "Yes", "No", 5, "Yes", "No", "Fiber optic", "No", "No", "No", "No",
@@ -16,7 +13,7 @@ def get_example_dataframe() -> pd.DataFrame:
          "No internet service", "No internet service", "No internet service", "No internet service",
          "Month-to-month", "Yes", "Electronic check", 20.0, 60.0, "0-6", 0],
         ["Female", 0, "Yes", "Yes", 48, "Yes", "Yes", "Fiber optic", "Yes", "Yes", "Yes", "Yes",
-         "Yes", "Yes", "Two year", "No", "Credit card (automatic)", 120.5, 5800.7, "24-48", 5],
+         "Yes", "Yes", "Two year", "No", "Credit card (automatic)", 118.75, 5800.7, "24-48", 5],
         ["Male", 0, "No", "No", 10, "Yes", "No", "DSL", "No", "Yes", "No", "No",
          "No", "No", "Month-to-month", "Yes", "Electronic check", 60.0, 600.0, "6-12", 2],
         ["Female", 1, "Yes", "Yes", 65, "Yes", "Yes", "Fiber optic", "Yes", "Yes", "No", "Yes",
@@ -66,20 +63,5 @@ def validate_uploaded_dataframe(df: pd.DataFrame, required_cols: list) -> list:
     return [col for col in required_cols if col not in df.columns]
 
 
-def classify_risk_level(prob: float) -> str:
-    if prob < 0.3:
-        return "BAJO"
-    elif prob < 0.6:
-        return "MEDIO"
-    else:
-        return "ALTO"
-
-
-def add_predictions_and_risk_levels(df_raw: pd.DataFrame, preds: list, probs: list, classify_func) -> pd.DataFrame:
-    prob_churn = [p[1] for p in probs]
-    df_results = df_raw.copy()
-    df_results["Probabilidad_Churn"] = prob_churn
-    df_results["Prediccion"] = preds
-    df_results["Nivel_Riesgo"] = df_results["Probabilidad_Churn"].apply(
-        classify_func)
-    return df_results
+def add_predictions_and_risk_levels(df_raw: pd.DataFrame, scores: pd.DataFrame) -> pd.DataFrame:
+    return df_raw.assign(**{col: scores[col].values for col in scores.columns})
@@ -0,0 +1,214 @@
+"""
+Bundle compacto del modelo: manifiesto versionado con checksums y arrays
+NumPy que se pueden mapear en memoria (vocabularios, coeficientes e intercepto).
+
+El loader construye el kernel de scoring sin importar scikit-learn ni
+deserializar pickles.
+
+Exportar el bundle desde los pickles actuales (desde la carpeta dashboard/):
+    python -m utils.bundle_utils
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import streamlit as st
+
+from utils.model_utils import MODELS_DIR, read_model_components
+from utils.scoring_utils import LinearScoringKernel, build_scoring_kernel
+
+BUNDLE_DIR = MODELS_DIR / "churn_bundle"
+BUNDLE_FORMAT = "churn-model-bundle"
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def export_model_bundle(model, categorical_columns, feature_names, ohe,
+                        bundle_dir=BUNDLE_DIR, model_version=None, reference_profile=None) -> dict:
+    """
+    Exporta los componentes del modelo a un bundle versionado.
+
+    Args:
+        model: Modelo lineal entrenado (coef_ e intercept_)
+        categorical_columns: Lista de columnas categóricas
+        feature_names: Lista de nombres de features
+        ohe: Encoder OneHotEncoder ajustado
+        bundle_dir: Carpeta de destino (se reemplaza completa)
+        model_version: Versión del modelo (por defecto, derivada del contenido)
+        reference_profile: Histogramas de referencia para el drift (por defecto
+            se calculan desde el dataset de referencia, si existe)
+
+    Returns:
+        dict con el manifiesto escrito
+    """
+    if build_scoring_kernel(model, categorical_columns, feature_names, ohe) is None:
+        raise ValueError(
+            "Solo se pueden exportar modelos lineales binarios con coef_")
+
+    bundle_dir = Path(bundle_dir)
+    tmp_dir = bundle_dir.with_name(bundle_dir.name + ".tmp")
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir(parents=True)
+
+    vocabularies = [np.asarray(cats).astype(str) for cats in ohe.categories_]
+    arrays = {
+        "coef": np.asarray(model.coef_[0], dtype=np.float64),
+        "intercept": np.asarray(model.intercept_, dtype=np.float64),
+        "vocabulary": np.concatenate(vocabularies),
+        "vocabulary_offsets": np.cumsum([0] + [len(v) for v in vocabularies]).astype(np.int64)
+    }
+
+    if reference_profile is None:
+        from utils.drift_utils import build_reference_profile
+        reference_profile = build_reference_profile()
+    reference_meta = None
+    if reference_profile is not None:
+        reference_arrays, reference_meta = reference_profile.to_arrays()
+        arrays.update(reference_arrays)
+
+    entries = {}
+    for name, array in arrays.items():
+        path = tmp_dir / f"{name}.npy"
+        np.save(path, array, allow_pickle=False)
+        entries[name] = {
+            "file": path.name,
+            "dtype": str(array.dtype),
+            "shape": list(array.shape),
+            "sha256": file_sha256(path)
+        }
+
+    content_hash = hashlib.sha256(
+        "".join(entries[name]["sha256"] for name in sorted(entries)).encode()).hexdigest()
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "model_version": model_version or content_hash[:12],
+        "model_type": type(model).__name__,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "categorical_columns": list(categorical_columns),
+        "feature_names": list(feature_names),
+        "arrays": entries,
+        "content_sha256": content_hash
+    }
+    if reference_meta is not None:
+        manifest["reference_profile"] = reference_meta
+    with open(tmp_dir / MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    # Reemplazo del bundle completo al final para no dejarlo a medias
+    if bundle_dir.exists():
+        shutil.rmtree(bundle_dir)
+    os.replace(tmp_dir, bundle_dir)
+    return manifest
+
+
+def read_manifest(bundle_dir=BUNDLE_DIR) -> dict:
+    with open(Path(bundle_dir) / MANIFEST_FILE, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != BUNDLE_FORMAT or manifest.get("format_version") != BUNDLE_FORMAT_VERSION:
+        raise ValueError(
+            f"Formato de bundle no soportado: {manifest.get('format')} v{manifest.get('format_version')}")
+    return manifest
+
+
+def read_bundle_arrays(bundle_dir, manifest: dict, verify=True, names=None) -> dict:
+    """
+    Mapea en memoria los arrays del bundle (todos o los indicados en names).
+    """
+    bundle_dir = Path(bundle_dir)
+    arrays = {}
+    for name in names or manifest["arrays"]:
+        entry = manifest["arrays"][name]
+        path = bundle_dir / entry["file"]
+        if verify and file_sha256(path) != entry["sha256"]:
+            raise ValueError(f"Checksum inválido en {path.name}")
+        arrays[name] = np.load(path, mmap_mode="r", allow_pickle=False)
+    return arrays
+
+
+def load_model_bundle(bundle_dir=BUNDLE_DIR, verify=True):
+    """
+    Carga un bundle y construye el kernel de scoring sin scikit-learn.
+
+    Args:
+        bundle_dir: Carpeta del bundle
+        verify: Comprueba los checksums de los arrays
+
+    Returns:
+        tuple: (LinearScoringKernel, manifiesto)
+    """
+    bundle_dir = Path(bundle_dir)
+    manifest = read_manifest(bundle_dir)
+    arrays = read_bundle_arrays(bundle_dir, manifest, verify=verify,
+                                names=["coef", "intercept", "vocabulary", "vocabulary_offsets"])
+
+    offsets = arrays["vocabulary_offsets"]
+    categories = [np.asarray(arrays["vocabulary"][start:end], dtype=object)
+                  for start, end in zip(offsets[:-1], offsets[1:])]
+
+    kernel = LinearScoringKernel.from_coefficients(
+        manifest["categorical_columns"], categories, manifest["feature_names"],
+        arrays["coef"], arrays["intercept"][0])
+    return kernel, manifest
+
+
+def read_scoring_kernel(models_dir=MODELS_DIR):
+    """
+    Obtiene el kernel de scoring: desde el champion del registro, desde el
+    bundle por defecto si existe y, si no, desde los pickles.
+
+    Returns:
+        LinearScoringKernel o None si el modelo no es lineal
+    """
+    from utils.registry_utils import champion_bundle_dir
+
+    bundle_dir = champion_bundle_dir(models_dir) or Path(models_dir) / BUNDLE_DIR.name
+    if (bundle_dir / MANIFEST_FILE).exists():
+        return load_model_bundle(bundle_dir)[0]
+
+    model, categorical_columns, feature_names, ohe = read_model_components(
+        models_dir)
+    return build_scoring_kernel(model, categorical_columns, feature_names, ohe)
+
+
+@st.cache_resource
+def load_scoring_kernel():
+    """
+    Carga el kernel de scoring plegado para el modelo entrenado.
+    """
+    return read_scoring_kernel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Exporta los pickles del modelo a un bundle compacto.")
+    parser.add_argument("--models-dir", default=str(MODELS_DIR),
+                        help="Carpeta con los pickles del modelo")
+    parser.add_argument("--output", default=str(BUNDLE_DIR),
+                        help="Carpeta del bundle")
+    parser.add_argument("--model-version",
+                        help="Versión del modelo (por defecto, hash del contenido)")
+    args = parser.parse_args(argv)
+
+    components = read_model_components(args.models_dir)
+    manifest = export_model_bundle(
+        *components, bundle_dir=args.output, model_version=args.model_version)
+    print(f"Bundle {manifest['model_version']} exportado en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Caché de resultados de scoring masivo indexada por contenido.
+
+La clave combina el hash del archivo subido, la versión del modelo y los
+umbrales de riesgo, de modo que un rerun de Streamlit o una nueva subida del
+mismo archivo reutilizan el resultado sin volver a leer ni puntuar. Las
+entradas viven en un LRU acotado en bytes y, al salir de memoria, se
+guardan en disco hasta un segundo límite, en un directorio privado del
+proceso (mkdtemp, permisos 0700): los archivos se leen con pickle y no
+pueden venir de otro usuario ni de otro proceso.
+"""
+import hashlib
+import json
+import pickle
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+from config.config import RESULT_CACHE_CONFIG
+from utils.export_utils import private_temp_dir
+
+
+def content_digest(file_obj) -> str:
+    """
+    Calcula el hash BLAKE2b del contenido de un archivo subido o en disco.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    if hasattr(file_obj, "getbuffer"):
+        # UploadedFile es un BytesIO: se recorre su buffer sin copiarlo
+        digest.update(file_obj.getbuffer())
+    else:
+        with open(file_obj, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def result_cache_key(digest: str, model_version, thresholds, **options) -> str:
+    """
+    Construye la clave de caché de un resultado de scoring.
+
+    Args:
+        digest: Hash del contenido de entrada
+        model_version: Versión del modelo que puntúa
+        thresholds: Umbrales de los niveles de riesgo
+        **options: Otros parámetros que cambian el resultado (p. ej. el modo)
+    """
+    payload = json.dumps({
+        "digest": digest,
+        "model_version": str(model_version),
+        "thresholds": list(thresholds),
+        "options": options
+    }, sort_keys=True)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def estimate_nbytes(value) -> int:
+    """
+    Estima la memoria que ocupa un resultado (DataFrames, Series, bytes y dicts).
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(estimate_nbytes(v) for v in value.values())
+    return 64
+
+
+class ResultCache:
+    """
+    LRU acotado en bytes con desbordamiento a disco.
+
+    Las entradas desalojadas de memoria se serializan en spill_dir (por
+    defecto un directorio privado del proceso); al leerlas
+    de nuevo vuelven a memoria. El disco también se acota, eliminando primero
+    los archivos usados hace más tiempo.
+    """
+
+    def __init__(self, max_memory_bytes=None, max_disk_bytes=None, spill_dir=None):
+        self.max_memory_bytes = (RESULT_CACHE_CONFIG['max_memory_bytes']
+                                 if max_memory_bytes is None else max_memory_bytes)
+        self.max_disk_bytes = (RESULT_CACHE_CONFIG['max_disk_bytes']
+                               if max_disk_bytes is None else max_disk_bytes)
+        self.spill_dir = Path(spill_dir) if spill_dir is not None \
+            else private_temp_dir("churn_result_cache")
+        self._entries = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+
+    def _spill_path(self, key: str) -> Path:
+        return self.spill_dir / f"{key}.pkl"
+
+    def get(self, key: str):
+        """
+        Devuelve el resultado cacheado o None.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits["memory"] += 1
+                return self._entries[key][0]
+
+        path = self._spill_path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        path.touch()
+        with self._lock:
+            self.hits["disk"] += 1
+        self.put(key, value)
+        return value
+
+    def put(self, key: str, value):
+        """
+        Guarda un resultado; si no cabe en memoria se desalojan los menos recientes.
+        """
+        nbytes = estimate_nbytes(value)
+        evicted = []
+        with self._lock:
+            if key in self._entries:
+                self._memory_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, nbytes)
+            self._memory_bytes += nbytes
+            while self._memory_bytes > self.max_memory_bytes and len(self._entries) > 1:
+                old_key, (old_value, old_nbytes) = self._entries.popitem(last=False)
+                self._memory_bytes -= old_nbytes
+                evicted.append((old_key, old_value))
+
+        # La escritura a disco se hace fuera del lock; una clave ya volcada
+        # no se reescribe porque su contenido no cambia
+        for old_key, old_value in evicted:
+            self._spill(old_key, old_value)
+        if evicted:
+            self._trim_disk()
+
+    def _spill(self, key: str, value):
+        if self.max_disk_bytes <= 0:
+            return
+        self.spill_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+        path = self._spill_path(key)
+        if path.exists():
+            path.touch()
+            return
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path.replace(path)
+
+    def _trim_disk(self):
+        if not self.spill_dir.exists():
+            return
+        files = sorted(self.spill_dir.glob("*.pkl"), key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in files)
+        for path in files:
+            if total <= self.max_disk_bytes:
+                break
+            total -= path.stat().st_size
+            path.unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "memory_bytes": self._memory_bytes,
+                "hits_memory": self.hits["memory"],
+                "hits_disk": self.hits["disk"],
+                "misses": self.misses
+            }
+
+
+@st.cache_resource(show_spinner=False)
+def get_result_cache():
+    """
+    Devuelve la caché de resultados compartida entre sesiones.
+    """
+    return ResultCache()
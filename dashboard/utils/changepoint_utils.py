@@ -0,0 +1,433 @@
+"""
+Detección online de cambios en series diarias de métricas y de scores.
+
+Cada serie (p. ej. "Accuracy" o "Probabilidad media · Contract=One year")
+tiene su propio juego de detectores:
+- CUSUM: sumas acumuladas de las desviaciones estandarizadas, en ambos
+  sentidos. Tras una alerta reinicia las sumas y reajusta el nivel con los
+  valores posteriores.
+- Page-Hinkley: desviación acumulada respecto a la media corriente.
+- ADWIN: ventana adaptativa con histograma exponencial; corta la ventana
+  cuando dos subventanas difieren más que la cota de Hoeffding y descarta la
+  anterior al corte. Tras una alerta no vuelve a alertar hasta reunir
+  adwin_min_window observaciones.
+
+CUSUM y Page-Hinkley cuestan O(1) por observación y ADWIN O(log W). El
+estado de los detectores y los cambios detectados se guardan en
+logs/changepoints.json: cada render solo procesa los días nuevos. Un día de
+scores se procesa una vez cerrado, es decir, cuando la serie ya tiene un día
+posterior. Un día de métricas de desempeño se procesa cuando sus etiquetas
+maduran (label_delay_days desde la fecha de scoring) y solo si reunió
+min_labels resultados: antes solo tendría unas pocas etiquetas y nunca se
+revisaría.
+"""
+import json
+import math
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from config.config import CHANGEPOINT_CONFIG
+from utils.model_utils import MODELS_DIR
+
+CHANGEPOINT_LOG = MODELS_DIR.parent / "logs" / "changepoints.json"
+
+_STATE_LOCK = threading.Lock()
+
+
+class _StandardizedDetector:
+    """
+    Estima media y desviación en los primeros warmup valores (Welford) y
+    evalúa los siguientes estandarizados. Tras una alerta, restart vuelve a
+    estimar el nivel con los valores posteriores sin dejar de evaluar.
+    """
+
+    def __init__(self, warmup=None):
+        self.warmup = warmup or CHANGEPOINT_CONFIG['warmup']
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        # Reajuste tras una alerta: [n, media, m2] de los valores posteriores
+        self.refit = None
+
+    def _std(self) -> float:
+        std = math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+        return max(std, CHANGEPOINT_CONFIG['min_std'])
+
+    def _standardize(self, x: float):
+        if self.n < self.warmup:
+            self.n += 1
+            delta = x - self.mean
+            self.mean += delta / self.n
+            self.m2 += delta * (x - self.mean)
+            return None
+        if self.refit is None:
+            return (x - self.mean) / self._std()
+
+        # Tras una alerta el nivel es el de los valores posteriores a ella y la
+        # desviación la del ajuste anterior hasta reunir warmup valores nuevos
+        n, mean, m2 = self.refit
+        z = (x - mean) / self._std() if n else None
+        n += 1
+        delta = x - mean
+        mean += delta / n
+        m2 += delta * (x - mean)
+        if n >= self.warmup:
+            self.n, self.mean, self.m2, self.refit = n, mean, m2, None
+        else:
+            self.refit = [n, mean, m2]
+        return z
+
+    def restart(self):
+        """
+        Tras una alerta: conserva la desviación ajustada y vuelve a estimar
+        el nivel solo con los valores siguientes, sin repetir el warmup.
+        """
+        if self.n >= self.warmup:
+            self.refit = [0, 0.0, 0.0]
+
+    def reset(self):
+        self.__init__(self.warmup)
+
+    def state(self) -> dict:
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_state(cls, state: dict):
+        # Se parte de un detector nuevo: el estado guardado por versiones
+        # anteriores puede no tener todos los atributos
+        detector = cls()
+        detector.__dict__.update(state)
+        return detector
+
+
+class CusumDetector(_StandardizedDetector):
+    """
+    CUSUM bilateral: alerta cuando la suma de desviaciones (menos la holgura k)
+    supera h desviaciones típicas.
+    """
+
+    def __init__(self, warmup=None, k=None, h=None):
+        super().__init__(warmup)
+        self.k = CHANGEPOINT_CONFIG['cusum_k'] if k is None else k
+        self.h = CHANGEPOINT_CONFIG['cusum_h'] if h is None else h
+        self.high = 0.0
+        self.low = 0.0
+
+    def reset(self):
+        self.__init__(self.warmup, self.k, self.h)
+
+    def update(self, x: float):
+        """
+        Returns:
+            "sube", "baja" o None
+        """
+        z = self._standardize(x)
+        if z is None:
+            return None
+        self.high = max(0.0, self.high + z - self.k)
+        self.low = max(0.0, self.low - z - self.k)
+        if self.high > self.h or self.low > self.h:
+            direction = "sube" if self.high > self.h else "baja"
+            # Solo se reinician las sumas; el ajuste se conserva y se reajusta
+            self.high = self.low = 0.0
+            self.restart()
+            return direction
+        return None
+
+
+class PageHinkleyDetector(_StandardizedDetector):
+    """
+    Page-Hinkley bilateral sobre los valores estandarizados: alerta cuando la
+    desviación acumulada respecto a la media corriente se aleja de su extremo
+    más de lambda.
+    """
+
+    def __init__(self, warmup=None, delta=None, threshold=None):
+        super().__init__(warmup)
+        self.delta = CHANGEPOINT_CONFIG['ph_delta'] if delta is None else delta
+        self.threshold = CHANGEPOINT_CONFIG['ph_lambda'] if threshold is None else threshold
+        self.count = 0
+        self.running_mean = 0.0
+        self.cum_up = 0.0
+        self.min_up = 0.0
+        self.cum_down = 0.0
+        self.max_down = 0.0
+
+    def reset(self):
+        self.__init__(self.warmup, self.delta, self.threshold)
+
+    def update(self, x: float):
+        z = self._standardize(x)
+        if z is None:
+            return None
+        self.count += 1
+        self.running_mean += (z - self.running_mean) / self.count
+        self.cum_up += z - self.running_mean - self.delta
+        self.cum_down += z - self.running_mean + self.delta
+        self.min_up = min(self.min_up, self.cum_up)
+        self.max_down = max(self.max_down, self.cum_down)
+        if self.cum_up - self.min_up > self.threshold:
+            self.reset()
+            return "sube"
+        if self.max_down - self.cum_down > self.threshold:
+            self.reset()
+            return "baja"
+        return None
+
+
+class AdwinDetector:
+    """
+    ADWIN: la ventana se guarda como histograma exponencial de buckets
+    (suma, suma de cuadrados, tamaño) con a lo sumo max_buckets buckets de
+    cada tamaño, de modo que ocupa O(log W). La cota de corte usa la varianza
+    de la ventana (aproximación normal), de modo que no depende de la escala
+    de la serie.
+    """
+
+    def __init__(self, delta=None, max_buckets=None, min_window=None):
+        self.delta = CHANGEPOINT_CONFIG['adwin_delta'] if delta is None else delta
+        self.max_buckets = max_buckets or CHANGEPOINT_CONFIG['adwin_max_buckets']
+        self.min_window = min_window or CHANGEPOINT_CONFIG['adwin_min_window']
+        # Del más antiguo al más reciente: [suma, suma de cuadrados, tamaño]
+        self.buckets = []
+        self.width = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        # Observaciones desde la última alerta
+        self.since_change = self.min_window
+
+    def _compress(self):
+        size = 1
+        while True:
+            same = [i for i, bucket in enumerate(self.buckets) if bucket[2] == size]
+            if len(same) <= self.max_buckets:
+                break
+            # Se fusionan los dos buckets más antiguos de este tamaño
+            first, second = same[0], same[1]
+            self.buckets[first] = [self.buckets[first][0] + self.buckets[second][0],
+                                   self.buckets[first][1] + self.buckets[second][1], 2 * size]
+            del self.buckets[second]
+            size *= 2
+
+    def _cut(self):
+        # Buckets de la subventana antigua en el corte más significativo
+        # (mayor diferencia de medias frente a su cota), o None si no hay corte
+        if self.width < 2 * self.min_window:
+            return None
+        mean = self.total / self.width
+        variance = max(self.total_sq / self.width - mean ** 2, CHANGEPOINT_CONFIG['min_std'] ** 2)
+        log_term = math.log(2.0 * math.log(self.width) / self.delta)
+        n_old, sum_old = 0, 0.0
+        cut, best = None, 1.0
+        for i, (bucket_sum, _, size) in enumerate(self.buckets[:-1]):
+            n_old += size
+            sum_old += bucket_sum
+            n_new = self.width - n_old
+            if n_old < self.min_window or n_new < self.min_window:
+                continue
+            harmonic = 1.0 / (1.0 / n_old + 1.0 / n_new)
+            epsilon = math.sqrt(2.0 * variance * log_term / harmonic)
+            ratio = abs(sum_old / n_old - (self.total - sum_old) / n_new) / epsilon
+            if ratio > best:
+                cut, best = i + 1, ratio
+        return cut
+
+    def update(self, x: float):
+        x = float(x)
+        previous_mean = self.total / self.width if self.width else None
+        self.buckets.append([x, x * x, 1])
+        self.width += 1
+        self.total += x
+        self.total_sq += x * x
+        self._compress()
+        self.since_change += 1
+
+        changed = False
+        cut = self._cut()
+        while cut is not None:
+            # Se descarta entera la subventana anterior al corte: si solo se
+            # retiraran buckets hasta que la cota dejara de cumplirse, los
+            # valores previos al cambio que quedan volverían a cortar días después
+            for bucket_sum, bucket_sq, size in self.buckets[:cut]:
+                self.width -= size
+                self.total -= bucket_sum
+                self.total_sq -= bucket_sq
+            del self.buckets[:cut]
+            changed = True
+            cut = self._cut()
+        # Tras una alerta, la ventana recién cortada no alerta de nuevo hasta
+        # reunir min_window observaciones
+        if not changed or self.since_change < self.min_window:
+            return None
+        self.since_change = 0
+        return "sube" if self.total / self.width > previous_mean else "baja"
+
+    def state(self) -> dict:
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_state(cls, state: dict):
+        detector = cls()
+        detector.__dict__.update(state)
+        return detector
+
+
+DETECTORS = {
+    "CUSUM": CusumDetector,
+    "Page-Hinkley": PageHinkleyDetector,
+    "ADWIN": AdwinDetector
+}
+
+
+def _run_detectors(detectors: dict, series: pd.Series, name: str) -> list:
+    changes = []
+    for day, value in series.items():
+        if pd.isna(value):
+            continue
+        for detector_name, detector in detectors.items():
+            direction = detector.update(float(value))
+            if direction is not None:
+                changes.append({"Fecha": pd.Timestamp(day).strftime("%Y-%m-%d"), "Serie": name,
+                                "Detector": detector_name, "Sentido": direction})
+    return changes
+
+
+def detect_change_points(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cambios de cada columna de una serie diaria completa, con detectores
+    nuevos y sin guardar estado (p. ej. para datos simulados).
+    """
+    changes = []
+    for column in df.columns:
+        detectors = {name: cls() for name, cls in DETECTORS.items()}
+        changes += _run_detectors(detectors, df[column], column)
+    return _changes_frame(changes)
+
+
+def _changes_frame(changes: list) -> pd.DataFrame:
+    df = pd.DataFrame(changes, columns=["Fecha", "Serie", "Detector", "Sentido"])
+    df["Fecha"] = pd.to_datetime(df["Fecha"])
+    return df
+
+
+class ChangePointMonitor:
+    """
+    Detectores con estado persistente para muchas series diarias.
+    """
+
+    def __init__(self, path=CHANGEPOINT_LOG):
+        self.path = Path(path)
+        self._state = None
+        self._mtime = None
+
+    def _load(self):
+        mtime = self.path.stat().st_mtime_ns if self.path.exists() else None
+        if self._state is None or mtime != self._mtime:
+            if mtime is None:
+                self._state = {}
+            else:
+                with open(self.path, encoding="utf-8") as f:
+                    self._state = json.load(f)
+            self._mtime = mtime
+        return self._state
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._state, f, ensure_ascii=False)
+        tmp_path.replace(self.path)
+        self._mtime = self.path.stat().st_mtime_ns
+
+    def update(self, series_by_name: dict, mature_until=None, counts=None, min_count=None) -> pd.DataFrame:
+        """
+        Pasa a los detectores los días cerrados que aún no procesaron.
+
+        Args:
+            series_by_name: {nombre de la serie: Series diaria indexada por fecha}
+            mature_until: Último día que se puede procesar (por defecto, todos
+                menos el último día de la serie, que sigue abierto)
+            counts: Series con el número de observaciones de cada día; los
+                días con menos de min_count se dan por procesados sin evaluarlos
+            min_count: Observaciones mínimas por día (por defecto CHANGEPOINT_CONFIG['min_labels'])
+
+        Returns:
+            DataFrame con los cambios detectados en esta actualización
+        """
+        min_count = CHANGEPOINT_CONFIG['min_labels'] if min_count is None else min_count
+        changes = []
+        with _STATE_LOCK:
+            state = self._load()
+            dirty = False
+            for name, series in series_by_name.items():
+                series = series.dropna().sort_index()
+                if mature_until is None:
+                    # El último día sigue abierto: se procesa cuando llegue uno posterior
+                    closed = series.iloc[:-1]
+                else:
+                    closed = series[series.index <= pd.Timestamp(mature_until)]
+                entry = state.setdefault(name, {"ultimo": None, "detectores": {}, "cambios": []})
+                if entry["ultimo"] is not None:
+                    closed = closed[closed.index > pd.Timestamp(entry["ultimo"])]
+                if closed.empty:
+                    continue
+                last_closed = closed.index[-1]
+                if counts is not None:
+                    # Los días con pocas observaciones darían falsas alarmas
+                    closed = closed[counts.reindex(closed.index, fill_value=0).to_numpy() >= min_count]
+                detectors = {
+                    detector_name: cls.from_state(entry["detectores"][detector_name])
+                    if detector_name in entry["detectores"] else cls()
+                    for detector_name, cls in DETECTORS.items()}
+                found = _run_detectors(detectors, closed, name)
+                entry["detectores"] = {n: d.state() for n, d in detectors.items()}
+                entry["ultimo"] = pd.Timestamp(last_closed).strftime("%Y-%m-%d")
+                entry["cambios"] = (entry["cambios"] + [
+                    {k: v for k, v in change.items() if k != "Serie"} for change in found]
+                )[-CHANGEPOINT_CONFIG['max_changes']:]
+                changes += found
+                dirty = True
+            if dirty:
+                self._save()
+        return _changes_frame(changes)
+
+    def changes(self, names=None) -> pd.DataFrame:
+        """
+        Cambios registrados de todas las series (o de las indicadas).
+        """
+        with _STATE_LOCK:
+            state = self._load()
+        rows = [{"Serie": name, **change} for name, entry in state.items()
+                if names is None or name in names for change in entry["cambios"]]
+        df = _changes_frame(rows)
+        return df[["Fecha", "Serie", "Detector", "Sentido"]].sort_values("Fecha", ascending=False)
+
+
+def score_series(sketch_store) -> dict:
+    """
+    Series diarias de scores por segmento a partir de los resúmenes diarios:
+    probabilidad media y proporción de riesgo ALTO.
+    """
+    series = {}
+    for segment in sketch_store.layout.segments:
+        mean_probability, high_share = {}, {}
+        for day, window in sketch_store.daily(segment).items():
+            if window.total:
+                mean_probability[day] = window.mean("Probabilidad_Churn")
+                high_share[day] = window.category_counts("Nivel_Riesgo")["ALTO"] / window.total
+        series[f"Probabilidad media · {segment}"] = pd.Series(mean_probability, dtype=np.float64)
+        series[f"% riesgo ALTO · {segment}"] = pd.Series(high_share, dtype=np.float64)
+    return series
+
+
+@st.cache_resource(show_spinner=False)
+def get_changepoint_monitor():
+    """
+    Devuelve el monitor de cambios compartido entre sesiones.
+    """
+    return ChangePointMonitor()
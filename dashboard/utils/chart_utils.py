@@ -0,0 +1,129 @@
+"""
+Constructores de gráficos que agregan en el servidor antes de graficar.
+
+Ningún gráfico recibe filas crudas: los histogramas reciben conteos por bin,
+los box plots cuantiles y las barras una categoría por barra. El número de
+puntos de cada figura está acotado por CHART_CONFIG (bins y categorías), de
+modo que el tamaño del JSON enviado al navegador no depende del número de
+filas del lote.
+"""
+import numpy as np
+import pandas as pd
+
+from config.config import CHART_CONFIG
+
+OTHERS_LABEL = "Otros"
+
+
+def histogram_counts(values, bins=None, value_range=None):
+    """
+    Calcula un histograma de bins fijos en el servidor.
+
+    Args:
+        values: Array o Series numérica (los nulos se ignoran)
+        bins: Número de bins (acotado por CHART_CONFIG['max_bins'])
+        value_range: (mínimo, máximo) de los bins; por defecto el rango de los datos
+
+    Returns:
+        tuple: (conteos, bordes de los bins)
+    """
+    bins = min(bins or CHART_CONFIG['max_bins'], CHART_CONFIG['max_bins'])
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    return np.histogram(values, bins=bins, range=value_range)
+
+
+def limit_categories(counts: pd.DataFrame, max_categories=None) -> pd.DataFrame:
+    """
+    Conserva las categorías con más filas y suma el resto en "Otros".
+
+    Args:
+        counts: DataFrame con una fila por categoría y columnas de conteos
+    """
+    max_categories = max_categories or CHART_CONFIG['max_categories']
+    if len(counts) <= max_categories:
+        return counts
+    order = counts.sum(axis=1).sort_values(ascending=False).index
+    top = counts.loc[order[:max_categories - 1]]
+    others = counts.loc[order[max_categories - 1:]].sum().to_frame(OTHERS_LABEL).T
+    return pd.concat([top, others])
+
+
+def binned_histogram_figure(counts, edges, x_title="", y_title="Cantidad", title=None, series=None):
+    """
+    Histograma a partir de conteos ya calculados.
+
+    Args:
+        counts: Conteos por bin, o dict nombre -> conteos para varias series
+        edges: Bordes de los bins (len(counts) + 1)
+        series: Si counts es un dict, barras apiladas con esos nombres en orden
+    """
+    import plotly.graph_objects as go
+
+    edges = np.asarray(edges, dtype=np.float64)
+    centers = np.round((edges[:-1] + edges[1:]) / 2, 6)
+    widths = np.round(np.diff(edges), 6)
+
+    fig = go.Figure()
+    if isinstance(counts, dict):
+        for name in series or counts:
+            fig.add_trace(go.Bar(x=centers, y=np.asarray(counts[name]).tolist(),
+                                 width=widths, name=str(name)))
+        fig.update_layout(barmode="stack")
+    else:
+        fig.add_trace(go.Bar(x=centers, y=np.asarray(counts).tolist(), width=widths,
+                             hovertemplate="%{x}: %{y}<extra></extra>"))
+    fig.update_layout(xaxis_title=x_title, yaxis_title=y_title, bargap=0, title=title)
+    return fig
+
+
+def quantile_box_figure(stats_by_group: dict, x_title="", y_title="", title=None):
+    """
+    Box plot a partir de cuantiles calculados en el servidor.
+
+    Args:
+        stats_by_group: grupo -> dict con q1, median, q3, lowerfence, upperfence y mean
+    """
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    for group, stats in stats_by_group.items():
+        if np.isnan(stats["median"]):
+            continue
+        fig.add_trace(go.Box(
+            name=str(group), x=[str(group)],
+            q1=[stats["q1"]], median=[stats["median"]], q3=[stats["q3"]],
+            lowerfence=[stats["lowerfence"]], upperfence=[stats["upperfence"]],
+            mean=[stats["mean"]]))
+    fig.update_layout(xaxis_title=x_title, yaxis_title=y_title,
+                      legend_title_text=x_title, title=title)
+    return fig
+
+
+def category_bar_figure(data: pd.DataFrame, x, y, max_categories=None, **kwargs):
+    """
+    Barras de datos ya agregados (una fila por valor de x, o por x y color).
+
+    Sin color, si hay más de max_categories valores en x las menos frecuentes
+    se suman en "Otros"; con color el llamador debe limitar las categorías
+    antes (p. ej. AggregationCube.category_shares(col, max_categories)).
+
+    Args:
+        data: Datos agregados
+        x, y: Columnas de data
+        **kwargs: Argumentos adicionales de px.bar
+    """
+    import plotly.express as px
+
+    max_categories = max_categories or CHART_CONFIG['max_categories']
+    if kwargs.get("color") is None and data[x].nunique() > max_categories:
+        data = limit_categories(data.groupby(x, observed=True, sort=False)[[y]].sum(),
+                                max_categories).rename_axis(x).reset_index()
+    return px.bar(data, x=x, y=y, **kwargs)
+
+
+def figure_payload_bytes(fig) -> int:
+    """
+    Tamaño del JSON de la figura que se envía al navegador.
+    """
+    return len(fig.to_json().encode("utf-8"))
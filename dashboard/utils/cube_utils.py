@@ -0,0 +1,145 @@
+"""
+Cubo de agregados para la página de Insights.
+
+Se construye una vez por dataset o lote y contiene todo lo que necesitan los
+gráficos interactivos: conteos categoría × Churn de cada variable categórica,
+histogramas de bins fijos y cuantiles por Churn de cada variable numérica y
+las tasas de churn por segmento. Elegir otra variable en la página solo lee
+el cubo, de modo que la latencia no depende del número de filas.
+"""
+import numpy as np
+import pandas as pd
+
+from utils.chart_utils import limit_categories
+
+TARGET_COLUMN = "Churn"
+TARGET_LABELS = ["No", "Yes"]
+QUANTILE_STATS = ["min", "lowerfence", "q1", "median", "q3", "upperfence", "max", "mean"]
+
+
+def _box_stats(values: np.ndarray) -> dict:
+    """
+    Estadísticos de un box plot (bigotes a 1.5 IQR, como plotly).
+    """
+    if not len(values):
+        return {stat: np.nan for stat in QUANTILE_STATS}
+    q0, q1, median, q3, q4 = np.quantile(values, [0.0, 0.25, 0.5, 0.75, 1.0])
+    iqr = q3 - q1
+    low_mask = values >= q1 - 1.5 * iqr
+    high_mask = values <= q3 + 1.5 * iqr
+    return {
+        "min": float(q0),
+        "lowerfence": float(values[low_mask].min()),
+        "q1": float(q1),
+        "median": float(median),
+        "q3": float(q3),
+        "upperfence": float(values[high_mask].max()),
+        "max": float(q4),
+        "mean": float(values.mean())
+    }
+
+
+class AggregationCube:
+    """
+    Agregados de un dataset respecto a la variable objetivo Churn.
+
+    Atributos:
+        rows: Filas del dataset
+        columns: Columnas agregadas, en el orden del dataset
+        categorical: columna -> DataFrame (categorías × TARGET_LABELS) con conteos
+        numeric: columna -> dict con edges, counts, counts_by_target y stats
+    """
+
+    def __init__(self, rows, columns, categorical, numeric):
+        self.rows = rows
+        self.columns = columns
+        self.categorical = categorical
+        self.numeric = numeric
+
+    def is_numeric(self, col) -> bool:
+        return col in self.numeric
+
+    def _counts(self, col, max_categories=None) -> pd.DataFrame:
+        counts = self.categorical[col]
+        return limit_categories(counts, max_categories) if max_categories else counts
+
+    def category_counts(self, col, max_categories=None) -> pd.Series:
+        """
+        Clientes por categoría. Con max_categories, las menos frecuentes se
+        agrupan en "Otros".
+        """
+        return self._counts(col, max_categories).sum(axis=1).rename("Cantidad")
+
+    def category_shares(self, col, max_categories=None) -> pd.DataFrame:
+        """
+        Conteos por categoría y Churn con el porcentaje dentro de cada categoría.
+        """
+        counts = self._counts(col, max_categories)
+        shares = counts.div(counts.sum(axis=1), axis=0) * 100
+        return pd.DataFrame({
+            col: np.repeat(counts.index.to_numpy(), len(TARGET_LABELS)),
+            TARGET_COLUMN: np.tile(TARGET_LABELS, len(counts)),
+            "Cantidad": counts.to_numpy().ravel(),
+            "Pct": shares.to_numpy().ravel()
+        })
+
+    def segment_rates(self, col, max_categories=None) -> pd.Series:
+        """
+        Tasa de churn (%) por categoría.
+        """
+        counts = self._counts(col, max_categories)
+        return (counts["Yes"] / counts.sum(axis=1) * 100).rename("Tasa Churn")
+
+
+def build_aggregation_cube(df: pd.DataFrame, bins=30, exclude=()) -> AggregationCube:
+    """
+    Calcula el cubo de agregados de un dataset en una sola pasada por columna.
+
+    Args:
+        df: Dataset con la columna Churn ('Yes'/'No')
+        bins: Número de bins de los histogramas numéricos
+        exclude: Columnas que no se agregan (p. ej. identificadores)
+
+    Returns:
+        AggregationCube
+    """
+    positive = (df[TARGET_COLUMN] == "Yes").to_numpy() if TARGET_COLUMN in df.columns \
+        else np.zeros(len(df), dtype=bool)
+
+    columns, categorical, numeric = [], {}, {}
+    for col in df.columns:
+        if col in exclude:
+            continue
+        values = df[col]
+        columns.append(col)
+
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            array = values.to_numpy(dtype=np.float64, na_value=np.nan)
+            valid = ~np.isnan(array)
+            array, target = array[valid], positive[valid]
+            edges = np.histogram_bin_edges(array, bins=bins) if len(array) \
+                else np.linspace(0.0, 1.0, bins + 1)
+            by_target = {label: np.histogram(array[target == (label == "Yes")], bins=edges)[0]
+                         for label in TARGET_LABELS}
+            numeric[col] = {
+                "edges": edges,
+                "counts": by_target["No"] + by_target["Yes"],
+                "counts_by_target": by_target,
+                "stats": {label: _box_stats(array[target == (label == "Yes")])
+                          for label in TARGET_LABELS}
+            }
+            continue
+
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+        else:
+            codes, uniques = pd.factorize(values, sort=False)
+        valid = codes >= 0
+        counts = np.bincount(
+            codes[valid].astype(np.int64) * 2 + positive[valid],
+            minlength=2 * len(uniques)).reshape(len(uniques), 2)
+        table = pd.DataFrame(counts, index=pd.Index(uniques, name=col), columns=TARGET_LABELS)
+        # Las categorías del vocabulario sin clientes no se muestran
+        categorical[col] = table[table.sum(axis=1) > 0]
+
+    return AggregationCube(len(df), columns, categorical, numeric)
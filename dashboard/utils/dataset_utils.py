@@ -0,0 +1,184 @@
+"""
+Dataset de referencia en formato columnar tipado.
+
+El CSV de origen se convierte una sola vez a un archivo Arrow IPC con
+categóricas codificadas según los vocabularios de FORM_OPTIONS y numéricas
+compactas. El archivo se mapea en memoria, se comparte entre sesiones y se
+regenera cuando cambia el CSV de origen (tamaño o fecha de modificación).
+"""
+import os
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import streamlit as st
+
+from config.config import FORM_OPTIONS
+
+BASE_DIR = Path(__file__).parent.parent.parent
+SOURCE_CANDIDATES = [
+    BASE_DIR / "data" / "processed" / "clean_telco.csv",
+    BASE_DIR / "data" / "raw" / "telco_churn.csv",
+    BASE_DIR / "data" / "raw" / "Telco-Customer-Churn.csv",
+]
+CACHE_DIR = BASE_DIR / "data" / "cache"
+
+# Vocabularios de las categóricas: los de los formularios más Churn
+CATEGORY_VOCABULARIES = {
+    col: [str(v) for v in values] for col, values in FORM_OPTIONS.items()
+    if all(isinstance(v, str) for v in values)
+}
+CATEGORY_VOCABULARIES["Churn"] = ["No", "Yes"]
+
+# Se incrementa al cambiar la conversión para invalidar los archivos existentes
+DATASET_FORMAT_VERSION = "1"
+
+
+def find_reference_source():
+    """
+    Devuelve el primer CSV de referencia existente o None.
+    """
+    for path in SOURCE_CANDIDATES:
+        if path.exists():
+            return path
+    return None
+
+
+def source_signature(path: Path) -> dict:
+    stat = Path(path).stat()
+    return {
+        "source": str(Path(path).resolve()),
+        "size": str(stat.st_size),
+        "mtime_ns": str(stat.st_mtime_ns),
+        "format_version": DATASET_FORMAT_VERSION
+    }
+
+
+def _smallest_int_type(column):
+    low, high = pc.min_max(column).values()
+    low, high = low.as_py() or 0, high.as_py() or 0
+    for arrow_type, numpy_type in ((pa.int8(), np.int8), (pa.int16(), np.int16), (pa.int32(), np.int32)):
+        info = np.iinfo(numpy_type)
+        if info.min <= low and high <= info.max:
+            return arrow_type
+    return pa.int64()
+
+
+def encode_category(column, vocabulary: list):
+    """
+    Codifica una columna de texto como diccionario con el vocabulario dado.
+
+    Los valores fuera del vocabulario se añaden al final, en orden, para no
+    perder datos. Si la columna ya viene como diccionario solo se remapean
+    sus diccionarios por bloque, no cada fila.
+    """
+    chunks = column.chunks if isinstance(column, pa.ChunkedArray) else [column]
+    chunks = [chunk if pa.types.is_dictionary(chunk.type) else pc.dictionary_encode(chunk)
+              for chunk in chunks]
+
+    observed = set()
+    for chunk in chunks:
+        observed.update(chunk.dictionary.cast(pa.string()).to_pylist())
+    known = set(vocabulary)
+    vocabulary = list(vocabulary) + sorted(v for v in observed if v is not None and v not in known)
+    value_set = pa.array(vocabulary, type=pa.string())
+    index_type = pa.int8() if len(vocabulary) < 128 else pa.int32()
+
+    encoded = []
+    for chunk in chunks:
+        mapping = pc.index_in(chunk.dictionary.cast(pa.string()), value_set=value_set)
+        indices = pc.take(mapping.cast(index_type), chunk.indices)
+        encoded.append(pa.DictionaryArray.from_arrays(indices, value_set))
+    return pa.chunked_array(encoded, type=pa.dictionary(index_type, pa.string()))
+
+
+def type_reference_table(table: pa.Table) -> pa.Table:
+    """
+    Aplica los tipos compactos: diccionario para categóricas, el entero más
+    pequeño posible para enteros y float32 para reales.
+    """
+    columns = []
+    for name in table.column_names:
+        column = table[name]
+        if name in CATEGORY_VOCABULARIES:
+            column = encode_category(column, CATEGORY_VOCABULARIES[name])
+        elif pa.types.is_integer(column.type):
+            column = column.cast(_smallest_int_type(column))
+        elif pa.types.is_floating(column.type):
+            column = column.cast(pa.float32())
+        columns.append(column)
+    return pa.table(columns, names=table.column_names)
+
+
+def build_reference_cache(source: Path, cache_path: Path) -> Path:
+    """
+    Convierte el CSV de referencia a Arrow IPC tipado, con la firma del origen
+    en los metadatos del esquema.
+    """
+    table = pv.read_csv(
+        source,
+        convert_options=pv.ConvertOptions(
+            # Las categóricas se leen ya como diccionario
+            column_types={col: pa.dictionary(pa.int32(), pa.string())
+                          for col in CATEGORY_VOCABULARIES},
+            # TotalCharges viene con espacios en blanco en el archivo original
+            null_values=["", " "], strings_can_be_null=True)
+    )
+    # Un solo bloque por columna: al leer, la vista pandas comparte los buffers del mapeo
+    table = type_reference_table(table).combine_chunks()
+    table = table.replace_schema_metadata(
+        {key: value for key, value in source_signature(source).items()})
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(".tmp")
+    with pa.OSFile(str(tmp_path), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, cache_path)
+    return cache_path
+
+
+def _cache_is_valid(cache_path: Path, signature: dict) -> bool:
+    if not cache_path.exists():
+        return False
+    try:
+        schema = pa.ipc.open_file(pa.memory_map(str(cache_path))).schema
+    except pa.ArrowInvalid:
+        return False
+    metadata = {k.decode(): v.decode() for k, v in (schema.metadata or {}).items()}
+    return all(metadata.get(key) == value for key, value in signature.items())
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _open_reference_dataset(cache_path: str, size: str, mtime_ns: str):
+    # size y mtime_ns forman parte de la clave: un origen nuevo crea otra entrada
+    table = pa.ipc.open_file(pa.memory_map(cache_path)).read_all()
+    return table, table.to_pandas(split_blocks=True)
+
+
+def load_reference_table(source=None):
+    """
+    Devuelve el dataset de referencia como (tabla Arrow, vista pandas), o
+    None si no hay CSV de origen.
+
+    La vista pandas se comparte entre sesiones: es de solo lectura.
+    """
+    source = Path(source) if source else find_reference_source()
+    if source is None:
+        return None
+
+    signature = source_signature(source)
+    cache_path = CACHE_DIR / f"{source.stem}.arrow"
+    if not _cache_is_valid(cache_path, signature):
+        build_reference_cache(source, cache_path)
+    return _open_reference_dataset(str(cache_path), signature["size"], signature["mtime_ns"])
+
+
+def load_reference_dataset(source=None):
+    """
+    Devuelve la vista pandas del dataset de referencia o None si no hay origen.
+    """
+    loaded = load_reference_table(source)
+    return None if loaded is None else loaded[1]
@@ -0,0 +1,344 @@
+"""
+Drift de datos por variable frente a los histogramas de referencia del
+entrenamiento.
+
+Al exportar el bundle del modelo se calcula una vez, desde el dataset de
+referencia (data/processed/clean_telco.csv), un histograma por variable de
+entrada: una celda por categoría de FORM_OPTIONS y cortes por cuantiles en
+las numéricas, más una celda final para ausentes o desconocidos. Los
+histogramas se guardan en el bundle, concatenados en un único array.
+
+Cada lote puntuado se resume con los mismos cortes (un bincount por columna,
+sumable bloque a bloque en modo streaming) y PSI, KS (numéricas) y
+chi-cuadrado (categóricas) se calculan para todas las variables a la vez
+sobre los arrays concatenados. Los resultados se registran en
+logs/drift_scores.jsonl para el mapa de calor de Monitoreo.
+"""
+import json
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from config.config import DRIFT_CONFIG, FORM_OPTIONS, NUMERIC_RANGES
+from utils.bundle_utils import BUNDLE_DIR, MANIFEST_FILE, read_bundle_arrays, read_manifest
+from utils.model_utils import MODELS_DIR
+
+DRIFT_FEATURES = list(FORM_OPTIONS) + list(NUMERIC_RANGES)
+DRIFT_LOG = MODELS_DIR.parent / "logs" / "drift_scores.jsonl"
+REFERENCE_ARRAYS = ["reference_counts", "reference_offsets", "reference_edges", "reference_edge_offsets"]
+
+_LOG_LOCK = threading.Lock()
+
+
+class ReferenceProfile:
+    """
+    Histogramas de referencia de las variables de entrada.
+
+    counts concatena los histogramas de todas las variables; la variable i
+    ocupa counts[offsets[i]:offsets[i + 1]] y su última celda son los
+    ausentes o valores fuera del vocabulario.
+    """
+
+    def __init__(self, features: list, kinds: list, vocabularies: dict, edges: list,
+                 counts=None, source=None, means=None):
+        self.features = list(features)
+        self.kinds = list(kinds)
+        self.vocabularies = vocabularies
+        self.edges = [np.asarray(e, dtype=np.float64) for e in edges]
+        sizes = [len(vocabularies[f]) + 1 if kind == "categorical" else len(e) + 2
+                 for f, kind, e in zip(self.features, self.kinds, self.edges)]
+        self.offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+        self.counts = np.zeros(self.offsets[-1], dtype=np.int64) if counts is None \
+            else np.asarray(counts, dtype=np.int64)
+        self.source = source
+        # Medias exactas de las numéricas (los bundles anteriores no las guardan)
+        self.means = dict(means or {})
+        if len(self.counts) != self.offsets[-1]:
+            raise ValueError("Los histogramas de referencia no coinciden con sus variables")
+
+        self._segment = np.repeat(np.arange(len(self.features)), sizes)
+        # Celdas con valores observables (todas salvo la de ausentes)
+        self._value_cell = np.ones(len(self.counts), dtype=bool)
+        self._value_cell[self.offsets[1:] - 1] = False
+        self._numeric_cell = np.repeat(np.array([k == "numeric" for k in self.kinds]), sizes)
+        self._indexers = {f: pd.Index(v) for f, v in vocabularies.items()}
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, features=None, numeric_bins=None, source=None):
+        """
+        Calcula los histogramas de referencia de un dataset.
+
+        Args:
+            df: Dataset de referencia con las variables de entrada
+            features: Variables (por defecto DRIFT_FEATURES presentes)
+            numeric_bins: Tramos por cuantiles de las numéricas
+            source: Nombre del archivo de origen (se guarda en el manifiesto)
+        """
+        numeric_bins = numeric_bins or DRIFT_CONFIG['numeric_bins']
+        features = [f for f in (features or DRIFT_FEATURES) if f in df.columns]
+        kinds, vocabularies, edges, means = [], {}, [], {}
+        for feature in features:
+            if feature in FORM_OPTIONS:
+                kinds.append("categorical")
+                vocabularies[feature] = list(FORM_OPTIONS[feature])
+                edges.append([])
+            else:
+                values = pd.to_numeric(df[feature], errors="coerce").dropna().to_numpy(dtype=np.float64)
+                quantiles = np.linspace(0, 1, numeric_bins + 1)[1:-1]
+                kinds.append("numeric")
+                edges.append(np.unique(np.quantile(values, quantiles)) if len(values) else [])
+                if len(values):
+                    means[feature] = float(values.mean())
+        profile = cls(features, kinds, vocabularies, edges, source=source, means=means)
+        profile.counts = profile.batch_counts(df)
+        return profile
+
+    def batch_counts(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Histogramas de un lote con los cortes de referencia, concatenados.
+        Son sumables: los de varios bloques se agregan con +.
+        """
+        counts = np.zeros(len(self.counts), dtype=np.int64)
+        for i, (feature, kind) in enumerate(zip(self.features, self.kinds)):
+            start, end = self.offsets[i], self.offsets[i + 1]
+            missing_cell = end - start - 1
+            if feature not in df.columns:
+                counts[end - 1] = len(df)
+                continue
+            values = df[feature]
+            if kind == "categorical":
+                if isinstance(values.dtype, pd.CategoricalDtype):
+                    # Se traducen las categorías, no las filas
+                    mapping = self._indexers[feature].get_indexer(values.cat.categories)
+                    mapping = np.append(np.where(mapping < 0, missing_cell, mapping), missing_cell)
+                    cells = mapping[values.cat.codes.to_numpy()]
+                else:
+                    cells = self._indexers[feature].get_indexer(values)
+                    cells[cells < 0] = missing_cell
+            else:
+                array = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+                cells = np.searchsorted(self.edges[i], array, side="right")
+                cells[np.isnan(array)] = missing_cell
+            counts[start:end] = np.bincount(cells, minlength=end - start)
+        return counts
+
+    def drift(self, batch_counts: np.ndarray) -> pd.DataFrame:
+        """
+        PSI de todas las variables, KS de las numéricas y chi-cuadrado de las
+        categóricas, en una pasada sobre los histogramas concatenados.
+
+        Returns:
+            DataFrame indexado por variable con tipo, PSI, KS, Chi2 y p_valor
+        """
+        from scipy.stats import chi2
+
+        segment, n_features = self._segment, len(self.features)
+        reference = self.counts.astype(np.float64)
+        batch = np.asarray(batch_counts, dtype=np.float64)
+        ref_total = np.bincount(segment, reference, minlength=n_features)
+        batch_total = np.bincount(segment, batch, minlength=n_features)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ref_share = reference / ref_total[segment]
+            batch_share = batch / batch_total[segment]
+            eps = DRIFT_CONFIG['epsilon']
+            p, q = np.maximum(batch_share, eps), np.maximum(ref_share, eps)
+            psi = np.bincount(segment, (p - q) * np.log(p / q), minlength=n_features)
+
+            # KS sobre las CDF de las celdas con valor (sin ausentes) de las numéricas
+            ref_values = np.where(self._value_cell, reference, 0.0)
+            batch_values = np.where(self._value_cell, batch, 0.0)
+            ref_cdf = self._segment_cumsum(ref_values) / np.bincount(
+                segment, ref_values, minlength=n_features)[segment]
+            batch_cdf = self._segment_cumsum(batch_values) / np.bincount(
+                segment, batch_values, minlength=n_features)[segment]
+            gap = np.where(self._numeric_cell, np.nan_to_num(np.abs(batch_cdf - ref_cdf)), 0.0)
+            ks = np.maximum.reduceat(gap, self.offsets[:-1])
+
+            # Chi-cuadrado de bondad de ajuste en las celdas con frecuencia esperada
+            expected = ref_share * batch_total[segment]
+            observed_cell = ~self._numeric_cell & (expected > 0)
+            chi2_stat = np.bincount(
+                segment, np.where(observed_cell, (batch - expected) ** 2 / expected, 0.0),
+                minlength=n_features)
+            dof = np.bincount(segment, observed_cell, minlength=n_features) - 1
+
+        categorical = np.array([kind == "categorical" for kind in self.kinds])
+        valid_chi2 = categorical & (dof > 0)
+        p_value = np.full(n_features, np.nan)
+        p_value[valid_chi2] = chi2.sf(chi2_stat[valid_chi2], dof[valid_chi2])
+        return pd.DataFrame({
+            "tipo": self.kinds,
+            "PSI": psi,
+            "KS": np.where(categorical, np.nan, ks),
+            "Chi2": np.where(categorical, chi2_stat, np.nan),
+            "p_valor": p_value
+        }, index=pd.Index(self.features, name="Variable"))
+
+    def shares(self, feature: str) -> pd.Series:
+        """
+        Proporción de cada categoría de una variable categórica en la referencia.
+        """
+        i = self.features.index(feature)
+        counts = self.counts[self.offsets[i]:self.offsets[i + 1] - 1].astype(np.float64)
+        total = self.counts[self.offsets[i]:self.offsets[i + 1]].sum()
+        return pd.Series(counts / total if total else counts, index=self.vocabularies[feature], name=feature)
+
+    def expected_value(self, feature: str) -> float:
+        """
+        Media de una variable numérica (o categórica con valores numéricos,
+        como SeniorCitizen) en la referencia.
+
+        Sin media guardada se aproxima con el centro de cada tramo del
+        histograma, acotando los extremos con NUMERIC_RANGES.
+        """
+        if feature in self.means:
+            return self.means[feature]
+        i = self.features.index(feature)
+        if self.kinds[i] == "categorical":
+            shares = self.shares(feature)
+            return float(np.dot(shares.to_numpy(), np.asarray(shares.index, dtype=np.float64)))
+        limits = NUMERIC_RANGES.get(feature, {})
+        edges = self.edges[i]
+        lows = np.concatenate([[limits.get("min", edges[0] if len(edges) else 0.0)], edges])
+        highs = np.concatenate([edges, [limits.get("max", edges[-1] if len(edges) else 0.0)]])
+        counts = self.counts[self.offsets[i]:self.offsets[i + 1] - 1].astype(np.float64)
+        if counts.sum() == 0:
+            return float("nan")
+        return float(np.dot(counts, (lows + highs) / 2) / counts.sum())
+
+    def _segment_cumsum(self, values: np.ndarray) -> np.ndarray:
+        # Suma acumulada que se reinicia al comienzo de cada variable
+        cumulative = np.cumsum(values)
+        starts = np.concatenate([[0.0], cumulative])[self.offsets[:-1]]
+        return cumulative - starts[self._segment]
+
+    def to_arrays(self):
+        """
+        Arrays y metadatos para guardar el perfil en el bundle del modelo.
+
+        Returns:
+            tuple: (dict de arrays, dict para el manifiesto)
+        """
+        edge_sizes = [len(e) for e in self.edges]
+        arrays = {
+            "reference_counts": self.counts,
+            "reference_offsets": self.offsets,
+            "reference_edges": np.concatenate(self.edges) if sum(edge_sizes)
+            else np.zeros(0, dtype=np.float64),
+            "reference_edge_offsets": np.concatenate([[0], np.cumsum(edge_sizes)]).astype(np.int64)
+        }
+        meta = {
+            "features": self.features,
+            "kinds": self.kinds,
+            "vocabularies": self.vocabularies,
+            "source": self.source,
+            "means": self.means,
+            "rows": int(self.counts[:self.offsets[1]].sum()) if self.features else 0
+        }
+        return arrays, meta
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, meta: dict):
+        edge_offsets = arrays["reference_edge_offsets"]
+        edges = [np.asarray(arrays["reference_edges"][start:end])
+                 for start, end in zip(edge_offsets[:-1], edge_offsets[1:])]
+        return cls(meta["features"], meta["kinds"], meta["vocabularies"], edges,
+                   np.asarray(arrays["reference_counts"]), meta.get("source"), meta.get("means"))
+
+
+def build_reference_profile(source=None):
+    """
+    Calcula el perfil de referencia desde el dataset de entrenamiento.
+
+    Returns:
+        ReferenceProfile o None si no hay dataset de referencia
+    """
+    from utils.dataset_utils import find_reference_source
+    from utils.ingestion_utils import read_upload
+
+    source = Path(source) if source else find_reference_source()
+    if source is None:
+        return None
+    df = read_upload(source, DRIFT_FEATURES)
+    return ReferenceProfile.build(df, source=source.name)
+
+
+def read_reference_profile(models_dir=MODELS_DIR):
+    """
+    Perfil de referencia del bundle champion (o del bundle por defecto). Los
+    bundles exportados sin perfil lo calculan desde el dataset de referencia.
+    """
+    from utils.registry_utils import champion_bundle_dir
+
+    bundle_dir = champion_bundle_dir(models_dir) or Path(models_dir) / BUNDLE_DIR.name
+    if (bundle_dir / MANIFEST_FILE).exists():
+        manifest = read_manifest(bundle_dir)
+        if "reference_profile" in manifest:
+            arrays = read_bundle_arrays(bundle_dir, manifest, names=REFERENCE_ARRAYS)
+            return ReferenceProfile.from_arrays(arrays, manifest["reference_profile"])
+    return build_reference_profile()
+
+
+@st.cache_resource(show_spinner=False)
+def get_reference_profile(model_version=None):
+    """
+    Perfil de referencia compartido entre sesiones, por versión del champion.
+    """
+    return read_reference_profile()
+
+
+def drift_record(drift: pd.DataFrame, rows: int, batch=None, model_version=None) -> dict:
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "batch": batch,
+        "model_version": model_version,
+        "rows": int(rows),
+        "features": {
+            feature: {key: None if pd.isna(value) else round(float(value), 6)
+                      for key, value in values.items() if key != "tipo"}
+            for feature, values in drift.to_dict(orient="index").items()
+        }
+    }
+
+
+def append_drift_record(record: dict, drift_log=DRIFT_LOG):
+    """
+    Añade el drift de un lote al log JSONL (un fallo de escritura no
+    interrumpe el análisis).
+    """
+    drift_log = Path(drift_log)
+    try:
+        with _LOG_LOCK:
+            drift_log.parent.mkdir(parents=True, exist_ok=True)
+            with open(drift_log, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except OSError:
+        pass
+
+
+def load_drift_log(drift_log=DRIFT_LOG, last=None) -> pd.DataFrame:
+    """
+    Lee el log de drift con una fila por lote y variable.
+
+    Args:
+        last: Solo los últimos lotes registrados
+    """
+    drift_log = Path(drift_log)
+    if not drift_log.exists():
+        return pd.DataFrame()
+    with open(drift_log, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if last:
+        records = records[-last:]
+    rows = [{"timestamp": record["timestamp"], "batch": record["batch"], "rows": record["rows"],
+             "feature": feature, **scores}
+            for record in records for feature, scores in record["features"].items()]
+    df = pd.DataFrame(rows)
+    if not df.empty:
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+    return df
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+
+def category_codes(values: pd.Series, categories) -> np.ndarray:
+    """
+    Convierte una columna categórica en códigos enteros según el vocabulario dado.
+
+    Los valores desconocidos o nulos reciben el código -1.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Solo se remapea el vocabulario de la columna, no cada fila
+        mapping = pd.Index(categories).get_indexer(values.cat.categories)
+        mapping = np.append(mapping, -1)
+        return mapping[values.cat.codes.to_numpy()]
+    return pd.Categorical(values, categories=categories).codes
+
+
+def category_feature_index(categorical_columns, categories, feature_names):
+    """
+    Calcula, para cada columna categórica, la posición en feature_names de cada categoría.
+
+    Cada array tiene una posición final para el código -1. Las categorías sin
+    columna propia (la eliminada por drop='first') y las desconocidas valen -1.
+
+    Returns:
+        tuple: (lista de arrays de posiciones, lista de columnas numéricas)
+    """
+    feature_index = {name: i for i, name in enumerate(feature_names)}
+
+    index_maps = []
+    encoded_features = set()
+    for col, cats in zip(categorical_columns, categories):
+        positions = np.full(len(cats) + 1, -1, dtype=np.int64)
+        for j, cat in enumerate(cats):
+            name = f"{col}_{cat}"
+            if name in feature_index:
+                positions[j] = feature_index[name]
+                encoded_features.add(name)
+        index_maps.append(positions)
+
+    numeric_columns = [f for f in feature_names if f not in encoded_features]
+    return index_maps, numeric_columns
+
+
+def find_unknown_categories(data: pd.DataFrame, categorical_columns, categories) -> dict:
+    """
+    Busca valores que no pertenecen al vocabulario del encoder.
+
+    Returns:
+        dict columna -> lista de valores desconocidos (solo columnas con alguno)
+    """
+    unknown = {}
+    for col, cats in zip(categorical_columns, categories):
+        values = data[col]
+        mask = (category_codes(values, cats) < 0) & values.notna().to_numpy()
+        if mask.any():
+            unknown[col] = pd.unique(values[mask]).tolist()
+    return unknown
+
+
+def encode_features(data: pd.DataFrame, categorical_columns, feature_names, ohe,
+                    sparse=False, dtype=np.float32, handle_unknown=None):
+    """
+    Codifica los datos directamente en una matriz con las columnas de feature_names.
+
+    Las categóricas se convierten en códigos enteros contra las categorías
+    ajustadas del encoder y se escriben sin pasar por DataFrames intermedios.
+
+    Args:
+        data: DataFrame con los datos de entrada
+        categorical_columns: Lista de columnas categóricas
+        feature_names: Lista de nombres de features esperados
+        ohe: Encoder OneHotEncoder cargado
+        sparse: Si es True devuelve una matriz CSR
+        dtype: Tipo numérico de la matriz
+        handle_unknown: 'ignore' (fila en 0 para esa variable) o 'error';
+            por defecto el del encoder
+
+    Returns:
+        np.ndarray o scipy.sparse.csr_matrix de forma (filas, len(feature_names))
+    """
+    if handle_unknown is None:
+        handle_unknown = "error" if getattr(
+            ohe, "handle_unknown", "error") == "error" else "ignore"
+    if handle_unknown == "error":
+        unknown = find_unknown_categories(
+            data, categorical_columns, ohe.categories_)
+        if unknown:
+            raise ValueError(f"Categorías desconocidas: {unknown}")
+
+    index_maps, numeric_columns = category_feature_index(
+        categorical_columns, ohe.categories_, feature_names)
+    feature_index = {name: i for i, name in enumerate(feature_names)}
+
+    n_rows = len(data)
+
+    # Numéricas presentes en los datos; las ausentes quedan en 0
+    numeric_present = [col for col in numeric_columns if col in data.columns]
+    numeric_positions = np.array(
+        [feature_index[col] for col in numeric_present], dtype=np.int64)
+    numeric_values = data[numeric_present].to_numpy(dtype=dtype)
+
+    if not sparse:
+        matrix = np.zeros((n_rows, len(feature_names)), dtype=dtype)
+        matrix[:, numeric_positions] = numeric_values
+        for k, (col, cats) in enumerate(zip(categorical_columns, ohe.categories_)):
+            positions = index_maps[k][category_codes(data[col], cats)]
+            rows = np.flatnonzero(positions >= 0)
+            matrix[rows, positions[rows]] = 1
+        return matrix
+
+    from scipy import sparse as sp
+
+    # Posición de la columna activa de cada variable categórica (-1 si ninguna)
+    active = np.empty((n_rows, len(categorical_columns)), dtype=np.int32)
+    for k, (col, cats) in enumerate(zip(categorical_columns, ohe.categories_)):
+        active[:, k] = index_maps[k][category_codes(data[col], cats)]
+
+    active_mask = active >= 0
+    rows = np.concatenate([
+        np.repeat(np.arange(n_rows), len(numeric_present)),
+        np.nonzero(active_mask)[0]
+    ])
+    cols = np.concatenate([
+        np.tile(numeric_positions, n_rows),
+        active[active_mask]
+    ])
+    values = np.concatenate([
+        numeric_values.ravel(),
+        np.ones(active_mask.sum(), dtype=dtype)
+    ])
+    return sp.csr_matrix((values, (rows, cols)), shape=(n_rows, len(feature_names)), dtype=dtype)
@@ -0,0 +1,248 @@
+"""
+Motivos de riesgo por cliente a partir de las contribuciones del modelo lineal.
+
+En la regresión logística el logit es el intercepto más la suma de
+coeficiente × valor codificado de cada variable, de modo que la contribución
+de cada variable es exacta. Para que compare al cliente con la población de
+entrenamiento y no con la categoría eliminada por drop='first' o con el
+valor 0, se centra en el perfil de referencia del bundle: en una categórica
+es el peso de su categoría menos el peso esperado según las proporciones de
+entrenamiento y en una numérica coeficiente × (valor − media). Cada fila
+suma su logit menos el logit esperado de la referencia.
+
+La matriz de contribuciones se calcula con las tablas de LinearScoringKernel,
+sin codificar el one-hot, y los motivos de cada cliente son las k variables
+con mayor contribución positiva, elegidas con argpartition por bloques de filas.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from config.config import EXPLAIN_CONFIG, FORM_OPTIONS
+from utils.encoding_utils import category_codes
+from utils.translations import translation_dict, value_translation
+
+REASON_PREFIX = "Motivo_"
+
+
+def reason_columns(top_k=None) -> list:
+    """
+    Nombres de las columnas de motivos que se añaden al resultado.
+    """
+    return [f"{REASON_PREFIX}{i + 1}" for i in range(top_k or EXPLAIN_CONFIG['top_k'])]
+
+
+def baseline_contributions(kernel, reference_profile=None) -> np.ndarray:
+    """
+    Contribución esperada de cada variable en la población de referencia.
+
+    Args:
+        kernel: LinearScoringKernel del modelo
+        reference_profile: ReferenceProfile del entrenamiento (sin perfil,
+            o sin la variable en él, la referencia es 0)
+
+    Returns:
+        np.ndarray con una posición por variable (categóricas + numéricas)
+    """
+    baseline = np.zeros(len(kernel.categorical_columns) + len(kernel.numeric_columns))
+    if reference_profile is None:
+        return baseline
+    features = set(reference_profile.features)
+
+    for j, (col, cats, table) in enumerate(zip(kernel.categorical_columns, kernel.categories, kernel.tables)):
+        if col in features:
+            shares = reference_profile.shares(col)
+            # Las categorías que el kernel no conoce pesan 0 (última posición)
+            positions = pd.Index(cats).get_indexer(shares.index)
+            baseline[j] = np.dot(shares.to_numpy(), table[positions])
+
+    offset = len(kernel.categorical_columns)
+    for j, (col, weight) in enumerate(zip(kernel.numeric_columns, kernel.numeric_weights)):
+        if col in features:
+            mean = reference_profile.expected_value(col)
+            baseline[offset + j] = 0.0 if np.isnan(mean) else weight * mean
+    return baseline
+
+
+def contribution_matrix(kernel, data: pd.DataFrame, codes=None, baseline=None) -> np.ndarray:
+    """
+    Contribución exacta de cada variable al logit de cada fila.
+
+    Args:
+        kernel: LinearScoringKernel del modelo
+        data: DataFrame sin preprocesar
+        codes: Códigos de las categóricas ya calculados con category_codes (opcional)
+        baseline: Contribuciones de referencia de baseline_contributions (por
+            defecto 0: contribuciones sin centrar)
+
+    Returns:
+        np.ndarray de forma (filas, categóricas + numéricas); cada fila suma
+        el logit menos el intercepto y la suma de baseline
+    """
+    columns = kernel.categorical_columns + kernel.numeric_columns
+    baseline = np.zeros(len(columns)) if baseline is None else baseline
+    # Por columnas: cada variable se escribe en memoria contigua
+    contributions = np.zeros((len(data), len(columns)), dtype=np.float64, order="F")
+    if codes is None:
+        codes = [category_codes(data[col], cats)
+                 for col, cats in zip(kernel.categorical_columns, kernel.categories)]
+
+    for j, (col_codes, table) in enumerate(zip(codes, kernel.tables)):
+        # Se centra la tabla (una posición por categoría), no cada fila
+        contributions[:, j] = (table - baseline[j])[col_codes]
+
+    # Una numérica ausente equivale a la columna en 0; un nulo, a la media de referencia
+    offset = len(kernel.categorical_columns)
+    for j, (col, weight) in enumerate(zip(kernel.numeric_columns, kernel.numeric_weights)):
+        if col in data.columns:
+            values = data[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            contributions[:, offset + j] = np.nan_to_num(values * weight - baseline[offset + j])
+        else:
+            contributions[:, offset + j] = -baseline[offset + j]
+
+    return contributions
+
+
+class ReasonExplainer:
+    """
+    Calcula los k motivos principales de cada cliente de un lote.
+
+    Cada motivo es una celda de un vocabulario fijo (categórica y valor, o
+    numérica y sentido) con su nombre traducido, de modo que las columnas de
+    motivos son Categorical con las mismas categorías en todos los bloques.
+    Una numérica solo aumenta el riesgo en un sentido (por encima de la media
+    si su coeficiente es positivo, por debajo si es negativo), que se fija
+    en su etiqueta.
+    """
+
+    def __init__(self, kernel, reference_profile=None, top_k=None, block_rows=None):
+        self.kernel = kernel
+        self.top_k = min(top_k or EXPLAIN_CONFIG['top_k'],
+                         len(kernel.categorical_columns) + len(kernel.numeric_columns))
+        self.block_rows = block_rows or EXPLAIN_CONFIG['block_rows']
+        self.baseline = baseline_contributions(kernel, reference_profile)
+
+        # Una celda por categoría (más la de desconocidas) y una por numérica
+        labels = []
+        self.offsets = []
+        for col, cats in zip(kernel.categorical_columns, kernel.categories):
+            self.offsets.append(len(labels))
+            name = translation_dict.get(col, col)
+            labels.extend(f"{name}: {value_translation.get(str(value), value)}" for value in cats)
+            labels.append(f"{name}: otro valor")
+        for col, weight in zip(kernel.numeric_columns, kernel.numeric_weights):
+            self.offsets.append(len(labels))
+            labels.append(f"{translation_dict.get(col, col)}: {_direction_label(col, weight)}")
+        self.offsets = np.asarray(self.offsets, dtype=np.int16)
+        self.labels = pd.Index(labels)
+
+    def _cell_matrix(self, codes: list, rows: int) -> np.ndarray:
+        # Celda del vocabulario de cada fila y variable (fija en las numéricas)
+        cells = np.empty((rows, len(self.offsets)), dtype=np.int16, order="F")
+        for j, (col_codes, cats) in enumerate(zip(codes, self.kernel.categories)):
+            cells[:, j] = self.offsets[j] + np.where(col_codes < 0, len(cats), col_codes)
+        cells[:, len(codes):] = self.offsets[len(codes):]
+        return cells
+
+    def _block_reasons(self, data: pd.DataFrame) -> np.ndarray:
+        # Los códigos de las categóricas se calculan una vez por bloque
+        codes = [category_codes(data[col], cats)
+                 for col, cats in zip(self.kernel.categorical_columns, self.kernel.categories)]
+        contributions = contribution_matrix(self.kernel, data, codes, self.baseline)
+        k = self.top_k
+
+        # Las k mayores contribuciones sin ordenar toda la fila; luego se ordenan entre sí
+        top = np.argpartition(-contributions, k - 1, axis=1)[:, :k]
+        top_values = np.take_along_axis(contributions, top, axis=1)
+        order = np.argsort(-top_values, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_values = np.take_along_axis(top_values, order, axis=1)
+
+        reasons = np.take_along_axis(self._cell_matrix(codes, len(data)), top, axis=1)
+        # Una contribución que no aumenta el riesgo no es un motivo
+        reasons[top_values <= 0] = -1
+        return reasons
+
+    def reasons(self, data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Motivos de riesgo de cada fila, de mayor a menor contribución.
+
+        Returns:
+            DataFrame con las columnas Motivo_1..Motivo_k (Categorical; vacías
+            si la fila tiene menos de k contribuciones positivas)
+        """
+        codes = np.empty((len(data), self.top_k), dtype=np.int16)
+        for start in range(0, len(data), self.block_rows):
+            block = data.iloc[start:start + self.block_rows]
+            codes[start:start + len(block)] = self._block_reasons(block)
+
+        return pd.DataFrame({
+            col: pd.Categorical.from_codes(codes[:, i], categories=self.labels)
+            for i, col in enumerate(reason_columns(self.top_k))
+        }, index=data.index)
+
+    def explain_row(self, data: pd.DataFrame, row=0) -> pd.DataFrame:
+        """
+        Contribuciones de todas las variables de una fila frente a la
+        referencia, de mayor a menor (las mismas que usa reasons).
+
+        Returns:
+            DataFrame con Variable, Valor (como texto) y Contribucion
+        """
+        single = data.iloc[[row]]
+        columns = self.kernel.categorical_columns + self.kernel.numeric_columns
+        values = [single[col].iloc[0] if col in single.columns else "" for col in columns]
+        return pd.DataFrame({
+            "Variable": [translation_dict.get(col, col) for col in columns],
+            # Texto en todas las filas: categóricas y numéricas comparten la columna
+            "Valor": pd.Series([value_translation.get(str(value), value) for value in values],
+                               dtype=object).astype(str),
+            "Contribucion": contribution_matrix(self.kernel, single, baseline=self.baseline)[0]
+        }).sort_values("Contribucion", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def _direction_label(col: str, weight: float) -> str:
+    # Variables 0/1 del formulario (SeniorCitizen): el valor que aumenta el riesgo
+    if col in FORM_OPTIONS:
+        value = max(FORM_OPTIONS[col]) if weight > 0 else min(FORM_OPTIONS[col])
+        return {0: "No", 1: "Sí"}.get(value, str(value))
+    return "alto" if weight > 0 else "bajo"
+
+
+@st.cache_resource(show_spinner=False)
+def get_reason_explainer():
+    """
+    Explicador del modelo de load_model_components, compartido entre sesiones.
+
+    Returns:
+        ReasonExplainer o None si el modelo no es lineal
+    """
+    from utils.drift_utils import get_reference_profile
+    from utils.model_utils import load_model_components
+    from utils.scoring_utils import build_scoring_kernel
+
+    kernel = build_scoring_kernel(*load_model_components())
+    if kernel is None:
+        return None
+    return ReasonExplainer(kernel, get_reference_profile())
+
+
+def with_reasons(score_func, explainer):
+    """
+    Envuelve una función de scoring para añadir los motivos de riesgo al resultado.
+
+    Args:
+        score_func: Función que recibe datos sin preprocesar y devuelve el resultado de scoring
+        explainer: ReasonExplainer del modelo (None devuelve score_func sin cambios)
+    """
+    if explainer is None:
+        return score_func
+
+    def score_with_reasons(data):
+        scores = score_func(data)
+        if scores is None:
+            return None
+        reasons = explainer.reasons(data)
+        return scores.assign(**{col: reasons[col].values for col in reasons.columns})
+
+    return score_with_reasons
@@ -0,0 +1,203 @@
+"""
+Exportación de resultados de scoring por bloques a archivos temporales.
+
+Los resultados se escriben bloque a bloque (CSV comprimido, Parquet o
+Feather) en un directorio temporal privado del proceso (mkdtemp, solo
+accesible por su usuario) y se sirven desde disco. El archivo solo
+se genera cuando el usuario lo pide, de modo que no compite en memoria con el
+scoring ni se repite en cada rerun.
+"""
+import atexit
+import gzip
+import shutil
+import tempfile
+import time
+import uuid
+from functools import lru_cache
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from config.config import EXPORT_CONFIG
+
+EXPORT_FORMATS = {
+    "csv.gz": {"label": "CSV comprimido (.csv.gz)", "mime": "application/gzip"},
+    "parquet": {"label": "Parquet", "mime": "application/vnd.apache.parquet"},
+    "feather": {"label": "Feather (Arrow IPC)", "mime": "application/vnd.apache.arrow.file"},
+    "csv": {"label": "CSV", "mime": "text/csv"}
+}
+
+
+@lru_cache(maxsize=None)
+def private_temp_dir(name: str) -> Path:
+    """
+    Directorio temporal propio del proceso, creado con permisos 0700 y
+    eliminado al salir.
+
+    Args:
+        name: Prefijo del nombre del directorio
+
+    Returns:
+        Ruta del directorio (la misma en todas las llamadas con el mismo nombre)
+    """
+    path = Path(tempfile.mkdtemp(prefix=f"{name}_"))
+    atexit.register(shutil.rmtree, path, ignore_errors=True)
+    return path
+
+
+def export_directory(directory=None) -> Path:
+    """
+    Directorio de exportaciones: el indicado, el de EXPORT_CONFIG o, por
+    defecto, uno privado del proceso.
+    """
+    directory = directory or EXPORT_CONFIG['directory']
+    return Path(directory) if directory else private_temp_dir("churn_exports")
+
+
+def _plain_schema(schema: pa.Schema, keep_dictionaries: bool) -> pa.Schema:
+    """
+    Normaliza los tipos de diccionario para que todos los bloques compartan
+    esquema: índices int32 en Parquet y valores planos en Feather (el formato
+    de archivo IPC no admite diccionarios distintos por bloque).
+    """
+    fields = []
+    for field in schema:
+        if pa.types.is_dictionary(field.type):
+            value_type = field.type.value_type
+            field = field.with_type(pa.dictionary(pa.int32(), value_type)
+                                    if keep_dictionaries else value_type)
+        fields.append(field)
+    return pa.schema(fields)
+
+
+class ExportWriter:
+    """
+    Escribe bloques de resultados (DataFrame, Table o RecordBatch) en un archivo.
+
+    Uso:
+        with ExportWriter(path, "parquet") as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+    """
+
+    def __init__(self, path, export_format: str):
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Formato de exportación no soportado: {export_format}")
+        self.path = Path(path)
+        self.export_format = export_format
+        self.rows = 0
+        self._sink = None
+        self._schema = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, chunk):
+        if self.export_format in ("csv", "csv.gz"):
+            if not isinstance(chunk, pd.DataFrame):
+                chunk = chunk.to_pandas()
+            if self._sink is None:
+                self._sink = gzip.open(self.path, "wb", compresslevel=EXPORT_CONFIG['gzip_level']) \
+                    if self.export_format == "csv.gz" else open(self.path, "wb")
+            # Cada bloque se serializa entero y se escribe de una vez: escribir
+            # fila a fila sobre el flujo gzip es varias veces más lento
+            self._sink.write(chunk.to_csv(header=self.rows == 0, index=False).encode("utf-8"))
+            self.rows += len(chunk)
+            return
+
+        if isinstance(chunk, pd.DataFrame):
+            chunk = pa.Table.from_pandas(chunk, preserve_index=False)
+        elif isinstance(chunk, pa.RecordBatch):
+            chunk = pa.Table.from_batches([chunk])
+
+        if self._sink is None:
+            self._schema = _plain_schema(chunk.schema, self.export_format == "parquet")
+            if self.export_format == "parquet":
+                self._sink = pq.ParquetWriter(self.path, self._schema,
+                                              compression=EXPORT_CONFIG['compression'])
+            else:
+                self._sink = pa.ipc.new_file(
+                    str(self.path), self._schema,
+                    options=pa.ipc.IpcWriteOptions(compression=EXPORT_CONFIG['compression']))
+        self._sink.write_table(chunk.select(self._schema.names).cast(self._schema))
+        self.rows += chunk.num_rows
+
+    def close(self):
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+
+def iter_result_chunks(source, chunk_rows=None):
+    """
+    Recorre los resultados por bloques sin materializarlos completos.
+
+    Args:
+        source: DataFrame en memoria o ruta a un Parquet de resultados
+        chunk_rows: Filas por bloque (por defecto EXPORT_CONFIG)
+
+    Yields:
+        DataFrame o RecordBatch con hasta chunk_rows filas
+    """
+    chunk_rows = chunk_rows or EXPORT_CONFIG['chunk_rows']
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunk_rows):
+            yield source.iloc[start:start + chunk_rows]
+    else:
+        yield from pq.ParquetFile(source).iter_batches(batch_size=chunk_rows)
+
+
+def export_file_name(export_format: str, stem="predicciones_churn") -> str:
+    return f"{stem}.{export_format}"
+
+
+def cleanup_exports(directory=None, max_age_seconds=None):
+    """
+    Elimina los archivos exportados más antiguos que max_age_seconds.
+    """
+    directory = export_directory(directory)
+    max_age_seconds = EXPORT_CONFIG['max_age_seconds'] if max_age_seconds is None \
+        else max_age_seconds
+    if not directory.exists():
+        return
+    cutoff = time.time() - max_age_seconds
+    for path in directory.iterdir():
+        if path.is_file() and path.stat().st_mtime < cutoff:
+            path.unlink(missing_ok=True)
+
+
+def new_export_path(export_format: str, directory=None, stem="predicciones_churn") -> Path:
+    """
+    Ruta única en el directorio de exportaciones para un archivo nuevo.
+    """
+    directory = export_directory(directory)
+    directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+    return directory / export_file_name(export_format, f"{stem}_{uuid.uuid4().hex}")
+
+
+def export_results(source, export_format: str, chunk_rows=None, directory=None,
+                   stem="predicciones_churn") -> Path:
+    """
+    Escribe los resultados en un archivo temporal del formato elegido.
+
+    Args:
+        source: DataFrame en memoria o ruta a un Parquet de resultados
+        export_format: Una de las claves de EXPORT_FORMATS
+        stem: Prefijo del nombre del archivo
+
+    Returns:
+        Ruta del archivo generado
+    """
+    cleanup_exports(directory)
+    path = new_export_path(export_format, directory, stem)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with ExportWriter(tmp_path, export_format) as writer:
+        for chunk in iter_result_chunks(source, chunk_rows):
+            writer.write(chunk)
+    tmp_path.replace(path)
+    return path
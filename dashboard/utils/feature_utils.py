@@ -0,0 +1,109 @@
+"""
+Variables derivadas a partir de exportaciones crudas de Telco.
+
+Reproduce de forma vectorizada el preprocesamiento del notebook
+01_preprocessing: TotalCharges numérico (los textos no numéricos se dejan
+para la validación de filas), "No internet service" y
+"No phone service" normalizados a "No", tenure_group por tramos de tenure y
+MultipleServices como número de servicios contratados. Las columnas que ya
+vienen en el archivo no se recalculan y el resto (p. ej. customerID) se
+conserva tal cual.
+"""
+import numpy as np
+import pandas as pd
+
+from config.config import FORM_OPTIONS
+
+NO_SERVICE_REPLACEMENTS = {
+    'OnlineSecurity': {'No internet service': 'No'},
+    'OnlineBackup': {'No internet service': 'No'},
+    'DeviceProtection': {'No internet service': 'No'},
+    'TechSupport': {'No internet service': 'No'},
+    'StreamingTV': {'No internet service': 'No'},
+    'StreamingMovies': {'No internet service': 'No'},
+    'MultipleLines': {'No phone service': 'No'}
+}
+
+TENURE_BINS = [0, 6, 12, 24, 48, 72]
+TENURE_LABELS = FORM_OPTIONS['tenure_group']
+
+SERVICE_COLUMNS = ['PhoneService', 'InternetService', 'OnlineSecurity', 'OnlineBackup',
+                   'DeviceProtection', 'TechSupport', 'StreamingTV', 'StreamingMovies']
+
+# Variable derivada -> columnas de origen necesarias
+DERIVED_FEATURES = {
+    'tenure_group': ['tenure'],
+    'MultipleServices': SERVICE_COLUMNS
+}
+
+
+def missing_input_columns(available, required_cols) -> list:
+    """
+    Columnas requeridas que faltan y que tampoco se pueden derivar.
+    """
+    available = set(available)
+    return [col for col in required_cols if col not in available and not (
+        col in DERIVED_FEATURES and all(src in available for src in DERIVED_FEATURES[col]))]
+
+
+def replace_values(values: pd.Series, mapping: dict) -> pd.Series:
+    """
+    Sustituye valores sin recorrer filas: en categóricas se remapean las
+    categorías y se reindexan los códigos.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = values.cat.categories
+        if not categories.isin(list(mapping)).any():
+            return values
+        new_codes, new_categories = pd.factorize(categories.map(lambda v: mapping.get(v, v)))
+        codes = values.cat.codes.to_numpy()
+        remapped = np.where(codes >= 0, new_codes[codes], -1)
+        return pd.Series(pd.Categorical.from_codes(remapped, new_categories),
+                         index=values.index, name=values.name)
+    if not values.isin(list(mapping)).any():
+        return values
+    return values.replace(mapping)
+
+
+def derive_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convierte una exportación cruda en las variables que espera el modelo.
+
+    Args:
+        df: Datos crudos (las columnas ausentes se ignoran)
+
+    Returns:
+        DataFrame con las variables normalizadas y derivadas
+    """
+    updates = {}
+
+    if "TotalCharges" in df.columns and not pd.api.types.is_numeric_dtype(df["TotalCharges"]):
+        # Vacío o espacios en los clientes nuevos: quedan como nulos. Otros textos
+        # se conservan para que la validación los marque como no numéricos
+        values = df["TotalCharges"]
+        blank = values.astype("string").str.strip().eq("").fillna(False).to_numpy(dtype=bool)
+        numeric = pd.to_numeric(values.mask(blank), errors="coerce")
+        convertible = numeric.notna().to_numpy() | values.isna().to_numpy() | blank
+        updates["TotalCharges"] = numeric if convertible.all() else values.mask(blank)
+
+    for col, mapping in NO_SERVICE_REPLACEMENTS.items():
+        if col in df.columns:
+            values = df[col]
+            replaced = replace_values(values, mapping)
+            if replaced is not values:
+                updates[col] = replaced
+
+    def column(col):
+        return updates[col] if col in updates else df[col]
+
+    if "tenure_group" not in df.columns and "tenure" in df.columns:
+        tenure = pd.to_numeric(df["tenure"], errors="coerce")
+        updates["tenure_group"] = pd.cut(tenure, bins=TENURE_BINS, labels=TENURE_LABELS)
+
+    if "MultipleServices" not in df.columns and all(col in df.columns for col in SERVICE_COLUMNS):
+        services = np.zeros(len(df), dtype=np.int64)
+        for col in SERVICE_COLUMNS:
+            services += (column(col) == "Yes").to_numpy(dtype=np.int64)
+        updates["MultipleServices"] = services
+
+    return df.assign(**updates) if updates else df
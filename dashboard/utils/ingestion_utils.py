@@ -0,0 +1,293 @@
+"""
+Lectura tipada de archivos de clientes (CSV, Parquet y Feather).
+
+Se leen solo las columnas que usa el modelo más el identificador, con un
+esquema explícito derivado de FORM_OPTIONS y NUMERIC_RANGES: las categóricas
+llegan como Categorical con el vocabulario de los formularios y las numéricas
+con su tipo final, sin inferencia ni columnas object intermedias. El CSV se
+analiza con el lector multihilo de pyarrow. Las exportaciones crudas, sin
+tenure_group ni MultipleServices, pasan por utils.feature_utils.
+
+Benchmark frente al lector anterior (desde la carpeta dashboard/):
+    python -m utils.ingestion_utils clientes.csv
+"""
+import argparse
+import csv
+import time
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from config.config import FORM_OPTIONS, NUMERIC_RANGES
+from utils.dataset_utils import CATEGORY_VOCABULARIES, encode_category
+from utils.feature_utils import derive_features, missing_input_columns
+
+ID_COLUMN = "customerID"
+INPUT_FORMATS = {".csv": "csv", ".parquet": "parquet", ".feather": "feather", ".arrow": "feather"}
+UPLOAD_TYPES = [suffix.lstrip(".") for suffix in INPUT_FORMATS]
+NULL_VALUES = ["", " ", "NA", "NaN", "nan", "null"]
+
+
+def column_type(col: str) -> pa.DataType:
+    """
+    Tipo Arrow de una columna de entrada según la configuración de formularios.
+    """
+    if col in CATEGORY_VOCABULARIES:
+        return pa.dictionary(pa.int32(), pa.string())
+    if col in FORM_OPTIONS:
+        # Opciones numéricas (p. ej. SeniorCitizen 0/1)
+        return pa.int8()
+    if col in NUMERIC_RANGES:
+        is_float = any(isinstance(NUMERIC_RANGES[col][key], float) for key in ("min", "max"))
+        return pa.float64() if is_float else pa.int32()
+    if col == ID_COLUMN:
+        return pa.string()
+    return None
+
+
+def input_schema(columns, numeric_as_text=False) -> dict:
+    """
+    Tipos explícitos de las columnas conocidas (las demás se infieren).
+
+    Con numeric_as_text las numéricas se leen como texto y se convierten
+    después, de modo que un valor no numérico no hace fallar la lectura.
+    """
+    schema = {col: column_type(col) for col in columns if column_type(col) is not None}
+    if numeric_as_text:
+        schema = {col: pa.string() if pa.types.is_integer(dtype) or pa.types.is_floating(dtype)
+                  else dtype for col, dtype in schema.items()}
+    return schema
+
+
+def detect_format(file_obj, name=None) -> str:
+    """
+    Formato de entrada según la extensión del nombre (CSV por defecto).
+    """
+    name = name or getattr(file_obj, "name", None) or str(file_obj)
+    return INPUT_FORMATS.get(Path(name).suffix.lower(), "csv")
+
+
+def _csv_header(file_obj) -> list:
+    if isinstance(file_obj, (str, Path)):
+        with open(file_obj, newline="", encoding="utf-8-sig") as f:
+            return next(csv.reader(f), [])
+    position = file_obj.tell()
+    line = file_obj.readline()
+    file_obj.seek(position)
+    if isinstance(line, bytes):
+        line = line.decode("utf-8-sig")
+    return next(csv.reader([line]), [])
+
+
+def available_columns(file_obj, input_format: str) -> list:
+    """
+    Columnas presentes en el archivo, sin leer sus datos.
+    """
+    if input_format == "csv":
+        return _csv_header(file_obj)
+    if input_format == "parquet":
+        return pq.ParquetFile(file_obj).schema_arrow.names
+    return pa.ipc.open_file(file_obj).schema.names
+
+
+def select_columns(available: list, required_cols: list) -> list:
+    """
+    Columnas que se leen: el identificador y las requeridas presentes.
+    """
+    wanted = ([ID_COLUMN] if ID_COLUMN not in required_cols else []) + list(required_cols)
+    present = set(available)
+    return [col for col in wanted if col in present]
+
+
+def _csv_options(columns: list, block_size=None, numeric_as_text=False):
+    read_options = pv.ReadOptions(use_threads=True, **({"block_size": block_size} if block_size else {}))
+    convert_options = pv.ConvertOptions(
+        column_types=input_schema(columns, numeric_as_text), include_columns=columns,
+        null_values=NULL_VALUES, strings_can_be_null=True)
+    return read_options, convert_options
+
+
+def type_input_table(table):
+    """
+    Aplica el esquema de entrada a una tabla o bloque ya leído: categóricas con
+    el vocabulario de FORM_OPTIONS y numéricas con su tipo final.
+
+    Una numérica que no se puede convertir se deja como está para que la
+    validación de filas marque los valores inválidos.
+    """
+    if isinstance(table, pa.RecordBatch):
+        table = pa.Table.from_batches([table])
+    columns = []
+    for name in table.column_names:
+        column = table[name]
+        if name in CATEGORY_VOCABULARIES:
+            if not (pa.types.is_string(column.type) or pa.types.is_large_string(column.type)
+                    or pa.types.is_dictionary(column.type)):
+                column = column.cast(pa.string())
+            column = encode_category(column, CATEGORY_VOCABULARIES[name])
+        elif column_type(name) is not None and column.type != column_type(name):
+            try:
+                column = column.cast(column_type(name))
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                pass
+        columns.append(column)
+    return pa.table(columns, names=table.column_names)
+
+
+def _to_pandas(table: pa.Table) -> pd.DataFrame:
+    # Las exportaciones crudas llegan sin tenure_group ni MultipleServices
+    return derive_features(type_input_table(table).to_pandas(split_blocks=True, self_destruct=True))
+
+
+def read_upload(file_obj, required_cols: list, name=None) -> pd.DataFrame:
+    """
+    Lee un archivo de clientes completo con el esquema de entrada.
+
+    Args:
+        file_obj: Archivo subido, archivo abierto o ruta (CSV, Parquet o Feather)
+        required_cols: Columnas que usa el modelo
+        name: Nombre del archivo, para detectar el formato
+
+    Returns:
+        DataFrame con las columnas requeridas presentes y el identificador;
+        las que falten se detectan después con validate_uploaded_dataframe
+    """
+    input_format = detect_format(file_obj, name)
+    columns = select_columns(available_columns(file_obj, input_format), required_cols)
+    try:
+        if input_format == "csv":
+            try:
+                read_options, convert_options = _csv_options(columns)
+                table = pv.read_csv(file_obj, read_options=read_options,
+                                    convert_options=convert_options)
+            except pa.ArrowInvalid:
+                # Algún valor no numérico: se relee con las numéricas como texto
+                if hasattr(file_obj, "seek"):
+                    file_obj.seek(0)
+                read_options, convert_options = _csv_options(columns, numeric_as_text=True)
+                table = pv.read_csv(file_obj, read_options=read_options,
+                                    convert_options=convert_options)
+        elif input_format == "parquet":
+            table = pq.read_table(file_obj, columns=columns)
+        else:
+            table = feather.read_table(file_obj, columns=columns)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as exc:
+        raise ValueError(f"No se pudo leer el archivo: {exc}") from exc
+    return _to_pandas(table)
+
+
+def iter_upload_chunks(file_obj, required_cols: list, chunk_size: int, name=None):
+    """
+    Lee un archivo de clientes por bloques con el esquema de entrada.
+
+    Yields:
+        DataFrame por bloque (los bloques de CSV siguen el tamaño de lectura
+        de pyarrow, aproximado a chunk_size filas)
+
+    Raises:
+        ValueError: Si faltan columnas requeridas
+    """
+    input_format = detect_format(file_obj, name)
+    available = available_columns(file_obj, input_format)
+    missing_cols = missing_input_columns(available, required_cols)
+    if missing_cols:
+        raise ValueError(f"Faltan columnas: {missing_cols}")
+    columns = select_columns(available, required_cols)
+
+    if input_format == "csv":
+        # Bloque de lectura en bytes: unos 16 bytes por campo de cada fila. Las
+        # numéricas se convierten por bloque: un valor inválido no corta la lectura
+        block_size = max(1 << 20, chunk_size * 16 * len(columns))
+        read_options, convert_options = _csv_options(columns, block_size, numeric_as_text=True)
+        reader = pv.open_csv(file_obj, read_options=read_options,
+                             convert_options=convert_options)
+        try:
+            for batch in reader:
+                yield _to_pandas(pa.Table.from_batches([batch]))
+        finally:
+            reader.close()
+    elif input_format == "parquet":
+        for batch in pq.ParquetFile(file_obj).iter_batches(batch_size=chunk_size, columns=columns):
+            yield _to_pandas(pa.Table.from_batches([batch]))
+    else:
+        # Se descomprime un record batch cada vez, no el archivo completo; los
+        # batches se reagrupan en bloques de chunk_size filas
+        reader = pa.ipc.open_file(file_obj)
+        pending, rows = [], 0
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i).select(columns)
+            pending.append(batch)
+            rows += batch.num_rows
+            if rows < chunk_size:
+                continue
+            table = pa.Table.from_batches(pending)
+            start = 0
+            while rows - start >= chunk_size:
+                yield _to_pandas(table.slice(start, chunk_size))
+                start += chunk_size
+            pending = table.slice(start).to_batches()
+            rows -= start
+        if rows:
+            yield _to_pandas(pa.Table.from_batches(pending))
+
+
+def _benchmark_reader(reader: str, path: str, required_cols: list) -> dict:
+    # Se ejecuta en un proceso nuevo para medir el pico de memoria de cada lector
+    import resource
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if reader == "pandas":
+        df = pd.read_csv(path)
+    elif reader == "pandas_category":
+        df = pd.read_csv(path, dtype={col: "category" for col in CATEGORY_VOCABULARIES})
+    else:
+        df = read_upload(path, required_cols)
+    seconds = time.perf_counter() - start
+    peak_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    return {
+        "lector": reader,
+        "filas": len(df),
+        "segundos": round(seconds, 2),
+        "memoria_df_mb": round(df.memory_usage(index=True, deep=True).sum() / 2 ** 20, 1),
+        "pico_rss_mb": round(peak_kib / 1024, 1)
+    }
+
+
+def benchmark_ingestion(path, required_cols: list, readers=("pandas", "pandas_category", "arrow")):
+    """
+    Compara tiempo y memoria del lector anterior (pandas sin tipos), pandas
+    con categóricas y la lectura tipada con pyarrow.
+
+    Returns:
+        DataFrame con una fila por lector
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    rows = []
+    for reader in readers:
+        with ProcessPoolExecutor(max_workers=1,
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            rows.append(pool.submit(_benchmark_reader, reader, str(path), list(required_cols)).result())
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    from utils.bulk_analysis_utils import get_example_dataframe
+
+    parser = argparse.ArgumentParser(
+        description="Compara la lectura tipada con pyarrow frente a pandas.read_csv.")
+    parser.add_argument("input", type=Path, help="CSV de clientes")
+    args = parser.parse_args(argv)
+
+    required_cols = get_example_dataframe().columns.tolist()
+    print(benchmark_ingestion(args.input, required_cols).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,23 @@
-import pandas as pd
 import numpy as np
-import plotly.express as px
-from pathlib import Path
+import pandas as pd
 import streamlit as st
 
+from config.config import CHART_CONFIG
+from utils.chart_utils import binned_histogram_figure, category_bar_figure, quantile_box_figure
+from utils.cube_utils import build_aggregation_cube
+from utils.dataset_utils import find_reference_source, load_reference_dataset, source_signature
+from utils.explain_utils import reason_columns
+from utils.store_utils import get_batch_store
+
+
+# Columnas de resultado que no se exploran como variables
+ANALYSIS_EXCLUDED = ("customerID", "Probabilidad_Churn", "Prediccion", "Nivel_Riesgo", *reason_columns())
+
 
 def load_fallback_dataset() -> pd.DataFrame:
-    base_dir = Path(__file__).resolve().parents[2]
-    candidates = [
-        base_dir / "data" / "processed" / "clean_telco.csv",
-        base_dir / "data" / "raw" / "telco_churn.csv",
-    ]
-    for path in candidates:
-        if path.exists():
-            try:
-                return pd.read_csv(path)
-            except Exception:
-                continue
+    df_ = load_reference_dataset()
+    if df_ is not None:
+        return df_
 
     # Hardcoded fallback data
     data = [
@@ -39,20 +40,43 @@ def load_fallback_dataset() -> pd.DataFrame:
     return pd.DataFrame(data, columns=cols)
 
 
-def get_analysis_dataframe() -> pd.DataFrame:
-    if "batch_results" in st.session_state:
-        df_ = st.session_state["batch_results"].copy()
-    else:
-        df_ = load_fallback_dataset()
+def get_analysis_dataframe(batch_id=None) -> pd.DataFrame:
+    """
+    Devuelve el lote puntuado publicado con batch_id (vista compartida, de
+    solo lectura) o, si no existe, el dataset de referencia.
+    """
+    store = get_batch_store()
+    if batch_id is not None and batch_id in store:
+        return store.get_frame(batch_id)
 
+    df_ = load_fallback_dataset()
     if "Churn" not in df_.columns:
-        if "Prediccion" in df_.columns:
-            df_["Churn"] = np.where(df_["Prediccion"] == 1, "Yes", "No")
-        else:
-            df_["Churn"] = "No"
+        # La vista de referencia es compartida: no se modifica en sitio
+        df_ = df_.assign(Churn="No")
     return df_
 
 
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _reference_cube(source_key):
+    # source_key identifica la versión del dataset de referencia
+    return build_aggregation_cube(load_fallback_dataset(), exclude=ANALYSIS_EXCLUDED)
+
+
+def get_analysis_cube(batch_id=None):
+    """
+    Devuelve el cubo de agregados del lote publicado o del dataset de
+    referencia, calculado una sola vez por dataset.
+    """
+    store = get_batch_store()
+    if batch_id is not None and batch_id in store:
+        return store.get_derived(batch_id, "cube", lambda df_: build_aggregation_cube(
+            df_, exclude=ANALYSIS_EXCLUDED))
+
+    source = find_reference_source()
+    source_key = tuple(source_signature(source).values()) if source else None
+    return _reference_cube(source_key)
+
+
 def map_columns(df_original: pd.DataFrame, df_translated: pd.DataFrame):
     col_map = {k: v for k, v in zip(
         df_original.columns, df_translated.columns)}
@@ -67,6 +91,8 @@ def summarize_feature_importance(df_feat_imp: pd.DataFrame):
 
 
 def plot_feature_importance(df_feat_imp: pd.DataFrame):
+    import plotly.express as px
+
     fig = px.bar(
         df_feat_imp,
         x="Abs_Coefficient",
@@ -82,38 +108,33 @@ def plot_feature_importance(df_feat_imp: pd.DataFrame):
     st.plotly_chart(fig, use_container_width=True)
 
 
-def plot_variable_distribution(df_original: pd.DataFrame, df_translated: pd.DataFrame, selected_var: str, selected_var_original: str):
-    is_numeric = pd.api.types.is_numeric_dtype(
-        df_original[selected_var_original])
+def plot_variable_distribution(cube, selected_var: str, selected_var_original: str):
+    max_categories = CHART_CONFIG['max_categories']
 
     col_left, col_right = st.columns(2)
     with col_left:
         st.markdown(f"**Distribución de {selected_var}**")
-        if is_numeric:
-            fig_all = px.histogram(df_translated, x=selected_var, nbins=30)
+        if cube.is_numeric(selected_var_original):
+            hist = cube.numeric[selected_var_original]
+            fig_all = binned_histogram_figure(hist["counts"], hist["edges"], x_title=selected_var)
         else:
-            count_series = df_translated[selected_var].value_counts(
-            ).reset_index()
+            count_series = cube.category_counts(selected_var_original, max_categories).reset_index()
             count_series.columns = [selected_var, "Cantidad"]
-            fig_all = px.bar(count_series, x=selected_var, y="Cantidad")
+            fig_all = category_bar_figure(count_series, x=selected_var, y="Cantidad")
         st.plotly_chart(fig_all, use_container_width=True)
 
     with col_right:
         st.markdown(f"**{selected_var} por Churn**")
         churn_col = "Churn"
         if selected_var != churn_col:
-            if is_numeric:
-                fig_seg = px.box(df_translated, x=churn_col,
-                                 y=selected_var, color=churn_col)
+            if cube.is_numeric(selected_var_original):
+                # Box plot a partir de los cuantiles precalculados
+                fig_seg = quantile_box_figure(cube.numeric[selected_var_original]["stats"],
+                                              x_title=churn_col, y_title=selected_var)
             else:
-                seg_df = (
-                    df_translated.groupby([selected_var, churn_col])
-                    .size()
-                    .reset_index(name="Cantidad")
-                )
-                seg_df["Pct"] = seg_df.groupby([selected_var])[
-                    "Cantidad"].transform(lambda g: g / g.sum() * 100)
-                fig_seg = px.bar(
+                seg_df = cube.category_shares(selected_var_original, max_categories)
+                seg_df.columns = [selected_var, churn_col, "Cantidad", "Pct"]
+                fig_seg = category_bar_figure(
                     seg_df,
                     x=selected_var,
                     y="Pct",
@@ -124,14 +145,11 @@ def plot_variable_distribution(df_original: pd.DataFrame, df_translated: pd.Data
             st.plotly_chart(fig_seg, use_container_width=True)
 
 
-def plot_segment_comparison(df_translated: pd.DataFrame, seg_col: str):
-    seg_rate = (
-        df_translated.groupby(seg_col)["Churn"]
-        .apply(lambda s: (s == "Yes").mean() * 100)
-        .reset_index(name="Tasa Churn")
-    )
-    fig_seg_rate = px.bar(seg_rate, x=seg_col,
-                          y="Tasa Churn", text="Tasa Churn")
+def plot_segment_comparison(cube, seg_col: str, seg_col_original: str):
+    seg_rate = cube.segment_rates(seg_col_original, CHART_CONFIG['max_categories']).reset_index()
+    seg_rate.columns = [seg_col, "Tasa Churn"]
+    fig_seg_rate = category_bar_figure(seg_rate, x=seg_col,
+                                       y="Tasa Churn", text="Tasa Churn")
     fig_seg_rate.update_traces(
         texttemplate="%{text:.1f}%", textposition="outside")
     st.plotly_chart(fig_seg_rate, use_container_width=True)
@@ -3,32 +3,65 @@ import pandas as pd
 import numpy as np
 import streamlit as st
 from pathlib import Path
+from config.config import RISK_LEVELS
+from utils.encoding_utils import encode_features
+from utils.validation_utils import validate_rows
 
 # Configurar rutas relativas
 BASE_DIR = Path(__file__).parent.parent.parent
 MODELS_DIR = BASE_DIR / "models"
 
+# Presentación de cada nivel de riesgo
+RISK_DETAILS = {
+    "BAJO": {
+        "color": "green",
+        "recommendation": "Cliente estable. Continuar con servicio regular."
+    },
+    "MEDIO": {
+        "color": "orange",
+        "recommendation": "Cliente en riesgo moderado. Considerar ofertas de retención."
+    },
+    "ALTO": {
+        "color": "red",
+        "recommendation": "Cliente en alto riesgo. Acción inmediata requerida."
+    }
+}
 
-@st.cache_resource
-def load_model_components():
+
+def read_model_components(models_dir=MODELS_DIR):
     """
-    Carga todos los componentes del modelo entrenado, incluyendo el encoder OneHotEncoder.
+    Lee los componentes del modelo desde disco sin depender de Streamlit.
+
+    Args:
+        models_dir: Carpeta con los artefactos del modelo
+
+    Returns:
+        tuple: (modelo, columnas categóricas, nombres de features, encoder)
     """
-    try:
-        # Cargar modelo
-        model = joblib.load(MODELS_DIR / "churn_model.pkl")
+    models_dir = Path(models_dir)
+
+    # Cargar modelo
+    model = joblib.load(models_dir / "churn_model.pkl")
 
-        # Cargar columnas categóricas
-        categorical_columns = joblib.load(
-            MODELS_DIR / "categorical_columns.pkl")
+    # Cargar columnas categóricas
+    categorical_columns = joblib.load(models_dir / "categorical_columns.pkl")
 
-        # Cargar nombres de features
-        feature_names = joblib.load(MODELS_DIR / "feature_names.pkl")
+    # Cargar nombres de features
+    feature_names = joblib.load(models_dir / "feature_names.pkl")
 
-        # Cargar encoder OneHotEncoder
-        ohe = joblib.load(MODELS_DIR / "ohe_encoder.pkl")
+    # Cargar encoder OneHotEncoder
+    ohe = joblib.load(models_dir / "ohe_encoder.pkl")
 
-        return model, categorical_columns, feature_names, ohe
+    return model, categorical_columns, feature_names, ohe
+
+
+@st.cache_resource
+def load_model_components():
+    """
+    Carga todos los componentes del modelo entrenado, incluyendo el encoder OneHotEncoder.
+    """
+    try:
+        return read_model_components()
 
     except FileNotFoundError as e:
         st.error(f"No se encontraron los archivos del modelo: {e}")
@@ -51,28 +84,9 @@ def preprocess_input(data, categorical_columns, feature_names, ohe):
     Returns:
         DataFrame procesado listo para predicción
     """
-    processed_data = data.copy()
-
-    # Separar categóricas y numéricas
-    data_cat = processed_data[categorical_columns]
-    data_num = processed_data.drop(columns=categorical_columns)
-
-    # Transformar categóricas con el encoder
-    cat_encoded = ohe.transform(data_cat)
-    cat_encoded_df = pd.DataFrame(cat_encoded, columns=ohe.get_feature_names_out(
-        categorical_columns), index=processed_data.index)
-
-    # Unir variables numéricas y categóricas codificadas
-    processed_data = pd.concat([data_num, cat_encoded_df], axis=1)
-
-    # Añadir columnas que falten y poner en orden correcto
-    for col in feature_names:
-        if col not in processed_data.columns:
-            processed_data[col] = 0
-
-    processed_data = processed_data[feature_names]
-
-    return processed_data
+    encoded = encode_features(data, categorical_columns, feature_names, ohe,
+                              dtype=np.float64)
+    return pd.DataFrame(encoded, columns=feature_names, index=data.index)
 
 
 def predict_churn(model, data):
@@ -87,14 +101,76 @@ def predict_churn(model, data):
         tuple: (predicciones, probabilidades)
     """
     try:
-        predictions = model.predict(data)
+        # Una sola evaluación del modelo: la clase se deriva de las probabilidades
         probabilities = model.predict_proba(data)
+        predictions = model.classes_[np.argmax(probabilities, axis=1)]
         return predictions, probabilities
     except Exception as e:
         st.error(f"Error al hacer predicción: {e}")
         return None, None
 
 
+def classify_risk_levels(probabilities, thresholds=None, labels=None):
+    """
+    Clasifica probabilidades de churn en niveles de riesgo de forma vectorizada.
+
+    Args:
+        probabilities: Array de probabilidades de churn (0-1)
+        thresholds: Límites entre niveles (por defecto RISK_LEVELS)
+        labels: Nombres de los niveles (por defecto RISK_LEVELS)
+
+    Returns:
+        pd.Categorical ordenado con el nivel de riesgo de cada fila
+    """
+    thresholds = RISK_LEVELS['thresholds'] if thresholds is None else thresholds
+    labels = RISK_LEVELS['labels'] if labels is None else labels
+
+    codes = np.searchsorted(thresholds, probabilities, side="right")
+    return pd.Categorical.from_codes(codes, categories=labels, ordered=True)
+
+
+def build_scoring_result(churn_probabilities, index=None):
+    """
+    Construye el resultado de scoring a partir de la probabilidad de churn.
+
+    Args:
+        churn_probabilities: Array con la probabilidad de churn por fila
+        index: Índice para alinear el resultado con los datos originales
+
+    Returns:
+        DataFrame con Probabilidad_Churn, Prediccion y Nivel_Riesgo
+    """
+    churn_probabilities = np.asarray(churn_probabilities, dtype=np.float64)
+    return pd.DataFrame({
+        "Probabilidad_Churn": churn_probabilities,
+        "Prediccion": (churn_probabilities > 0.5).astype(int),
+        "Nivel_Riesgo": classify_risk_levels(churn_probabilities)
+    }, index=index)
+
+
+def score_churn(model, data, index=None):
+    """
+    Calcula probabilidad, predicción y nivel de riesgo en una sola pasada.
+
+    Args:
+        model: Modelo entrenado o kernel de scoring
+        data: Datos en el formato que espera el modelo
+        index: Índice del resultado (por defecto, el de data)
+
+    Returns:
+        DataFrame con el resultado de scoring o None si hay error
+    """
+    try:
+        probabilities = model.predict_proba(data)[:, 1]
+    except Exception as e:
+        st.error(f"Error al hacer predicción: {e}")
+        return None
+
+    if index is None:
+        index = getattr(data, "index", None)
+    return build_scoring_result(probabilities, index=index)
+
+
 def get_feature_importance(model, feature_names):
     """
     Obtiene la importancia de las características del modelo.
@@ -135,24 +211,14 @@ def interpret_prediction(probability, customer_data=None):
     """
     churn_prob = probability[1] if len(probability) > 1 else probability
 
-    if churn_prob < 0.3:
-        risk_level = "BAJO"
-        color = "green"
-        recommendation = "Cliente estable. Continuar con servicio regular."
-    elif churn_prob < 0.6:
-        risk_level = "MEDIO"
-        color = "orange"
-        recommendation = "Cliente en riesgo moderado. Considerar ofertas de retención."
-    else:
-        risk_level = "ALTO"
-        color = "red"
-        recommendation = "Cliente en alto riesgo. Acción inmediata requerida."
+    risk_level = classify_risk_levels([churn_prob])[0]
+    details = RISK_DETAILS.get(risk_level, {})
 
     return {
         'probability': churn_prob,
         'risk_level': risk_level,
-        'color': color,
-        'recommendation': recommendation,
+        'color': details.get('color', 'gray'),
+        'recommendation': details.get('recommendation', ''),
         'confidence': f"{churn_prob:.1%}"
     }
 
@@ -196,4 +262,9 @@ def validate_input_data(data):
         st.error(f"Faltan las siguientes columnas: {missing_columns}")
         return False
 
+    validation = validate_rows(data, required_columns)
+    if validation.rejected:
+        st.error(f"Valores no válidos: {', '.join(validation.reason_counts().index)}")
+        return False
+
     return True
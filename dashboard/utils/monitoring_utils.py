@@ -1,9 +1,11 @@
 import numpy as np
 import pandas as pd
 from datetime import datetime
-import plotly.graph_objects as go
 import streamlit as st
 
+from config.config import DRIFT_CONFIG
+from utils.chart_utils import binned_histogram_figure, histogram_counts
+
 
 def simulate_metrics_data():
     np.random.seed(42)
@@ -25,7 +27,9 @@ def simulate_metrics_data():
     return df_metrics
 
 
-def plot_metrics_evolution(df_metrics, df_recent, thr_acc, thr_auc, thr_f1):
+def plot_metrics_evolution(df_metrics, df_recent, thr_acc, thr_auc, thr_f1, change_points=None):
+    import plotly.graph_objects as go
+
     fig = go.Figure()
     fig.add_trace(go.Scatter(x=df_metrics.index,
                   y=df_metrics["Accuracy"], mode="lines+markers", name="Accuracy"))
@@ -34,6 +38,20 @@ def plot_metrics_evolution(df_metrics, df_recent, thr_acc, thr_auc, thr_f1):
     fig.add_trace(go.Scatter(x=df_metrics.index,
                   y=df_metrics["F1 Score"], mode="lines+markers", name="F1 Score"))
 
+    # Cambios detectados: marca sobre la métrica en la fecha del cambio
+    if change_points is not None and not change_points.empty:
+        points = change_points[change_points["Serie"].isin(df_metrics.columns)
+                               & change_points["Fecha"].isin(df_metrics.index)]
+        if not points.empty:
+            points = points.groupby(["Fecha", "Serie"], as_index=False).agg(
+                Detector=("Detector", ", ".join), Sentido=("Sentido", "first"))
+            values = [df_metrics.at[day, serie] for day, serie in zip(points["Fecha"], points["Serie"])]
+            fig.add_trace(go.Scatter(
+                x=points["Fecha"], y=values, mode="markers", name="Cambio detectado",
+                marker=dict(symbol="x", size=12, color="black"),
+                text=points["Serie"] + " " + points["Sentido"] + " (" + points["Detector"] + ")",
+                hovertemplate="%{text}<extra></extra>"))
+
     # Líneas umbral
     fig.add_hline(y=thr_acc, line_dash="dot",
                   line_color="red", annotation_text="Acc mín.")
@@ -43,15 +61,20 @@ def plot_metrics_evolution(df_metrics, df_recent, thr_acc, thr_auc, thr_f1):
                   line_color="purple", annotation_text="F1 mín.")
 
     # Sombrear ventana reciente
-    fig.add_vrect(
-        x0=df_recent.index.min(), x1=df_recent.index.max(),
-        fillcolor="LightSalmon", opacity=0.15, line_width=0,
-        annotation_text="Ventana reciente", annotation_position="top left"
-    )
+    if not df_recent.empty:
+        fig.add_vrect(
+            x0=df_recent.index.min(), x1=df_recent.index.max(),
+            fillcolor="LightSalmon", opacity=0.15, line_width=0,
+            annotation_text="Ventana reciente", annotation_position="top left"
+        )
+
+    # Las métricas reales pueden quedar por debajo de 0.5
+    lowest = df_metrics[["Accuracy", "ROC AUC", "F1 Score"]].min().min()
+    y_min = 0.5 if pd.isna(lowest) else min(0.5, np.floor(lowest * 20) / 20)
 
     fig.update_layout(
         height=450,
-        yaxis=dict(range=[0.5, 1.0]),
+        yaxis=dict(range=[y_min, 1.0]),
         margin=dict(l=40, r=40, t=60, b=40),
         legend=dict(orientation="h", yanchor="bottom",
                     y=1.02, xanchor="right", x=1),
@@ -70,3 +93,48 @@ def calculate_drift(df_recent, thr_acc, thr_auc, thr_f1):
     drift_auc = mean_auc < thr_auc
     drift_f1 = mean_f1 < thr_f1
     return drift_acc, drift_auc, drift_f1
+
+
+def plot_batch_score_distribution(table, bins=20):
+    """
+    Histograma de probabilidades de churn de un lote publicado (tabla Arrow),
+    calculado sin convertir el lote a pandas.
+    """
+    counts, edges = histogram_counts(
+        table["Probabilidad_Churn"].to_numpy(), bins=bins, value_range=(0.0, 1.0))
+
+    fig = binned_histogram_figure(counts, edges, x_title="Probabilidad de churn",
+                                  y_title="Clientes", title="Distribución de scores del lote")
+    fig.update_traces(hovertemplate="Probabilidad %{x:.2f}: %{y} clientes<extra></extra>")
+    fig.update_layout(height=350, margin=dict(l=40, r=40, t=60, b=40))
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def plot_feature_drift_heatmap(drift_log):
+    """
+    Mapa de calor del PSI por variable (filas) y lote analizado (columnas).
+    """
+    import plotly.graph_objects as go
+
+    drift_log = drift_log.assign(
+        lote=drift_log["timestamp"].dt.strftime("%Y-%m-%d %H:%M") + " · " + drift_log["batch"].fillna(""))
+    matrix = drift_log.pivot_table(index="feature", columns="lote", values="PSI",
+                                   aggfunc="last", sort=False)
+    matrix = matrix[drift_log["lote"].unique()]
+
+    alert = DRIFT_CONFIG['psi_alert']
+    fig = go.Figure(go.Heatmap(
+        z=matrix.to_numpy(), x=matrix.columns, y=matrix.index,
+        zmin=0, zmax=2 * alert,
+        colorscale=[[0.0, "#2ca02c"], [DRIFT_CONFIG['psi_warning'] / (2 * alert), "#ffdd57"],
+                    [0.5, "#ff7f0e"], [1.0, "#d62728"]],
+        colorbar=dict(title="PSI"),
+        hovertemplate="%{y}<br>%{x}<br>PSI %{z:.3f}<extra></extra>"
+    ))
+    fig.update_layout(
+        height=max(350, 22 * len(matrix.index) + 120),
+        margin=dict(l=40, r=40, t=60, b=40),
+        xaxis=dict(type="category", showticklabels=len(matrix.columns) <= 12),
+        title="PSI por variable y lote frente al entrenamiento"
+    )
+    st.plotly_chart(fig, use_container_width=True)
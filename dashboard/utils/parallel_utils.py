@@ -0,0 +1,218 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from config.config import PARALLEL_CONFIG
+from utils.model_utils import MODELS_DIR, build_scoring_result, read_model_components
+from utils.bundle_utils import load_model_bundle, read_scoring_kernel
+from utils.scoring_utils import StackedLinearScorer, score_raw_data
+
+# Estado de cada proceso de trabajo: los artefactos se cargan una sola vez
+_WORKER_STATE = {}
+
+
+def _init_worker(models_dir, bundle_dirs=None):
+    if bundle_dirs:
+        # Champion y challengers del registro: cada partición devuelve la matriz apilada
+        _WORKER_STATE["stacked"] = StackedLinearScorer(
+            [load_model_bundle(bundle_dir)[0] for bundle_dir in bundle_dirs])
+        return
+    # Con el bundle disponible el proceso no necesita importar scikit-learn
+    kernel = read_scoring_kernel(models_dir)
+    _WORKER_STATE["kernel"] = kernel
+    _WORKER_STATE["components"] = (None, None, None, None) if kernel is not None \
+        else read_model_components(models_dir)
+
+
+def _score_partition(partition: pd.DataFrame) -> pd.DataFrame:
+    model, categorical_columns, feature_names, ohe = _WORKER_STATE["components"]
+    return score_raw_data(partition, _WORKER_STATE["kernel"], model,
+                          categorical_columns, feature_names, ohe)
+
+
+def _predict_partition(partition: pd.DataFrame) -> np.ndarray:
+    return _WORKER_STATE["stacked"].predict_proba(partition)
+
+
+class ParallelScorer:
+    """
+    Motor de scoring que reparte un lote en particiones y las puntúa en un
+    pool de procesos. Cada proceso carga los artefactos del modelo una vez.
+
+    Con bundle_dirs (los del registro, champion primero) los procesos cargan
+    esos bundles apilados y predict_proba devuelve la matriz de todos los
+    modelos, para que el registro haga el scoring en sombra.
+    """
+
+    def __init__(self, workers=None, partition_size=None, models_dir=MODELS_DIR, bundle_dirs=None):
+        self.workers = PARALLEL_CONFIG['workers'] if workers is None else workers
+        self.partition_size = (PARALLEL_CONFIG['partition_size']
+                               if partition_size is None else partition_size)
+        self.bundle_dirs = list(bundle_dirs) if bundle_dirs else None
+        # spawn evita heredar los hilos del servidor de Streamlit
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(str(models_dir), self.bundle_dirs)
+        )
+
+    def _partitions(self, data: pd.DataFrame, partition_size=None) -> list:
+        size = partition_size or self.partition_size
+        return [data.iloc[start:start + size] for start in range(0, len(data), size)]
+
+    def predict_proba(self, data: pd.DataFrame, partition_size=None) -> np.ndarray:
+        """
+        Matriz de probabilidades (filas, modelos) en el orden original.
+        Requiere un motor creado con bundle_dirs.
+        """
+        # executor.map conserva el orden de las particiones
+        results = list(self.executor.map(_predict_partition, self._partitions(data, partition_size)))
+        return np.vstack(results) if results else np.empty((0, len(self.bundle_dirs)))
+
+    def score(self, data: pd.DataFrame, partition_size=None) -> pd.DataFrame:
+        """
+        Puntúa el lote en paralelo y devuelve el resultado en el orden original.
+
+        Args:
+            data: Lote de datos sin preprocesar
+            partition_size: Filas por partición (por defecto, la del motor)
+
+        Returns:
+            DataFrame con Probabilidad_Churn, Prediccion y Nivel_Riesgo
+        """
+        if self.bundle_dirs:
+            return build_scoring_result(self.predict_proba(data, partition_size)[:, 0], index=data.index)
+        # executor.map conserva el orden de las particiones
+        results = list(self.executor.map(_score_partition, self._partitions(data, partition_size)))
+        if any(result is None for result in results):
+            raise ValueError("No se pudo puntuar una de las particiones")
+        return pd.concat(results) if results else None
+
+    def warm_up(self):
+        """
+        Arranca todos los procesos para que la carga de artefactos no cuente en el scoring.
+        """
+        futures = [self.executor.submit(time.sleep, 0.05)
+                   for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SharedParallelScorer:
+    """
+    Un único pool de procesos por servidor para todas las sesiones.
+
+    Cambiar el número de procesos o los modelos (otro champion o challengers)
+    crea un pool nuevo y cierra el anterior en cuanto terminan los lotes que
+    lo estaban usando. El tamaño de partición se pasa en cada llamada y no
+    requiere otro pool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._scorer = None
+        self._key = None
+        self._active = {}
+
+    def _acquire(self, workers, model_version, bundle_dirs=None):
+        key = (workers, model_version, tuple(bundle_dirs or ()))
+        with self._lock:
+            if self._scorer is None or self._key != key:
+                previous = self._scorer
+                self._scorer = ParallelScorer(workers=workers, bundle_dirs=bundle_dirs)
+                self._key = key
+                self._active[self._scorer] = 0
+                if previous is not None and self._active[previous] == 0:
+                    del self._active[previous]
+                    previous.close()
+            self._active[self._scorer] += 1
+            return self._scorer
+
+    def _release(self, scorer):
+        with self._lock:
+            self._active[scorer] -= 1
+            retired = scorer is not self._scorer and self._active[scorer] == 0
+            if retired:
+                del self._active[scorer]
+        if retired:
+            scorer.close()
+
+    def score(self, data: pd.DataFrame, workers, partition_size=None, model_version=None) -> pd.DataFrame:
+        """
+        Puntúa el lote con el pool vigente para workers y model_version.
+
+        Returns:
+            DataFrame con Probabilidad_Churn, Prediccion y Nivel_Riesgo
+        """
+        scorer = self._acquire(workers, model_version)
+        try:
+            return scorer.score(data, partition_size)
+        finally:
+            self._release(scorer)
+
+    def predict_proba(self, data: pd.DataFrame, workers, partition_size=None, bundle_dirs=None) -> np.ndarray:
+        """
+        Matriz de probabilidades de los bundles indicados (champion primero),
+        con el pool vigente para workers y bundle_dirs.
+        """
+        scorer = self._acquire(workers, None, bundle_dirs)
+        try:
+            return scorer.predict_proba(data, partition_size)
+        finally:
+            self._release(scorer)
+
+
+@st.cache_resource
+def get_parallel_scorer():
+    """
+    Devuelve el pool de scoring compartido entre sesiones.
+    """
+    return SharedParallelScorer()
+
+
+def benchmark_scaling(data: pd.DataFrame, worker_counts=None, partition_size=None) -> pd.DataFrame:
+    """
+    Mide el throughput del scoring paralelo para distintos números de procesos.
+
+    Args:
+        data: Lote de datos sin preprocesar
+        worker_counts: Números de procesos a medir (por defecto 1..N en potencias de 2)
+        partition_size: Filas por partición; por defecto reparte el lote
+            entre los procesos de cada medición
+
+    Returns:
+        DataFrame con procesos, filas por segundo y aceleración respecto a 1 proceso
+    """
+    if worker_counts is None:
+        max_workers = PARALLEL_CONFIG['workers']
+        worker_counts = sorted({min(2 ** i, max_workers)
+                                for i in range(max_workers.bit_length() + 1)})
+
+    rows = []
+    for workers in worker_counts:
+        size = partition_size or max(1, -(-len(data) // workers))
+        with ParallelScorer(workers=workers, partition_size=size) as scorer:
+            scorer.warm_up()
+            start = time.perf_counter()
+            scorer.score(data)
+            elapsed = time.perf_counter() - start
+        rows.append({"Procesos": workers, "Filas/s": len(data) / elapsed})
+
+    result = pd.DataFrame(rows)
+    result["Aceleración"] = result["Filas/s"] / result["Filas/s"].iloc[0]
+    return result
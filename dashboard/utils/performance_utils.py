@@ -0,0 +1,543 @@
+"""
+Desempeño real del modelo: predicciones registradas unidas a los resultados
+de churn observados después.
+
+En logs/performance/ se guardan:
+- predictions/: log de solo añadido, un Parquet por lote puntuado con
+  customerID, fecha de scoring, versión del modelo y probabilidad.
+- pending/: partes del índice de pendientes, una por lote, con el hash
+  (uint64 del customerID), la fecha de scoring y el tramo de cada predicción.
+- pending_index.parquet: índice compactado con la última predicción de cada
+  cliente que aún no tiene resultado; en sus metadatos guarda la última parte
+  de pending/ que ya incluye.
+- daily_counts.parquet: positivos y negativos observados por fecha de scoring
+  y tramo de score.
+
+Registrar un lote solo añade sus partes (coste proporcional al lote). Ingerir
+resultados lee el índice compactado y las partes, se queda con la última
+predicción de cada cliente, suma la etiqueta de los clientes con resultado a
+los conteos del día en que se puntuaron y reescribe el índice sin ellos,
+absorbiendo las partes. Si se acumulan más de max_pending_parts partes sin
+ingerir resultados, el registro también compacta. Los tramos son
+(k/b, (k+1)/b] y el umbral de decisión cae en una frontera de tramo, de modo
+que Accuracy y F1 son exactos y el ROC AUC se calcula sobre los tramos.
+Cualquier ventana se resuelve con sumas acumuladas de los conteos diarios,
+sin volver a leer las predicciones.
+
+Uso (desde la carpeta dashboard/):
+    python -m utils.performance_utils log resultados.parquet --date 2026-10-01
+    python -m utils.performance_utils outcomes churn_observado.csv
+    python -m utils.performance_utils summary
+"""
+import argparse
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+import streamlit as st
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo se serializa dentro del proceso
+    fcntl = None
+
+from config.config import PERFORMANCE_CONFIG
+from utils.ingestion_utils import ID_COLUMN, detect_format
+
+PREDICTIONS_DIR = "predictions"
+PENDING_DIR = "pending"
+INDEX_FILE = "pending_index.parquet"
+# Metadatos del índice compactado: última parte de pending/ incluida
+INDEX_SEQUENCE_KEY = b"ultima_parte"
+COUNTS_FILE = "daily_counts.parquet"
+LOCK_FILE = ".lock"
+OUTCOME_COLUMN = "Churn"
+METRIC_COLUMNS = ["Accuracy", "ROC AUC", "F1 Score"]
+
+# Etiquetas observadas admitidas (en minúsculas)
+LABEL_VALUES = {"yes": 1, "sí": 1, "si": 1, "1": 1, "true": 1,
+                "no": 0, "0": 0, "false": 0}
+
+_STORE_LOCK = threading.Lock()
+
+
+def hash_ids(ids) -> np.ndarray:
+    """
+    Claves uint64 de los identificadores de cliente (estables entre procesos).
+    """
+    values = pd.Series(ids).astype(str).to_numpy(dtype=object)
+    return pd.util.hash_array(values, categorize=False)
+
+
+def score_bins(probabilities, bins: int) -> np.ndarray:
+    """
+    Tramo (k/b, (k+1)/b] de cada probabilidad; 0 incluye la probabilidad 0.
+    """
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    return np.clip(np.ceil(probabilities * bins) - 1, 0, bins - 1).astype(np.int16)
+
+
+def parse_labels(values) -> np.ndarray:
+    """
+    Etiquetas observadas como 1/0; -1 si el valor no se reconoce.
+    """
+    labels = pd.Series(values).astype(str).str.strip().str.lower().map(LABEL_VALUES)
+    return labels.fillna(-1).to_numpy(dtype=np.int8)
+
+
+def binned_metrics(positives: np.ndarray, negatives: np.ndarray, threshold_bin: int) -> dict:
+    """
+    Accuracy, ROC AUC y F1 a partir de conteos por tramo de score.
+
+    Args:
+        positives: Churn observado por tramo (último eje = tramos)
+        negatives: No churn observado por tramo
+        threshold_bin: Primer tramo que se predice como churn
+
+    Returns:
+        dict con un array (o escalar) por métrica y "Clientes"
+    """
+    positives = np.asarray(positives, dtype=np.float64)
+    negatives = np.asarray(negatives, dtype=np.float64)
+    total_pos = positives.sum(axis=-1)
+    total_neg = negatives.sum(axis=-1)
+    total = total_pos + total_neg
+
+    tp = positives[..., threshold_bin:].sum(axis=-1)
+    fp = negatives[..., threshold_bin:].sum(axis=-1)
+    tn = total_neg - fp
+
+    # Cada negativo suma los positivos de tramos superiores y medio empate en el suyo
+    pos_above = total_pos[..., None] - np.cumsum(positives, axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        accuracy = (tp + tn) / total
+        auc = (negatives * (pos_above + 0.5 * positives)).sum(axis=-1) / (total_pos * total_neg)
+        f1 = 2 * tp / (2 * tp + fp + (total_pos - tp))
+    return {"Accuracy": accuracy, "ROC AUC": auc, "F1 Score": f1, "Clientes": total}
+
+
+class DailyCounts:
+    """
+    Conteos de positivos y negativos por día de scoring y tramo de score.
+    """
+
+    def __init__(self, days: np.ndarray, positives: np.ndarray, negatives: np.ndarray,
+                 bins=None, threshold=None):
+        self.bins = bins or PERFORMANCE_CONFIG['score_bins']
+        self.threshold = PERFORMANCE_CONFIG['threshold'] if threshold is None else threshold
+        self.threshold_bin = int(round(self.threshold * self.bins))
+        self.days = np.asarray(days, dtype="datetime64[D]")
+        self.positives = positives
+        self.negatives = negatives
+
+    @classmethod
+    def from_long(cls, days, bins_idx, positives, negatives, bins=None, threshold=None):
+        """
+        Construye la matriz día x tramo desde filas (día, tramo, positivos, negativos).
+        """
+        bins = bins or PERFORMANCE_CONFIG['score_bins']
+        unique_days, day_idx = np.unique(np.asarray(days, dtype="datetime64[D]"), return_inverse=True)
+        pos = np.zeros((len(unique_days), bins), dtype=np.int64)
+        neg = np.zeros((len(unique_days), bins), dtype=np.int64)
+        np.add.at(pos, (day_idx, bins_idx), positives)
+        np.add.at(neg, (day_idx, bins_idx), negatives)
+        return cls(unique_days, pos, neg, bins, threshold)
+
+    def add(self, days, bins_idx, labels: np.ndarray) -> "DailyCounts":
+        """
+        Nuevos conteos con los resultados (día de scoring, tramo, etiqueta) sumados.
+        """
+        day_idx, bin_idx = np.nonzero(self.positives + self.negatives)
+        return DailyCounts.from_long(
+            np.concatenate([self.days[day_idx], np.asarray(days, dtype="datetime64[D]")]),
+            np.concatenate([bin_idx, bins_idx]),
+            np.concatenate([self.positives[day_idx, bin_idx], labels == 1]),
+            np.concatenate([self.negatives[day_idx, bin_idx], labels == 0]),
+            self.bins, self.threshold)
+
+    def to_long(self) -> pa.Table:
+        day_idx, bins_idx = np.nonzero(self.positives + self.negatives)
+        return pa.table({
+            "fecha": pa.array(self.days[day_idx]),
+            "tramo": pa.array(bins_idx.astype(np.int16)),
+            "positivos": pa.array(self.positives[day_idx, bins_idx]),
+            "negativos": pa.array(self.negatives[day_idx, bins_idx])
+        })
+
+    @property
+    def empty(self) -> bool:
+        return len(self.days) == 0
+
+    @property
+    def total(self) -> int:
+        return int(self.positives.sum() + self.negatives.sum())
+
+    def _calendar(self):
+        # Días consecutivos entre el primero y el último, con ceros donde no hay resultados
+        calendar = np.arange(self.days.min(), self.days.max() + 1, dtype="datetime64[D]")
+        idx = (self.days - calendar[0]).astype(np.int64)
+        pos = np.zeros((len(calendar), self.bins), dtype=np.int64)
+        neg = np.zeros((len(calendar), self.bins), dtype=np.int64)
+        pos[idx], neg[idx] = self.positives, self.negatives
+        return calendar, pos, neg
+
+    def rolling_metrics(self, window_days=None) -> pd.DataFrame:
+        """
+        Métricas móviles por día sobre los window_days días terminados en cada fecha.
+
+        Returns:
+            DataFrame indexado por "Fecha" con Accuracy, ROC AUC, F1 Score y
+            Clientes (solo días con algún resultado en la ventana)
+        """
+        window_days = window_days or PERFORMANCE_CONFIG['rolling_days']
+        if self.empty:
+            return pd.DataFrame(columns=METRIC_COLUMNS + ["Clientes"],
+                                index=pd.DatetimeIndex([], name="Fecha"))
+        calendar, pos, neg = self._calendar()
+        cum_pos = np.vstack([np.zeros((1, self.bins), dtype=np.int64), np.cumsum(pos, axis=0)])
+        cum_neg = np.vstack([np.zeros((1, self.bins), dtype=np.int64), np.cumsum(neg, axis=0)])
+        end = np.arange(1, len(calendar) + 1)
+        start = np.maximum(end - window_days, 0)
+        metrics = binned_metrics(cum_pos[end] - cum_pos[start], cum_neg[end] - cum_neg[start],
+                                 self.threshold_bin)
+        df = pd.DataFrame(metrics, index=pd.DatetimeIndex(calendar, name="Fecha"))
+        df["Clientes"] = df["Clientes"].astype(np.int64)
+        return df[df["Clientes"] > 0]
+
+    def window_metrics(self, start=None, end=None) -> pd.Series:
+        """
+        Métricas agregadas de los días de scoring en [start, end].
+        """
+        selected = np.ones(len(self.days), dtype=bool)
+        if start is not None:
+            selected &= self.days >= np.datetime64(pd.Timestamp(start).date(), "D")
+        if end is not None:
+            selected &= self.days <= np.datetime64(pd.Timestamp(end).date(), "D")
+        metrics = binned_metrics(self.positives[selected].sum(axis=0),
+                                 self.negatives[selected].sum(axis=0), self.threshold_bin)
+        return pd.Series({name: float(value) for name, value in metrics.items()})
+
+
+class PerformanceStore:
+    """
+    Log de predicciones, índice de predicciones pendientes y conteos diarios.
+
+    Las escrituras son atómicas (archivo temporal + replace). Las que leen y
+    reescriben el índice o los conteos se serializan con un lock de hilos y
+    un flock sobre .lock en el directorio, de modo que el dashboard y la CLI
+    (p. ej. outcomes) pueden ejecutarse a la vez sin perder actualizaciones.
+    """
+
+    def __init__(self, directory=None, bins=None, threshold=None):
+        self.directory = Path(directory or PERFORMANCE_CONFIG['directory'])
+        self.bins = bins or PERFORMANCE_CONFIG['score_bins']
+        self.threshold = PERFORMANCE_CONFIG['threshold'] if threshold is None else threshold
+        self._counts = None
+        self._counts_mtime = None
+
+    @property
+    def index_path(self) -> Path:
+        return self.directory / INDEX_FILE
+
+    @property
+    def counts_path(self) -> Path:
+        return self.directory / COUNTS_FILE
+
+    @contextmanager
+    def _locked(self):
+        # Primero el lock del proceso (los hilos comparten el descriptor) y luego el del sistema
+        with _STORE_LOCK:
+            if fcntl is None:
+                yield
+                return
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self.directory / LOCK_FILE, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_table(self, table: pa.Table, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        pq.write_table(table, tmp_path, compression="zstd")
+        tmp_path.replace(path)
+
+    def _index_sequence(self) -> int:
+        # Última parte incluida en el índice compactado (-1 si no hay índice)
+        if not self.index_path.exists():
+            return -1
+        metadata = pq.read_schema(self.index_path).metadata or {}
+        return int(metadata.get(INDEX_SEQUENCE_KEY, -1))
+
+    def _pending_parts(self, after=None) -> list:
+        """
+        Partes del índice de pendientes posteriores a la compactación, en
+        orden de registro: [(número, ruta)].
+        """
+        after = self._index_sequence() if after is None else after
+        directory = self.directory / PENDING_DIR
+        if not directory.exists():
+            return []
+        parts = sorted((int(path.stem.removeprefix("part-")), path)
+                       for path in directory.glob("part-*.parquet"))
+        return [(sequence, path) for sequence, path in parts if sequence > after]
+
+    def _read_index(self):
+        """
+        Índice de pendientes deduplicado (la predicción más reciente de cada
+        cliente) y número de la última parte que contiene.
+        """
+        sequence = base_sequence = self._index_sequence()
+        tables = [pq.read_table(self.index_path).replace_schema_metadata(None)] \
+            if self.index_path.exists() else []
+        for part_sequence, path in self._pending_parts(sequence):
+            tables.append(pq.read_table(path).replace_schema_metadata(None))
+            sequence = part_sequence
+        if not tables:
+            return pd.DataFrame({"clave": pd.Series(dtype=np.uint64),
+                                 "fecha": pd.Series(dtype="datetime64[s]"),
+                                 "tramo": pd.Series(dtype=np.int16),
+                                 "version": pd.Series(dtype=object)}), sequence
+        index = pa.concat_tables(tables).to_pandas(date_as_object=False)
+        if sequence != base_sequence:
+            # Las partes pueden repetir clientes entre sí, con el índice o dentro del lote
+            index = index.drop_duplicates("clave", keep="last", ignore_index=True)
+        return index, sequence
+
+    def _write_index(self, index: pd.DataFrame, sequence: int):
+        # Reescribe el índice compactado y elimina las partes que ya contiene
+        table = pa.Table.from_pandas(index, preserve_index=False)
+        table = table.replace_schema_metadata({INDEX_SEQUENCE_KEY: str(sequence).encode()})
+        self._write_table(table, self.index_path)
+        for part_sequence, path in self._pending_parts(after=-1):
+            if part_sequence <= sequence:
+                path.unlink(missing_ok=True)
+
+    def compact(self) -> int:
+        """
+        Absorbe las partes pendientes en el índice compactado.
+
+        Returns:
+            Predicciones pendientes tras compactar
+        """
+        with self._locked():
+            index, sequence = self._read_index()
+            self._write_index(index, sequence)
+        return len(index)
+
+    def log_predictions(self, ids, probabilities, model_version=None, scored_on=None) -> int:
+        """
+        Registra las predicciones de un lote y las deja pendientes de resultado.
+        Si un cliente ya tenía una predicción pendiente, cuenta la más reciente.
+
+        Args:
+            ids: customerID de cada fila
+            probabilities: Probabilidad de churn de cada fila
+            model_version: Versión del modelo que puntuó el lote
+            scored_on: Fecha de scoring (por defecto hoy)
+
+        Returns:
+            Número de predicciones registradas
+        """
+        ids = pd.Series(ids).reset_index(drop=True)
+        probabilities = np.asarray(probabilities, dtype=np.float32)
+        valid = ids.notna().to_numpy() & ~np.isnan(probabilities)
+        ids = ids.astype(str)
+        valid &= (ids.str.strip() != "").to_numpy()
+        ids, probabilities = ids[valid], probabilities[valid]
+        if not len(ids):
+            return 0
+
+        scored_on = pd.Timestamp(scored_on or date.today()).normalize()
+        version = "" if model_version is None else str(model_version)
+        day = scored_on.strftime("%Y-%m-%d")
+
+        log_table = pa.table({
+            ID_COLUMN: pa.array(ids.to_numpy(dtype=object), pa.string()),
+            "fecha": pa.array(np.full(len(ids), np.datetime64(day, "D"))),
+            "version": pa.array(np.full(len(ids), version, dtype=object), pa.string()),
+            "Probabilidad_Churn": pa.array(probabilities)
+        })
+        pending = pd.DataFrame({
+            "clave": hash_ids(ids),
+            "fecha": np.full(len(ids), np.datetime64(day, "s")),
+            "tramo": score_bins(probabilities, self.bins),
+            "version": version
+        })
+
+        with self._locked():
+            part = self.directory / PREDICTIONS_DIR / f"fecha={day}" / f"part-{uuid.uuid4().hex}.parquet"
+            self._write_table(log_table, part)
+            # El número de parte fija el orden: en clientes repetidos gana la última
+            parts = self._pending_parts(after=-1)
+            sequence = max(parts[-1][0] if parts else -1, self._index_sequence()) + 1
+            self._write_table(pa.Table.from_pandas(pending, preserve_index=False),
+                              self.directory / PENDING_DIR / f"part-{sequence:09d}.parquet")
+            if len(parts) + 1 > PERFORMANCE_CONFIG['max_pending_parts']:
+                self._write_index(*self._read_index())
+        return len(ids)
+
+    def ingest_outcomes(self, ids, labels) -> dict:
+        """
+        Une resultados observados a las predicciones pendientes mediante el
+        índice hash y los suma a los conteos diarios. Cada predicción recibe
+        un único resultado: volver a ingerir el mismo archivo no cuenta dos veces.
+
+        Args:
+            ids: customerID de cada resultado
+            labels: Churn observado (Yes/No, 1/0, True/False)
+
+        Returns:
+            dict con resultados recibidos, unidos, sin predicción y no válidos
+        """
+        labels = parse_labels(labels)
+        outcomes = pd.DataFrame({"clave": hash_ids(ids), "label": labels})
+        invalid = int((labels < 0).sum())
+        outcomes = outcomes[labels >= 0].drop_duplicates("clave", keep="last")
+
+        with self._locked():
+            index, sequence = self._read_index()
+            # La tabla hash se construye sobre los resultados (el lado pequeño)
+            # y se recorren las claves pendientes contra ella
+            outcome_position = pd.Index(outcomes["clave"]).get_indexer(index["clave"])
+            hit = outcome_position >= 0
+            rows = index[hit]
+            observed = outcomes["label"].to_numpy()[outcome_position[hit]]
+            matched = int(hit.sum())
+
+            if matched:
+                counts = self._load_counts().add(
+                    rows["fecha"].to_numpy().astype("datetime64[D]"),
+                    rows["tramo"].to_numpy(dtype=np.int64), observed)
+                self._write_table(counts.to_long(), self.counts_path)
+            if matched or sequence != self._index_sequence():
+                self._write_index(index[~hit], sequence)
+
+        return {"resultados": int(len(labels)), "unidos": matched,
+                "sin_prediccion": int(len(outcomes)) - matched, "no_validos": invalid}
+
+    def _load_counts(self) -> DailyCounts:
+        if not self.counts_path.exists():
+            return DailyCounts(np.array([], dtype="datetime64[D]"),
+                               np.zeros((0, self.bins), dtype=np.int64),
+                               np.zeros((0, self.bins), dtype=np.int64), self.bins, self.threshold)
+        table = pq.read_table(self.counts_path)
+        return DailyCounts.from_long(
+            table["fecha"].cast(pa.int32()).to_numpy().astype("datetime64[D]"),
+            table["tramo"].to_numpy().astype(np.int64),
+            table["positivos"].to_numpy(), table["negativos"].to_numpy(),
+            self.bins, self.threshold)
+
+    def daily_counts(self) -> DailyCounts:
+        """
+        Conteos diarios; solo se releen si el archivo cambió desde la última lectura.
+        """
+        mtime = self.counts_path.stat().st_mtime_ns if self.counts_path.exists() else None
+        if self._counts is None or mtime != self._counts_mtime:
+            self._counts = self._load_counts()
+            self._counts_mtime = mtime
+        return self._counts
+
+    def pending_count(self) -> int:
+        """
+        Predicciones pendientes según los metadatos de los archivos: un
+        cliente puntuado de nuevo cuenta dos veces hasta la siguiente compactación.
+        """
+        # Con el lock: una compactación en curso podría borrar las partes listadas
+        with self._locked():
+            total = pq.ParquetFile(self.index_path).metadata.num_rows if self.index_path.exists() else 0
+            return total + sum(pq.ParquetFile(path).metadata.num_rows
+                               for _, path in self._pending_parts())
+
+
+def read_result_columns(source, columns) -> pd.DataFrame:
+    """
+    Lee solo las columnas indicadas de un DataFrame o archivo de resultados;
+    las que no existan se omiten.
+    """
+    if isinstance(source, pd.DataFrame):
+        return source[[col for col in columns if col in source.columns]]
+    input_format = detect_format(source)
+    if input_format == "parquet":
+        present = pq.ParquetFile(source).schema_arrow.names
+        return pq.read_table(source, columns=[c for c in columns if c in present]).to_pandas()
+    if input_format == "feather":
+        present = pa.ipc.open_file(source).schema.names
+        return feather.read_table(source, columns=[c for c in columns if c in present]).to_pandas()
+    return pd.read_csv(source, usecols=lambda col: col in columns, dtype={ID_COLUMN: str})
+
+
+def log_results(store: PerformanceStore, source, model_version=None, scored_on=None) -> int:
+    """
+    Registra las predicciones de un lote de resultados (DataFrame o archivo).
+    Sin columna customerID no se pueden unir resultados y no se registra nada.
+    """
+    results = read_result_columns(source, [ID_COLUMN, "Probabilidad_Churn"])
+    if ID_COLUMN not in results.columns or "Probabilidad_Churn" not in results.columns:
+        return 0
+    return store.log_predictions(results[ID_COLUMN], results["Probabilidad_Churn"],
+                                 model_version, scored_on)
+
+
+def ingest_outcome_file(store: PerformanceStore, source) -> dict:
+    """
+    Ingiere un archivo con customerID y Churn observado.
+
+    Raises:
+        ValueError: Si faltan las columnas customerID o Churn
+    """
+    outcomes = read_result_columns(source, [ID_COLUMN, OUTCOME_COLUMN])
+    missing_cols = [col for col in (ID_COLUMN, OUTCOME_COLUMN) if col not in outcomes.columns]
+    if missing_cols:
+        raise ValueError(f"Faltan columnas: {missing_cols}")
+    return store.ingest_outcomes(outcomes[ID_COLUMN], outcomes[OUTCOME_COLUMN])
+
+
+@st.cache_resource(show_spinner=False)
+def get_performance_store():
+    """
+    Devuelve el almacén de desempeño compartido entre sesiones.
+    """
+    return PerformanceStore()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Registra predicciones y resultados observados para medir el desempeño real.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    log_parser = subparsers.add_parser("log", help="Registra un archivo de resultados de scoring")
+    log_parser.add_argument("input", type=Path, help="Resultados con customerID y Probabilidad_Churn")
+    log_parser.add_argument("--date", help="Fecha de scoring (AAAA-MM-DD, por defecto hoy)")
+    log_parser.add_argument("--model-version", help="Versión del modelo que puntuó el lote")
+
+    outcomes_parser = subparsers.add_parser("outcomes", help="Ingiere resultados observados")
+    outcomes_parser.add_argument("input", type=Path, help="Archivo con customerID y Churn")
+
+    summary_parser = subparsers.add_parser("summary", help="Métricas móviles por día")
+    summary_parser.add_argument("--window", type=int, default=None, help="Días de la ventana móvil")
+
+    args = parser.parse_args(argv)
+    store = PerformanceStore()
+    if args.command == "log":
+        rows = log_results(store, args.input, args.model_version, args.date)
+        print(f"{rows:,} predicciones registradas")
+    elif args.command == "outcomes":
+        print(ingest_outcome_file(store, args.input))
+    else:
+        print(store.daily_counts().rolling_metrics(args.window).round(4).to_string())
+        print(f"Predicciones pendientes de resultado: {store.pending_count():,}")
+
+
+if __name__ == "__main__":
+    main()
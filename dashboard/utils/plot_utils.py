@@ -1,9 +1,11 @@
-import plotly.graph_objects as go
-import plotly.express as px
 import pandas as pd
 
+# plotly se importa dentro de cada función: solo lo paga la página que grafica
+
 
 def plot_model_performance(metrics):
+    import plotly.graph_objects as go
+
     metrics_data = {
         'F1-Score': metrics['f1_score'],
         'ROC AUC': metrics['roc_auc'],
@@ -32,6 +34,8 @@ def plot_model_performance(metrics):
 
 
 def plot_churn_distribution(churn_data: pd.DataFrame):
+    import plotly.express as px
+
     fig_pie = px.pie(
         churn_data,
         names='Churn',
@@ -46,6 +50,8 @@ def plot_churn_distribution(churn_data: pd.DataFrame):
 
 
 def plot_risk_factors(risk_factors: dict):
+    import plotly.graph_objects as go
+
     fig = go.Figure(go.Bar(
         x=list(risk_factors.values()),
         y=list(risk_factors.keys()),
@@ -64,6 +70,8 @@ def plot_risk_factors(risk_factors: dict):
 
 
 def plot_churn_reduction(months, without_model, with_model):
+    import plotly.graph_objects as go
+
     fig = go.Figure()
     fig.add_trace(go.Scatter(
         x=months,
@@ -0,0 +1,380 @@
+"""
+Registro de modelos versionados para scoring champion/challenger.
+
+Cada versión es un bundle (ver bundle_utils) en models/registry/<versión>/ y
+registry.json indica el champion y los challengers. Los challengers puntúan
+en sombra sobre el mismo lote que el champion y sus distribuciones de score
+y tasas de desacuerdo se registran en logs/shadow_scores.jsonl.
+
+Promover una versión reescribe registry.json de forma atómica; los procesos
+que usan ModelRegistry la cargan en la siguiente llamada a refresh(), sin
+reiniciar Streamlit.
+
+Uso (desde la carpeta dashboard/):
+    python -m utils.registry_utils list
+    python -m utils.registry_utils register --version 2026-11 --models-dir /ruta/pickles
+    python -m utils.registry_utils promote 2026-11
+"""
+import argparse
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from config.config import RISK_LEVELS, SHADOW_CONFIG
+from utils.bundle_utils import (
+    BUNDLE_DIR, MANIFEST_FILE, export_model_bundle, load_model_bundle, read_manifest
+)
+from utils.model_utils import MODELS_DIR, build_scoring_result, classify_risk_levels, read_model_components
+from utils.scoring_utils import StackedLinearScorer
+
+REGISTRY_DIR = MODELS_DIR / "registry"
+REGISTRY_FILE = "registry.json"
+SHADOW_LOG = MODELS_DIR.parent / "logs" / "shadow_scores.jsonl"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def read_registry(registry_dir=REGISTRY_DIR):
+    """
+    Lee registry.json.
+
+    Returns:
+        dict con champion, challengers e historial, o None si no existe el registro
+    """
+    path = Path(registry_dir) / REGISTRY_FILE
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_registry(registry: dict, registry_dir=REGISTRY_DIR):
+    """
+    Escribe registry.json de forma atómica: los lectores ven el estado
+    anterior o el nuevo, nunca uno a medias.
+    """
+    registry_dir = Path(registry_dir)
+    registry_dir.mkdir(parents=True, exist_ok=True)
+    registry["updated_at"] = _now()
+    tmp_path = registry_dir / (REGISTRY_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(registry, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, registry_dir / REGISTRY_FILE)
+
+
+def champion_bundle_dir(models_dir=MODELS_DIR):
+    """
+    Carpeta del bundle champion según el registro, o None si no hay registro.
+    """
+    registry_dir = Path(models_dir) / REGISTRY_DIR.name
+    registry = read_registry(registry_dir)
+    if not registry or not registry.get("champion"):
+        return None
+    return registry_dir / registry["champion"]
+
+
+def register_model(model, categorical_columns, feature_names, ohe, version,
+                   registry_dir=REGISTRY_DIR, champion=False) -> dict:
+    """
+    Exporta un modelo al registro como challenger (o champion si se indica
+    o si el registro está vacío).
+
+    Returns:
+        dict con el registro actualizado
+    """
+    registry_dir = Path(registry_dir)
+    registry = read_registry(registry_dir) or {
+        "champion": None, "challengers": [], "history": []}
+    if version == registry["champion"] or version in registry["challengers"]:
+        raise ValueError(f"La versión {version} ya está registrada")
+
+    export_model_bundle(model, categorical_columns, feature_names, ohe,
+                        bundle_dir=registry_dir / version, model_version=version)
+
+    if champion or registry["champion"] is None:
+        if registry["champion"] is not None:
+            registry["challengers"].append(registry["champion"])
+        registry["champion"] = version
+    else:
+        registry["challengers"].append(version)
+    registry["history"].append({"action": "register", "version": version, "at": _now()})
+    write_registry(registry, registry_dir)
+    return registry
+
+
+def promote_model(version, registry_dir=REGISTRY_DIR) -> dict:
+    """
+    Convierte un challenger en champion; el champion anterior pasa a challenger.
+    """
+    registry = read_registry(registry_dir)
+    if registry is None or version not in registry["challengers"]:
+        raise ValueError(f"La versión {version} no es un challenger registrado")
+
+    registry["challengers"].remove(version)
+    registry["challengers"].insert(0, registry["champion"])
+    registry["champion"] = version
+    registry["history"].append({"action": "promote", "version": version, "at": _now()})
+    write_registry(registry, registry_dir)
+    return registry
+
+
+def retire_model(version, registry_dir=REGISTRY_DIR) -> dict:
+    """
+    Deja de puntuar un challenger en sombra (el bundle se conserva en disco).
+    """
+    registry = read_registry(registry_dir)
+    if registry is None or version not in registry["challengers"]:
+        raise ValueError(f"La versión {version} no es un challenger registrado")
+
+    registry["challengers"].remove(version)
+    registry["history"].append({"action": "retire", "version": version, "at": _now()})
+    write_registry(registry, registry_dir)
+    return registry
+
+
+def summarize_shadow_scores(probabilities: np.ndarray, versions: list, bins=None) -> dict:
+    """
+    Resume la distribución de score de cada modelo y su desacuerdo con el champion.
+
+    Args:
+        probabilities: Matriz (filas, modelos); la primera columna es el champion
+        versions: Versiones en el orden de las columnas
+
+    Returns:
+        dict versión -> métricas del lote
+    """
+    bins = bins or SHADOW_CONFIG['histogram_bins']
+    edges = np.linspace(0.0, 1.0, bins + 1)
+    champion = probabilities[:, 0]
+    champion_pred = champion > 0.5
+    champion_tier = classify_risk_levels(champion).codes
+
+    summary = {}
+    for m, version in enumerate(versions):
+        prob = probabilities[:, m]
+        tiers = classify_risk_levels(prob)
+        summary[version] = {
+            "mean": float(prob.mean()),
+            "histogram": np.histogram(prob, bins=edges)[0].tolist(),
+            "tier_counts": np.bincount(
+                tiers.codes, minlength=len(RISK_LEVELS['labels'])).tolist(),
+            "disagreement_rate": float(((prob > 0.5) != champion_pred).mean()),
+            "tier_disagreement_rate": float((tiers.codes != champion_tier).mean()),
+            "mean_abs_diff": float(np.abs(prob - champion).mean())
+        }
+    return summary
+
+
+class ModelRegistry:
+    """
+    Mantiene cargados el champion y los challengers del registro.
+
+    Si no hay registro, el champion es el bundle por defecto y no hay sombra.
+    El estado se sustituye con una sola asignación al recargar, de modo que
+    una llamada a score() en curso termina con los modelos con que empezó.
+    """
+
+    def __init__(self, models_dir=MODELS_DIR, shadow_log=SHADOW_LOG):
+        self.models_dir = Path(models_dir)
+        self.registry_dir = self.models_dir / REGISTRY_DIR.name
+        self.shadow_log = Path(shadow_log)
+        self._lock = threading.Lock()
+        self._signature = None
+        self._state = None
+        self.refresh()
+
+    def _registry_signature(self):
+        try:
+            stat = (self.registry_dir / REGISTRY_FILE).stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load_state(self) -> dict:
+        registry = read_registry(self.registry_dir)
+        if registry and registry.get("champion"):
+            versions = [registry["champion"]] + list(registry["challengers"])
+            bundle_dirs = [self.registry_dir / version for version in versions]
+        else:
+            bundle_dir = self.models_dir / BUNDLE_DIR.name
+            if not (bundle_dir / MANIFEST_FILE).exists():
+                return {"versions": [], "bundle_dirs": [], "kernels": [], "scorer": None}
+            versions = [read_manifest(bundle_dir)["model_version"]]
+            bundle_dirs = [bundle_dir]
+
+        kernels = [load_model_bundle(bundle_dir)[0] for bundle_dir in bundle_dirs]
+        return {
+            "versions": versions,
+            "bundle_dirs": [str(bundle_dir) for bundle_dir in bundle_dirs],
+            "kernels": kernels,
+            "scorer": StackedLinearScorer(kernels)
+        }
+
+    def refresh(self) -> bool:
+        """
+        Recarga los modelos si registry.json cambió.
+
+        Returns:
+            True si se cargó un estado nuevo
+        """
+        signature = self._registry_signature()
+        if self._state is not None and signature == self._signature:
+            return False
+        with self._lock:
+            if self._state is not None and signature == self._signature:
+                return False
+            self._state = self._load_state()
+            self._signature = signature
+        return True
+
+    @property
+    def versions(self) -> list:
+        return self._state["versions"]
+
+    @property
+    def champion_version(self):
+        return self._state["versions"][0] if self._state["versions"] else None
+
+    @property
+    def champion_kernel(self):
+        return self._state["kernels"][0] if self._state["kernels"] else None
+
+    def score(self, data: pd.DataFrame, parallel=None) -> pd.DataFrame:
+        """
+        Puntúa el lote con el champion y, en la misma pasada, con los challengers.
+
+        Args:
+            data: Lote de datos sin preprocesar
+            parallel: Función (data, bundle_dirs) -> matriz de probabilidades
+                que puntúa los mismos bundles en otros procesos (opcional)
+
+        Returns:
+            DataFrame con el resultado del champion o None si hay error
+        """
+        state = self._state
+        try:
+            probabilities = state["scorer"].predict_proba(data) if parallel is None \
+                else parallel(data, state["bundle_dirs"])
+        except Exception as e:
+            st.error(f"Error al hacer predicción: {e}")
+            return None
+
+        if len(state["versions"]) > 1 and SHADOW_CONFIG['enabled'] and len(data):
+            self.log_shadow(probabilities, state["versions"])
+        return build_scoring_result(probabilities[:, 0], index=data.index)
+
+    def log_shadow(self, probabilities: np.ndarray, versions: list):
+        record = {
+            "timestamp": _now(),
+            "champion": versions[0],
+            "rows": int(len(probabilities)),
+            "models": summarize_shadow_scores(probabilities, versions)
+        }
+        try:
+            self.shadow_log.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.shadow_log, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError:
+            # El registro en sombra nunca debe romper el scoring del champion
+            pass
+
+
+def load_shadow_log(shadow_log=SHADOW_LOG) -> pd.DataFrame:
+    """
+    Lee el log en sombra con una fila por lote y modelo.
+    """
+    shadow_log = Path(shadow_log)
+    if not shadow_log.exists():
+        return pd.DataFrame()
+
+    rows = []
+    with open(shadow_log, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            for version, metrics in record["models"].items():
+                rows.append({"timestamp": record["timestamp"], "champion": record["champion"],
+                             "version": version, "rows": record["rows"], **metrics})
+    return pd.DataFrame(rows)
+
+
+def summarize_shadow_log(shadow: pd.DataFrame) -> pd.DataFrame:
+    """
+    Agrega el log en sombra por versión, ponderando cada lote por sus filas.
+    """
+    if shadow.empty:
+        return shadow
+    weighted = shadow.assign(**{
+        col: shadow[col] * shadow["rows"]
+        for col in ["mean", "disagreement_rate", "tier_disagreement_rate", "mean_abs_diff"]})
+    summary = weighted.groupby("version")[
+        ["rows", "mean", "disagreement_rate", "tier_disagreement_rate", "mean_abs_diff"]].sum()
+    for col in ["mean", "disagreement_rate", "tier_disagreement_rate", "mean_abs_diff"]:
+        summary[col] /= summary["rows"]
+    summary.insert(1, "lotes", shadow.groupby("version").size())
+    return summary
+
+
+@st.cache_resource(show_spinner=False)
+def get_model_registry():
+    """
+    Devuelve el registro de modelos compartido entre sesiones.
+    """
+    return ModelRegistry()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Gestiona el registro de modelos champion/challenger.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("list", help="Muestra champion y challengers")
+
+    register = subparsers.add_parser(
+        "register", help="Registra los pickles de un modelo como challenger")
+    register.add_argument("--version", required=True)
+    register.add_argument("--models-dir", default=str(MODELS_DIR),
+                          help="Carpeta con los pickles del modelo")
+    register.add_argument("--champion", action="store_true",
+                          help="Registra la versión directamente como champion")
+
+    promote = subparsers.add_parser("promote", help="Promueve un challenger a champion")
+    promote.add_argument("version")
+
+    retire = subparsers.add_parser("retire", help="Retira un challenger de la sombra")
+    retire.add_argument("version")
+
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "register":
+            registry = register_model(*read_model_components(args.models_dir), args.version,
+                                      champion=args.champion)
+        elif args.command == "promote":
+            registry = promote_model(args.version)
+        elif args.command == "retire":
+            registry = retire_model(args.version)
+        else:
+            registry = read_registry()
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 2
+
+    if registry is None:
+        print(f"Sin registro en {REGISTRY_DIR}")
+        return 0
+    print(f"Champion: {registry['champion']}")
+    print(f"Challengers: {', '.join(registry['challengers']) or '-'}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,341 @@
+"""
+Servicio HTTP local de scoring de churn basado en asyncio.
+
+Las peticiones individuales concurrentes se agrupan en micro-lotes dentro de
+un presupuesto de latencia configurable, de modo que muchas peticiones
+comparten una sola llamada vectorizada al modelo. Cada micro-lote se valida
+con utils.validation_utils antes de puntuarse: un registro inválido recibe su
+propio 400 con los motivos de rechazo y no afecta al resto del lote.
+
+Uso (desde la carpeta dashboard/):
+    python -m utils.scoring_service --port 8080
+
+Endpoints:
+    POST /score         Un cliente (objeto JSON); 400 con motivos si no es válido
+    POST /score/batch   Lista de clientes (array JSON); los inválidos se
+                        devuelven en su posición con error y motivos
+    GET  /metrics       Latencias p50/p99 e histograma de tamaños de lote
+    GET  /health        Estado del servicio
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter, deque
+from http import HTTPStatus
+
+import numpy as np
+import pandas as pd
+
+from config.config import SERVICE_CONFIG
+from utils.bulk_analysis_utils import get_example_dataframe
+from utils.model_utils import read_model_components
+from utils.bundle_utils import read_scoring_kernel
+from utils.scoring_utils import score_raw_data
+from utils.feature_utils import DERIVED_FEATURES, derive_features, missing_input_columns
+from utils.ingestion_utils import ID_COLUMN
+from utils.validation_utils import CODE_COLUMN, REASON_COLUMN, split_valid_rows
+
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+
+class RequestError(Exception):
+    """
+    Error de la petición que se devuelve al cliente con su código HTTP.
+    """
+
+    def __init__(self, status, message, details=None):
+        super().__init__(message)
+        self.status = status
+        self.details = details or {}
+
+    def to_payload(self) -> dict:
+        return {"error": str(self), **self.details}
+
+
+class LatencyStats:
+    """
+    Latencias recientes por endpoint e histograma de tamaños de micro-lote.
+    """
+
+    def __init__(self, window=10_000):
+        self.latencies = {}
+        self.window = window
+        self.batch_sizes = Counter()
+
+    def record_latency(self, endpoint, seconds):
+        if endpoint not in self.latencies:
+            self.latencies[endpoint] = deque(maxlen=self.window)
+        self.latencies[endpoint].append(seconds * 1000)
+
+    def record_batch(self, size):
+        # Cubetas en potencias de 2: 1, 2-3, 4-7, ...
+        low = 1 << (size.bit_length() - 1)
+        self.batch_sizes[low] += 1
+
+    def snapshot(self) -> dict:
+        latency = {}
+        for endpoint, values in self.latencies.items():
+            values = np.fromiter(values, dtype=np.float64)
+            latency[endpoint] = {
+                "count": int(values.size),
+                "p50_ms": float(np.percentile(values, 50)),
+                "p99_ms": float(np.percentile(values, 99))
+            }
+        histogram = {f"{low}-{2 * low - 1}" if low > 1 else "1": count
+                     for low, count in sorted(self.batch_sizes.items())}
+        return {"latency": latency, "batch_size_histogram": histogram}
+
+
+class MicroBatcher:
+    """
+    Agrupa peticiones individuales en lotes de hasta max_batch_size registros,
+    esperando como máximo max_wait_ms desde la llegada del primero.
+    """
+
+    def __init__(self, score_func, stats, max_batch_size=None, max_wait_ms=None):
+        self.score_func = score_func
+        self.stats = stats
+        self.max_batch_size = max_batch_size or SERVICE_CONFIG['max_batch_size']
+        self.max_wait = (SERVICE_CONFIG['max_wait_ms']
+                         if max_wait_ms is None else max_wait_ms) / 1000
+        self.queue = asyncio.Queue()
+
+    async def submit(self, record: dict) -> dict:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((record, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            records = [record for record, _ in batch]
+            self.stats.record_batch(len(records))
+            try:
+                # El scoring corre en un hilo para no bloquear el event loop;
+                # mientras tanto la cola acumula el siguiente lote
+                results = await loop.run_in_executor(None, self.score_func, records)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                # Los registros rechazados por la validación fallan por separado
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+class ScoringService:
+    """
+    Servicio HTTP/1.1 mínimo sobre asyncio con endpoints de scoring.
+    """
+
+    def __init__(self, max_batch_size=None, max_wait_ms=None):
+        kernel = read_scoring_kernel()
+        model, categorical_columns, feature_names, ohe = (None, None, None, None) \
+            if kernel is not None else read_model_components()
+        self._score_data = lambda data: score_raw_data(
+            data, kernel, model, categorical_columns, feature_names, ohe)
+        self.required_cols = get_example_dataframe().columns.tolist()
+        self.stats = LatencyStats()
+        self.batcher = MicroBatcher(
+            self.score_records, self.stats, max_batch_size, max_wait_ms)
+
+    def validate_record(self, record):
+        if not isinstance(record, dict):
+            raise RequestError(HTTPStatus.BAD_REQUEST,
+                               "Cada cliente debe ser un objeto JSON")
+        # Se aceptan registros crudos: tenure_group y MultipleServices se derivan
+        missing_cols = missing_input_columns(record, self.required_cols)
+        if missing_cols:
+            raise RequestError(HTTPStatus.BAD_REQUEST,
+                               f"Faltan columnas: {missing_cols}")
+
+    def records_frame(self, records: list) -> pd.DataFrame:
+        """
+        DataFrame de los registros con las variables derivadas, indexado por posición.
+        """
+        # Crudos y ya derivados se preparan por separado: mezclados en un
+        # DataFrame, las variables derivadas quedarían nulas en los crudos
+        groups = {}
+        for position, record in enumerate(records):
+            groups.setdefault(tuple(col in record for col in DERIVED_FEATURES), []).append(position)
+        frames = [derive_features(pd.DataFrame.from_records([records[i] for i in positions], index=positions))
+                  for positions in groups.values()]
+        return frames[0] if len(frames) == 1 else pd.concat(frames).sort_index()
+
+    def score_records(self, records: list) -> list:
+        """
+        Valida y puntúa una lista de registros en una sola llamada vectorizada.
+
+        Returns:
+            Lista con el resultado de cada registro; los que no superan la
+            validación reciben un RequestError (400) con sus motivos de rechazo
+        """
+        data = self.records_frame(records)
+        accepted, rejected, _ = split_valid_rows(data, self.required_cols)
+
+        results = [None] * len(records)
+        if len(accepted):
+            scores = self._score_data(accepted)
+            if scores is None:
+                raise ValueError("Error al hacer predicción")
+            for position, prob, pred, tier in zip(
+                    accepted.index, scores["Probabilidad_Churn"], scores["Prediccion"], scores["Nivel_Riesgo"]):
+                results[position] = {
+                    "Probabilidad_Churn": float(prob), "Prediccion": int(pred), "Nivel_Riesgo": str(tier)}
+        for position, code, reasons in zip(rejected.index, rejected[CODE_COLUMN], rejected[REASON_COLUMN]):
+            results[position] = RequestError(
+                HTTPStatus.BAD_REQUEST, "El cliente no superó la validación",
+                {CODE_COLUMN: int(code), REASON_COLUMN: reasons.split("; ")})
+
+        for record, result in zip(records, results):
+            if ID_COLUMN in record:
+                if isinstance(result, RequestError):
+                    result.details[ID_COLUMN] = record[ID_COLUMN]
+                else:
+                    result[ID_COLUMN] = record[ID_COLUMN]
+        return results
+
+    async def route(self, method, path, body):
+        if path == "/health" and method == "GET":
+            return {"status": "ok"}
+        if path == "/metrics" and method == "GET":
+            return self.stats.snapshot()
+        if path in ("/score", "/score/batch"):
+            if method != "POST":
+                raise RequestError(
+                    HTTPStatus.METHOD_NOT_ALLOWED, "Usa POST")
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                raise RequestError(HTTPStatus.BAD_REQUEST, "JSON inválido")
+
+            if path == "/score":
+                self.validate_record(payload)
+                return await self.batcher.submit(payload)
+
+            if not isinstance(payload, list):
+                raise RequestError(HTTPStatus.BAD_REQUEST,
+                                   "Se esperaba una lista de clientes")
+            for record in payload:
+                self.validate_record(record)
+            if not payload:
+                return []
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(None, self.score_records, payload)
+            return [result.to_payload() if isinstance(result, RequestError) else result
+                    for result in results]
+        raise RequestError(HTTPStatus.NOT_FOUND, "Ruta no encontrada")
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                start = time.perf_counter()
+                try:
+                    method, path, version = request_line.decode(
+                        "latin-1").split()
+                except ValueError:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    await self.write_response(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                              {"error": "Petición demasiado grande"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                keep_alive = headers.get("connection", "").lower() != "close" \
+                    and version == "HTTP/1.1"
+                try:
+                    status, payload = HTTPStatus.OK, await self.route(method, path.split("?")[0], body)
+                except RequestError as e:
+                    status, payload = e.status, e.to_payload()
+                except Exception as e:
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {
+                        "error": str(e)}
+
+                await self.write_response(writer, status, payload, keep_alive)
+                if path.startswith("/score") and status == HTTPStatus.OK:
+                    self.stats.record_latency(
+                        path, time.perf_counter() - start)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def write_response(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def serve(self, host=None, port=None):
+        host = host or SERVICE_CONFIG['host']
+        port = port or SERVICE_CONFIG['port']
+        batcher_task = asyncio.create_task(self.batcher.run())
+        server = await asyncio.start_server(self.handle_client, host, port)
+        print(f"Servicio de scoring escuchando en http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher_task.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Servicio HTTP local de scoring de churn.")
+    parser.add_argument("--host", default=SERVICE_CONFIG['host'])
+    parser.add_argument("--port", type=int, default=SERVICE_CONFIG['port'])
+    parser.add_argument("--max-batch-size", type=int,
+                        default=SERVICE_CONFIG['max_batch_size'],
+                        help="Registros máximos por micro-lote")
+    parser.add_argument("--max-wait-ms", type=float,
+                        default=SERVICE_CONFIG['max_wait_ms'],
+                        help="Espera máxima para completar un micro-lote")
+    args = parser.parse_args(argv)
+
+    service = ScoringService(args.max_batch_size, args.max_wait_ms)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+Scoring de modelos lineales con tablas de pesos por columna categórica.
+
+Comprobar que el kernel coincide con el modelo de scikit-learn sobre el
+dataset de referencia (desde la carpeta dashboard/):
+    python -m utils.scoring_utils
+"""
+import argparse
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from utils.encoding_utils import category_codes, category_feature_index, encode_features
+from utils.model_utils import MODELS_DIR, preprocess_input, read_model_components, score_churn
+
+# Diferencia máxima admitida entre el kernel y predict_proba del modelo
+KERNEL_TOLERANCE = 1e-12
+UNKNOWN_CATEGORY = "__desconocida__"
+
+
+class LinearScoringKernel:
+    """
+    Kernel de scoring para modelos lineales que pliega el OneHotEncoder y los
+    coeficientes en una tabla de pesos por columna categórica.
+
+    Cada tabla tiene una posición final con peso 0 que recibe el código -1,
+    de modo que las categorías desconocidas se comportan igual que con
+    handle_unknown='ignore' del encoder (todas las columnas en 0).
+    """
+
+    def __init__(self, categorical_columns, categories, tables, numeric_columns, numeric_weights, intercept):
+        self.categorical_columns = list(categorical_columns)
+        self.categories = [np.asarray(cats) for cats in categories]
+        self.tables = [np.asarray(table, dtype=np.float64)
+                       for table in tables]
+        self.numeric_columns = list(numeric_columns)
+        self.numeric_weights = np.asarray(numeric_weights, dtype=np.float64)
+        self.intercept = float(intercept)
+        self.classes_ = np.array([0, 1])
+
+    @classmethod
+    def from_coefficients(cls, categorical_columns, categories, feature_names, coef, intercept):
+        """
+        Construye el kernel a partir de los coeficientes en el orden de feature_names.
+
+        Las categorías que no aparecen en feature_names (la categoría eliminada
+        por drop='first') tienen peso 0.
+        """
+        coef = np.asarray(coef, dtype=np.float64).ravel()
+        index_maps, numeric_columns = category_feature_index(
+            categorical_columns, categories, feature_names)
+
+        tables = [np.where(positions >= 0, coef[positions], 0.0)
+                  for positions in index_maps]
+        feature_index = {name: i for i, name in enumerate(feature_names)}
+        numeric_weights = [coef[feature_index[f]] for f in numeric_columns]
+
+        return cls(categorical_columns, categories, tables, numeric_columns, numeric_weights, intercept)
+
+    @classmethod
+    def from_components(cls, model, categorical_columns, feature_names, ohe):
+        """
+        Construye el kernel a partir de los componentes de load_model_components.
+        """
+        return cls.from_coefficients(
+            categorical_columns, ohe.categories_, feature_names,
+            model.coef_[0], model.intercept_[0])
+
+    def decision_function(self, data: pd.DataFrame) -> np.ndarray:
+        """
+        Calcula el logit de churn para los datos sin preprocesar.
+        """
+        logit = np.full(len(data), self.intercept, dtype=np.float64)
+
+        for col, cats, table in zip(self.categorical_columns, self.categories, self.tables):
+            logit += table[category_codes(data[col], cats)]
+
+        # Las variables numéricas ausentes equivalen a columnas en 0
+        present = [i for i, col in enumerate(
+            self.numeric_columns) if col in data.columns]
+        if present:
+            values = data[[self.numeric_columns[i] for i in present]].to_numpy(
+                dtype=np.float64)
+            logit += values @ self.numeric_weights[present]
+
+        return logit
+
+    def predict_proba(self, data: pd.DataFrame) -> np.ndarray:
+        """
+        Devuelve las probabilidades [no churn, churn] con el mismo formato que sklearn.
+        """
+        prob = 1.0 / (1.0 + np.exp(-self.decision_function(data)))
+        return np.column_stack([1.0 - prob, prob])
+
+    def predict(self, data: pd.DataFrame) -> np.ndarray:
+        """
+        Devuelve la clase predicha (1 = churn).
+        """
+        return (self.decision_function(data) > 0).astype(int)
+
+
+class StackedLinearScorer:
+    """
+    Puntúa varios kernels lineales en una sola pasada.
+
+    Los vocabularios de todos los modelos se unen por columna y sus tablas de
+    pesos se apilan en una matriz (categorías + 1, modelos). Los códigos de
+    cada columna se calculan una sola vez y seleccionan una fila de la matriz,
+    que equivale a multiplicar la matriz one-hot común por los coeficientes
+    apilados; las numéricas se resuelven con un único producto matricial.
+    """
+
+    def __init__(self, kernels):
+        self.kernels = list(kernels)
+        n_models = len(self.kernels)
+
+        self.categorical_columns = list(dict.fromkeys(
+            col for kernel in self.kernels for col in kernel.categorical_columns))
+        self.categories = []
+        self.tables = []
+        for col in self.categorical_columns:
+            sources = [(m, kernel.categorical_columns.index(col))
+                       for m, kernel in enumerate(self.kernels) if col in kernel.categorical_columns]
+            cats = pd.Index(pd.unique(np.concatenate(
+                [np.asarray(self.kernels[m].categories[k], dtype=object) for m, k in sources])))
+            table = np.zeros((len(cats) + 1, n_models), dtype=np.float64)
+            for m, k in sources:
+                kernel = self.kernels[m]
+                positions = cats.get_indexer(kernel.categories[k])
+                table[positions, m] = kernel.tables[k][:-1]
+            self.categories.append(cats)
+            self.tables.append(table)
+
+        self.numeric_columns = list(dict.fromkeys(
+            col for kernel in self.kernels for col in kernel.numeric_columns))
+        self.numeric_weights = np.zeros(
+            (len(self.numeric_columns), n_models), dtype=np.float64)
+        for m, kernel in enumerate(self.kernels):
+            positions = [self.numeric_columns.index(col) for col in kernel.numeric_columns]
+            self.numeric_weights[positions, m] = kernel.numeric_weights
+
+        self.intercepts = np.array([kernel.intercept for kernel in self.kernels])
+
+    def decision_function(self, data: pd.DataFrame) -> np.ndarray:
+        """
+        Calcula el logit de churn de cada modelo.
+
+        Returns:
+            np.ndarray de forma (filas, modelos)
+        """
+        logits = np.tile(self.intercepts, (len(data), 1))
+
+        for col, cats, table in zip(self.categorical_columns, self.categories, self.tables):
+            logits += table[category_codes(data[col], cats)]
+
+        present = [i for i, col in enumerate(
+            self.numeric_columns) if col in data.columns]
+        if present:
+            values = data[[self.numeric_columns[i] for i in present]].to_numpy(
+                dtype=np.float64)
+            logits += values @ self.numeric_weights[present]
+
+        return logits
+
+    def predict_proba(self, data: pd.DataFrame) -> np.ndarray:
+        """
+        Devuelve la probabilidad de churn de cada modelo, de forma (filas, modelos).
+        """
+        return 1.0 / (1.0 + np.exp(-self.decision_function(data)))
+
+
+def build_scoring_kernel(model, categorical_columns, feature_names, ohe):
+    """
+    Construye el kernel plegado si el modelo es lineal y binario.
+
+    Returns:
+        LinearScoringKernel o None si el modelo no es compatible
+    """
+    coef = getattr(model, "coef_", None)
+    if coef is None or np.shape(coef)[0] != 1 or not hasattr(ohe, "categories_"):
+        return None
+    return LinearScoringKernel.from_components(model, categorical_columns, feature_names, ohe)
+
+
+def score_raw_data(data, kernel, model, categorical_columns, feature_names, ohe):
+    """
+    Calcula el resultado de scoring de datos sin preprocesar.
+
+    Usa el kernel plegado cuando está disponible y, si no, la matriz de
+    encode_features con el modelo.
+
+    Returns:
+        DataFrame con el resultado de scoring o None si hay error
+    """
+    if kernel is not None:
+        return score_churn(kernel, data)
+
+    encoded = encode_features(data, categorical_columns, feature_names, ohe)
+    return score_churn(model, encoded, index=data.index)
+
+
+def kernel_max_difference(data, kernel, model, categorical_columns, feature_names, ohe) -> float:
+    """
+    Diferencia máxima entre la probabilidad de churn del kernel y la del
+    modelo sobre la matriz de preprocess_input.
+
+    Args:
+        data: DataFrame sin preprocesar
+        kernel: LinearScoringKernel construido con los mismos componentes
+
+    Returns:
+        float con la mayor diferencia absoluta por fila
+    """
+    expected = model.predict_proba(preprocess_input(data, categorical_columns, feature_names, ohe))[:, 1]
+    return float(np.max(np.abs(kernel.predict_proba(data)[:, 1] - expected)))
+
+
+def check_kernel_equivalence(data_path=None, models_dir=MODELS_DIR, tolerance=KERNEL_TOLERANCE) -> float:
+    """
+    Comprueba que el kernel plegado puntúa igual que el modelo en el dataset
+    de referencia más una fila con todas las categóricas desconocidas
+    (handle_unknown='ignore' del encoder frente al peso 0 del kernel).
+
+    Args:
+        data_path: CSV sin preprocesar (por defecto, el dataset de referencia)
+        models_dir: Carpeta con los artefactos del modelo
+        tolerance: Diferencia máxima admitida
+
+    Returns:
+        float con la diferencia máxima encontrada
+
+    Raises:
+        ValueError: Si el modelo no es lineal o la diferencia supera la tolerancia
+    """
+    from utils.dataset_utils import find_reference_source
+
+    components = read_model_components(models_dir)
+    kernel = build_scoring_kernel(*components)
+    if kernel is None:
+        raise ValueError("El modelo no es lineal y binario: no hay kernel que comprobar")
+
+    data_path = data_path or find_reference_source()
+    if data_path is None:
+        raise ValueError("No se encontró el dataset de referencia")
+    data = pd.read_csv(data_path)
+    unknown = data.iloc[[0]].copy()
+    unknown[kernel.categorical_columns] = UNKNOWN_CATEGORY
+    data = pd.concat([data, unknown], ignore_index=True)
+
+    with warnings.catch_warnings():
+        # El encoder avisa de las categorías desconocidas, que aquí son intencionadas
+        warnings.simplefilter("ignore", UserWarning)
+        difference = kernel_max_difference(data, kernel, *components)
+
+    if not difference <= tolerance:
+        raise ValueError(
+            f"El kernel difiere del modelo en {difference:.3e} (tolerancia {tolerance:.0e})")
+    return difference
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Comprueba que el kernel lineal coincide con predict_proba del modelo")
+    parser.add_argument("data", nargs="?", default=None,
+                        help="CSV sin preprocesar (por defecto, el dataset de referencia)")
+    parser.add_argument("--models-dir", default=MODELS_DIR, help="Carpeta con los pickles del modelo")
+    parser.add_argument("--tolerance", type=float, default=KERNEL_TOLERANCE,
+                        help="Diferencia máxima admitida")
+    args = parser.parse_args(argv)
+
+    try:
+        difference = check_kernel_equivalence(args.data, args.models_dir, args.tolerance)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    print(f"Kernel equivalente al modelo (diferencia máxima {difference:.3e})")
+
+
+if __name__ == "__main__":
+    main()
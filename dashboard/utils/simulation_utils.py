@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+
+from config.config import RISK_LEVELS
+from utils.encoding_utils import category_codes
+from utils.model_utils import classify_risk_levels
+
+
+def apply_policy_rules(data: pd.DataFrame, rules: list):
+    """
+    Aplica reglas declarativas de cambio de columnas sobre un lote.
+
+    Cada regla es un dict con:
+        when: {columna: valor o lista de valores} (todas las condiciones deben cumplirse)
+        set: {columna: nuevo valor}
+
+    Las reglas se aplican en orden y cada una ve el resultado de las anteriores.
+    Las variables derivadas (p. ej. MultipleServices) no se recalculan: si la
+    política las afecta deben incluirse en set.
+
+    Returns:
+        tuple: (dict columna -> Series con los valores nuevos, máscara de filas afectadas)
+    """
+    changed = {}
+    affected = np.zeros(len(data), dtype=bool)
+
+    for rule in rules:
+        mask = np.ones(len(data), dtype=bool)
+        for col, value in rule.get("when", {}).items():
+            values = changed.get(col, data[col])
+            if isinstance(value, (list, tuple, set)):
+                mask &= values.isin(list(value)).to_numpy()
+            else:
+                mask &= (values == value).to_numpy()
+        if not mask.any():
+            continue
+
+        for col, new_value in rule["set"].items():
+            values = changed.get(col, data[col])
+            if isinstance(values.dtype, pd.CategoricalDtype) and new_value not in values.cat.categories:
+                values = values.cat.add_categories([new_value])
+            changed[col] = values.where(~mask, new_value)
+        affected |= mask
+
+    return changed, affected
+
+
+def logit_delta(kernel, data: pd.DataFrame, changed: dict, rows: np.ndarray) -> np.ndarray:
+    """
+    Calcula el cambio de logit de las filas indicadas usando solo las columnas modificadas.
+    """
+    delta = np.zeros(len(rows), dtype=np.float64)
+    for col, new_values in changed.items():
+        if col in kernel.categorical_columns:
+            k = kernel.categorical_columns.index(col)
+            cats, table = kernel.categories[k], kernel.tables[k]
+            old_codes = category_codes(data[col].iloc[rows], cats)
+            new_codes = category_codes(new_values.iloc[rows], cats)
+            delta += table[new_codes] - table[old_codes]
+        elif col in kernel.numeric_columns:
+            weight = kernel.numeric_weights[kernel.numeric_columns.index(col)]
+            old = data[col].iloc[rows].to_numpy(dtype=np.float64)
+            new = new_values.iloc[rows].to_numpy(dtype=np.float64)
+            delta += weight * (new - old)
+    return delta
+
+
+def simulate_policy(scored: pd.DataFrame, rules: list, kernel=None, score_func=None) -> dict:
+    """
+    Simula una política de retención sobre un lote ya puntuado.
+
+    Solo se recalculan las filas afectadas. Con el kernel lineal se suma al
+    logit actual la diferencia de pesos de las columnas modificadas, sin
+    volver a codificar el lote; con otro modelo se vuelven a puntuar las
+    filas afectadas con score_func.
+
+    Args:
+        scored: Lote con las columnas originales y Probabilidad_Churn
+        rules: Lista de reglas (ver apply_policy_rules)
+        kernel: LinearScoringKernel del modelo (opcional)
+        score_func: Función de scoring para modelos no lineales
+
+    Returns:
+        dict con probabilidades nuevas, filas afectadas, niveles de riesgo y
+        pérdida esperada de ingresos antes y después
+    """
+    prob_before = scored["Probabilidad_Churn"].to_numpy(dtype=np.float64)
+    prob_after = prob_before.copy()
+
+    changed, affected = apply_policy_rules(scored, rules)
+    rows = np.flatnonzero(affected)
+
+    if len(rows):
+        if kernel is not None:
+            p = np.clip(prob_before[rows], 1e-15, 1 - 1e-15)
+            logit = np.log(p) - np.log1p(-p)
+            logit += logit_delta(kernel, scored, changed, rows)
+            prob_after[rows] = 1.0 / (1.0 + np.exp(-logit))
+        else:
+            subset = scored.iloc[rows].assign(
+                **{col: values.iloc[rows] for col, values in changed.items()})
+            prob_after[rows] = score_func(
+                subset)["Probabilidad_Churn"].to_numpy()
+
+    labels = RISK_LEVELS['labels']
+    tiers_before = pd.Series(classify_risk_levels(
+        prob_before)).value_counts().reindex(labels, fill_value=0)
+    tiers_after = pd.Series(classify_risk_levels(
+        prob_after)).value_counts().reindex(labels, fill_value=0)
+
+    monthly = scored["MonthlyCharges"].to_numpy(dtype=np.float64)
+    return {
+        "probabilities": prob_after,
+        "affected_rows": len(rows),
+        "tier_counts_before": tiers_before,
+        "tier_counts_after": tiers_after,
+        "expected_churn_before": float(prob_before.sum()),
+        "expected_churn_after": float(prob_after.sum()),
+        "expected_loss_before": float(prob_before @ monthly),
+        "expected_loss_after": float(prob_after @ monthly)
+    }
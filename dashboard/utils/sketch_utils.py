@@ -0,0 +1,273 @@
+"""
+Resúmenes diarios combinables del tráfico puntuado.
+
+Cada día se guarda en logs/sketches/<fecha>.npz una matriz con una fila por
+segmento ("Todos" y cada valor de SKETCH_CONFIG['segment_columns']) y una
+columna por celda:
+- numéricas y probabilidad: histograma de ancho fijo sobre su rango
+  (NUMERIC_RANGES o [0, 1]), del que se interpolan los cuantiles;
+- categóricas y nivel de riesgo: conteo por categoría.
+
+Los resúmenes de varios lotes, bloques o días se combinan sumando filas, de
+modo que cualquier ventana (7, 30, 90 días, por segmento) se responde sumando
+los días cargados en memoria sin volver a leer filas puntuadas. Cada día
+guarda también los identificadores de los lotes sumados (hash del archivo y
+versión del modelo): volver a puntuar el mismo archivo no lo cuenta dos veces.
+"""
+import hashlib
+import threading
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from config.config import FORM_OPTIONS, NUMERIC_RANGES, RISK_LEVELS, SKETCH_CONFIG
+
+ALL_SEGMENT = "Todos"
+PROBABILITY_COLUMN = "Probabilidad_Churn"
+TIER_COLUMN = "Nivel_Riesgo"
+
+_STORE_LOCK = threading.Lock()
+
+
+class SketchLayout:
+    """
+    Posición de las celdas de cada variable en el vector de un resumen.
+    """
+
+    def __init__(self, bins=None, segment_columns=None):
+        self.bins = bins or SKETCH_CONFIG['quantile_bins']
+        self.segment_columns = list(segment_columns or SKETCH_CONFIG['segment_columns'])
+        self.numeric = {PROBABILITY_COLUMN: (0.0, 1.0)}
+        self.numeric.update({col: (float(r['min']), float(r['max'])) for col, r in NUMERIC_RANGES.items()})
+        self.categorical = {col: list(values) for col, values in FORM_OPTIONS.items()}
+        self.categorical[TIER_COLUMN] = list(RISK_LEVELS['labels'])
+
+        # Numéricas: bins celdas + ausentes; categóricas: categorías + otras/ausentes
+        self.features = list(self.numeric) + list(self.categorical)
+        sizes = [self.bins + 1] * len(self.numeric) + [len(v) + 1 for v in self.categorical.values()]
+        self.offsets = dict(zip(self.features, np.concatenate([[0], np.cumsum(sizes)[:-1]])))
+        self.sizes = dict(zip(self.features, sizes))
+        self.cells = int(sum(sizes))
+        self.segments = [ALL_SEGMENT] + [f"{col}={value}" for col in self.segment_columns
+                                         for value in self.categorical[col]]
+        self._indexers = {col: pd.Index(values) for col, values in self.categorical.items()}
+
+    @property
+    def signature(self) -> str:
+        # Cambia si cambian rangos, vocabularios o segmentos: los días con otra
+        # estructura no se combinan
+        layout = repr((self.bins, self.numeric, self.categorical, self.segments))
+        return hashlib.sha256(layout.encode()).hexdigest()[:16]
+
+    def feature_cells(self, df: pd.DataFrame, feature: str) -> np.ndarray:
+        """
+        Celda (dentro de la variable) de cada fila; la última son los ausentes.
+        """
+        missing_cell = self.sizes[feature] - 1
+        if feature not in df.columns:
+            return np.full(len(df), missing_cell, dtype=np.int64)
+        values = df[feature]
+        if feature in self.numeric:
+            low, high = self.numeric[feature]
+            array = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+            with np.errstate(invalid="ignore"):
+                cells = np.clip((array - low) / (high - low) * self.bins, 0, self.bins - 1)
+            cells = np.nan_to_num(cells, nan=missing_cell).astype(np.int64)
+            return cells
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Se traducen las categorías, no las filas
+            mapping = self._indexers[feature].get_indexer(values.cat.categories)
+            mapping = np.append(np.where(mapping < 0, missing_cell, mapping), missing_cell)
+            return mapping[values.cat.codes.to_numpy()]
+        cells = self._indexers[feature].get_indexer(values)
+        cells[cells < 0] = missing_cell
+        return cells
+
+    def summarize(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Resumen de un lote: una fila por segmento y una columna por celda.
+        Los resúmenes se combinan sumándolos.
+        """
+        segment_codes, n_groups = [], []
+        for col in self.segment_columns:
+            # Los ausentes o desconocidos quedan en un grupo extra que no se guarda
+            segment_codes.append(self.feature_cells(df, col))
+            n_groups.append(self.sizes[col])
+
+        summary = np.zeros((len(self.segments), self.cells), dtype=np.int64)
+        for feature in self.features:
+            start, size = self.offsets[feature], self.sizes[feature]
+            cells = self.feature_cells(df, feature)
+            summary[0, start:start + size] = np.bincount(cells, minlength=size)
+            row = 1
+            for codes, groups in zip(segment_codes, n_groups):
+                grouped = np.bincount(codes * size + cells, minlength=groups * size)
+                summary[row:row + groups - 1, start:start + size] = grouped.reshape(groups, size)[:-1]
+                row += groups - 1
+        return summary
+
+
+class WindowSketch:
+    """
+    Resumen combinado de un segmento en una ventana de días.
+    """
+
+    def __init__(self, layout: SketchLayout, vector: np.ndarray, days: int):
+        self.layout = layout
+        self.vector = vector
+        self.days = days
+
+    def _cells(self, feature: str) -> np.ndarray:
+        start = self.layout.offsets[feature]
+        return self.vector[start:start + self.layout.sizes[feature]]
+
+    @property
+    def total(self) -> int:
+        return int(self._cells(TIER_COLUMN).sum())
+
+    def category_counts(self, feature: str) -> pd.Series:
+        cells = self._cells(feature)
+        return pd.Series(cells[:-1], index=self.layout.categorical[feature], name=feature)
+
+    def mean(self, feature: str) -> float:
+        """
+        Media aproximada con el centro de cada celda del histograma.
+        """
+        counts = self._cells(feature)[:-1]
+        if counts.sum() == 0:
+            return float("nan")
+        low, high = self.layout.numeric[feature]
+        centers = low + (np.arange(len(counts)) + 0.5) * (high - low) / self.layout.bins
+        return float(np.dot(counts, centers) / counts.sum())
+
+    def quantiles(self, feature: str, qs=(0.05, 0.25, 0.5, 0.75, 0.95)) -> pd.Series:
+        """
+        Cuantiles interpolados linealmente dentro de cada celda del histograma.
+        """
+        counts = self._cells(feature)[:-1].astype(np.float64)
+        low, high = self.layout.numeric[feature]
+        total = counts.sum()
+        if total == 0:
+            return pd.Series(np.nan, index=list(qs), name=feature)
+        cumulative = np.cumsum(counts)
+        targets = np.asarray(qs) * total
+        cell = np.minimum(np.searchsorted(cumulative, targets, side="left"), len(counts) - 1)
+        before = np.where(cell > 0, cumulative[cell - 1], 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            inside = np.nan_to_num((targets - before) / counts[cell])
+        width = (high - low) / self.layout.bins
+        return pd.Series(low + (cell + np.clip(inside, 0, 1)) * width, index=list(qs), name=feature)
+
+    def quantile_table(self, qs=(0.05, 0.25, 0.5, 0.75, 0.95)) -> pd.DataFrame:
+        table = pd.DataFrame({feature: self.quantiles(feature, qs) for feature in self.layout.numeric}).T
+        table.columns = [f"p{int(round(q * 100)):02d}" for q in qs]
+        return table
+
+
+class SketchStore:
+    """
+    Resúmenes diarios en disco, con los días ya leídos en memoria.
+    """
+
+    def __init__(self, directory=None, layout=None):
+        self.directory = Path(directory or SKETCH_CONFIG['directory'])
+        self.layout = layout or SketchLayout()
+        self._days = {}
+
+    def _path(self, day) -> Path:
+        return self.directory / f"{pd.Timestamp(day).strftime('%Y-%m-%d')}.npz"
+
+    def _read_entry(self, path: Path):
+        mtime = path.stat().st_mtime_ns
+        cached = self._days.get(path.name)
+        if cached is not None and cached[0] == mtime:
+            return cached[1], cached[2]
+        with np.load(path, allow_pickle=False) as data:
+            summary = data["summary"] if str(data["signature"]) == self.layout.signature else None
+            batches = data["batches"].tolist() if "batches" in data.files else []
+        self._days[path.name] = (mtime, summary, batches)
+        return summary, batches
+
+    def _read_day(self, path: Path):
+        return self._read_entry(path)[0]
+
+    def add(self, summary: np.ndarray, day=None, batch_id=None) -> bool:
+        """
+        Suma el resumen de un lote al del día (por defecto hoy).
+
+        Args:
+            summary: Resumen de SketchLayout.summarize
+            day: Día al que se suma
+            batch_id: Identificador del lote; si el día ya lo incluye no se suma
+
+        Returns:
+            True si se sumó, False si el lote ya estaba registrado ese día
+        """
+        path = self._path(day or date.today())
+        with _STORE_LOCK:
+            current, batches = self._read_entry(path) if path.exists() else (None, [])
+            if batch_id is not None and batch_id in batches:
+                return False
+            merged = summary if current is None else current + summary
+            batches = batches + ([batch_id] if batch_id is not None else [])
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(path.stem + ".tmp.npz")
+            np.savez_compressed(tmp_path, summary=merged, signature=np.array(self.layout.signature),
+                                batches=np.array(batches, dtype=np.str_))
+            tmp_path.replace(path)
+        return True
+
+    def add_batch(self, df: pd.DataFrame, day=None, batch_id=None) -> bool:
+        return self.add(self.layout.summarize(df), day, batch_id)
+
+    def days(self) -> list:
+        if not self.directory.exists():
+            return []
+        return sorted(pd.Timestamp(path.stem) for path in self.directory.glob("????-??-??.npz"))
+
+    def daily(self, segment=ALL_SEGMENT) -> dict:
+        """
+        Resumen de cada día registrado para un segmento.
+        """
+        row = self.layout.segments.index(segment)
+        result = {}
+        for day in self.days():
+            summary = self._read_day(self._path(day))
+            if summary is not None:
+                result[day] = WindowSketch(self.layout, summary[row], 1)
+        return result
+
+    def window(self, days: int, end=None, segment=ALL_SEGMENT) -> WindowSketch:
+        """
+        Combina los resúmenes de los últimos days días hasta end (incluido).
+
+        Args:
+            days: Longitud de la ventana en días
+            end: Último día (por defecto el más reciente registrado)
+            segment: "Todos" o "<columna>=<valor>"
+        """
+        available = self.days()
+        end = pd.Timestamp(end).normalize() if end is not None else (
+            available[-1] if available else pd.Timestamp(date.today()))
+        start = end - pd.Timedelta(days=days - 1)
+        row = self.layout.segments.index(segment)
+        vector = np.zeros(self.layout.cells, dtype=np.int64)
+        covered = 0
+        for day in available:
+            if start <= day <= end:
+                summary = self._read_day(self._path(day))
+                if summary is not None:
+                    vector += summary[row]
+                    covered += 1
+        return WindowSketch(self.layout, vector, covered)
+
+
+@st.cache_resource(show_spinner=False)
+def get_sketch_store():
+    """
+    Devuelve el almacén de resúmenes diarios compartido entre sesiones.
+    """
+    return SketchStore()
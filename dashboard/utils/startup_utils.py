@@ -0,0 +1,205 @@
+"""
+Arranque del dashboard: precarga en segundo plano de las cachés pesadas
+(modelos del registro, componentes del modelo, dataset de referencia y su
+cubo de agregados) y registro de los tiempos de importación y primer render
+de cada página.
+
+La precarga se lanza al arrancar el servidor con serve.py; con
+`streamlit run` la lanza la primera página que se ejecuta en el proceso.
+
+Resumen de tiempos por versión y página (desde la carpeta dashboard/):
+    python -m utils.startup_utils
+"""
+import importlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import streamlit as st
+
+from config.config import APP_VERSION, STARTUP_CONFIG
+
+BASE_DIR = Path(__file__).parent.parent.parent
+TIMINGS_LOG = BASE_DIR / "logs" / "startup_timings.jsonl"
+
+# Páginas ya renderizadas en este proceso: solo se registra el primer render
+_RENDERED_PAGES = set()
+_LOG_LOCK = threading.Lock()
+
+
+def append_timing(record: dict, log_path=TIMINGS_LOG):
+    """
+    Añade un registro de tiempos al log JSONL.
+    """
+    log_path = Path(log_path)
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    with _LOG_LOCK:
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(log_path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+def _timing_record(page: str, phases: dict) -> dict:
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "app_version": APP_VERSION,
+        "pid": os.getpid(),
+        "page": page,
+        "phases_ms": {phase: round(seconds * 1000, 2) for phase, seconds in phases.items()},
+        "total_ms": round(sum(phases.values()) * 1000, 2)
+    }
+
+
+class PageTimer:
+    """
+    Mide las fases de una página (importaciones y render) y registra el
+    primer render de cada página en el proceso.
+
+    Se crea al inicio del script de la página, antes de las importaciones pesadas.
+    Si la página termina con st.stop() no se registra ese render. También
+    lanza la precarga si el servidor no se arrancó con serve.py.
+    """
+
+    def __init__(self, page: str):
+        self.page = page
+        self.phases = {}
+        self._last = time.perf_counter()
+        start_prewarm()
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self._last
+        self._last = now
+
+    def finish(self):
+        self.mark("render")
+        if not STARTUP_CONFIG['log_timings'] or self.page in _RENDERED_PAGES:
+            return
+        _RENDERED_PAGES.add(self.page)
+        try:
+            append_timing(_timing_record(self.page, self.phases))
+        except OSError:
+            # El registro de tiempos nunca debe romper la página
+            pass
+
+
+def _import_plotting():
+    importlib.import_module("plotly.express")
+    importlib.import_module("plotly.graph_objects")
+
+
+def _load_model():
+    from utils.model_utils import load_model_components
+    load_model_components()
+
+
+def _load_registry():
+    from utils.registry_utils import get_model_registry
+    get_model_registry()
+
+
+def _load_dataset():
+    from utils.insights_utils import load_fallback_dataset
+    load_fallback_dataset()
+
+
+def _build_cube():
+    # Cubo de agregados del dataset de referencia que usa Insights
+    from utils.insights_utils import get_analysis_cube
+    get_analysis_cube()
+
+
+# Pasos de precarga en orden: (nombre, función)
+PREWARM_STEPS = [
+    ("plotly", _import_plotting),
+    ("registro", _load_registry),
+    ("modelo", _load_model),
+    ("dataset", _load_dataset),
+    ("cubo", _build_cube),
+]
+
+
+def prewarm_caches(steps=None) -> dict:
+    """
+    Ejecuta los pasos de precarga y registra su duración.
+
+    Returns:
+        dict paso -> segundos (los pasos fallidos no se incluyen)
+    """
+    phases = {}
+    for name, step in steps or PREWARM_STEPS:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            # La página cargará el recurso por su cuenta y mostrará el error
+            continue
+        phases[name] = time.perf_counter() - start
+
+    if STARTUP_CONFIG['log_timings']:
+        try:
+            append_timing(_timing_record("prewarm", phases))
+        except OSError:
+            pass
+    return phases
+
+
+@st.cache_resource(show_spinner=False)
+def start_prewarm():
+    """
+    Lanza la precarga en un hilo de fondo una sola vez por proceso del
+    servidor (desde serve.py antes de levantarlo, o desde la primera página).
+    """
+    if not STARTUP_CONFIG['prewarm']:
+        return None
+    thread = threading.Thread(
+        target=prewarm_caches, name="churn-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+def load_startup_timings(log_path=TIMINGS_LOG):
+    """
+    Lee el log de tiempos como DataFrame con una columna por fase.
+    """
+    import pandas as pd
+
+    log_path = Path(log_path)
+    if not log_path.exists():
+        return pd.DataFrame()
+    with open(log_path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if not records:
+        return pd.DataFrame()
+
+    df = pd.json_normalize(records)
+    df.columns = [col.removeprefix("phases_ms.") for col in df.columns]
+    return df
+
+
+def summarize_startup_timings(timings):
+    """
+    Mediana de cada fase por versión y página.
+    """
+    if timings.empty:
+        return timings
+    value_cols = [col for col in timings.columns
+                  if col not in ("timestamp", "app_version", "pid", "page")]
+    summary = timings.groupby(["app_version", "page"])[value_cols].median()
+    summary.insert(0, "renders", timings.groupby(["app_version", "page"]).size())
+    return summary.round(1)
+
+
+def main():
+    summary = summarize_startup_timings(load_startup_timings())
+    if summary.empty:
+        print(f"Sin registros en {TIMINGS_LOG}")
+        return
+    print(summary.to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Almacén compartido de lotes puntuados en formato Arrow.
+
+El análisis masivo publica cada lote una sola vez; Insights y Monitoreo lo
+leen por su ID sin volver a puntuar ni copiar los datos. El almacén es
+único por proceso (un mismo archivo subido en dos sesiones comparte la
+tabla), pero cada sesión solo ve en el selector los lotes que ha publicado
+ella, guardados en st.session_state. Las columnas
+numéricas de la vista pandas apuntan a los mismos buffers que la tabla Arrow
+(y que el DataFrame original), por lo que los lectores deben tratarla como
+de solo lectura.
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import streamlit as st
+
+from config.config import BATCH_STORE_CONFIG
+
+
+class BatchStore:
+    """
+    Conserva los últimos lotes publicados (los más antiguos se descartan).
+    """
+
+    def __init__(self, max_batches=None):
+        self.max_batches = max_batches or BATCH_STORE_CONFIG['max_batches']
+        self._batches = OrderedDict()
+        self._lock = threading.Lock()
+
+    def publish(self, df: pd.DataFrame, batch_id: str, name: str, model_version=None) -> str:
+        """
+        Publica un lote puntuado. Publicar de nuevo el mismo ID solo lo marca como reciente.
+
+        Args:
+            df: Lote con las columnas originales y el resultado de scoring
+            batch_id: Identificador del lote (p. ej. la clave de caché del resultado)
+            name: Nombre visible (archivo de origen)
+            model_version: Versión del modelo que lo puntuó
+
+        Returns:
+            ID del lote
+        """
+        with self._lock:
+            if batch_id in self._batches:
+                self._batches.move_to_end(batch_id)
+                return batch_id
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if "Churn" not in table.column_names and "Prediccion" in table.column_names:
+            # Las vistas de análisis esperan Churn; se deriva de la predicción
+            churn = pc.if_else(pc.equal(table["Prediccion"], 1), "Yes", "No")
+            table = table.append_column("Churn", pc.dictionary_encode(churn))
+
+        entry = {
+            "table": table,
+            "frame": None,
+            "name": name,
+            "rows": table.num_rows,
+            "model_version": model_version,
+            "created_at": datetime.now(timezone.utc)
+        }
+        with self._lock:
+            self._batches[batch_id] = entry
+            while len(self._batches) > self.max_batches:
+                self._batches.popitem(last=False)
+        return batch_id
+
+    def __contains__(self, batch_id) -> bool:
+        return batch_id in self._batches
+
+    def get_table(self, batch_id: str) -> pa.Table:
+        return self._batches[batch_id]["table"]
+
+    def get_frame(self, batch_id: str) -> pd.DataFrame:
+        """
+        Devuelve la vista pandas del lote, creada una sola vez por lote.
+
+        Las columnas numéricas sin nulos se comparten con la tabla Arrow sin
+        copia; las de diccionario pasan a Categorical.
+        """
+        entry = self._batches[batch_id]
+        if entry["frame"] is None:
+            entry["frame"] = entry["table"].to_pandas(split_blocks=True)
+        return entry["frame"]
+
+    def get_derived(self, batch_id: str, name: str, builder):
+        """
+        Devuelve un resultado derivado del lote (p. ej. agregados), calculado
+        una sola vez con builder(vista pandas) y guardado junto al lote.
+        """
+        entry = self._batches[batch_id]
+        derived = entry.setdefault("derived", {})
+        if name not in derived:
+            derived[name] = builder(self.get_frame(batch_id))
+        return derived[name]
+
+    def list_batches(self, batch_ids=None) -> list:
+        """
+        Metadatos de los lotes disponibles, del más reciente al más antiguo.
+
+        Args:
+            batch_ids: Si se indica, solo se listan estos lotes (los descartados se omiten)
+        """
+        with self._lock:
+            items = list(self._batches.items())
+        if batch_ids is not None:
+            batch_ids = set(batch_ids)
+            items = [item for item in items if item[0] in batch_ids]
+        return [{"batch_id": batch_id, "name": entry["name"], "rows": entry["rows"],
+                 "model_version": entry["model_version"], "created_at": entry["created_at"]}
+                for batch_id, entry in reversed(items)]
+
+
+@st.cache_resource(show_spinner=False)
+def get_batch_store():
+    """
+    Devuelve el almacén de lotes del proceso, compartido entre páginas y sesiones.
+    """
+    return BatchStore()
+
+
+def publish_session_batch(df: pd.DataFrame, batch_id: str, name: str, model_version=None) -> str:
+    """
+    Publica un lote en el almacén y lo registra en la sesión actual, que pasa
+    a verlo en select_batch y a tenerlo como lote activo.
+
+    Returns:
+        ID del lote
+    """
+    batch_id = get_batch_store().publish(df, batch_id, name, model_version)
+    session_batches = st.session_state.setdefault("session_batches", [])
+    if batch_id not in session_batches:
+        session_batches.append(batch_id)
+    st.session_state["batch_id"] = batch_id
+    return batch_id
+
+
+def select_batch(label="Lote de clientes", allow_reference=True):
+    """
+    Selector de lote en la barra lateral con los lotes publicados en la
+    sesión. Por defecto propone el último.
+
+    Returns:
+        ID del lote elegido o None para el dataset de referencia
+    """
+    batches = get_batch_store().list_batches(st.session_state.get("session_batches", []))
+    options = ([None] if allow_reference else []) + \
+        [batch["batch_id"] for batch in batches]
+    if not options:
+        return None
+
+    labels = {batch["batch_id"]: f"{batch['name']} · {batch['rows']:,} filas · "
+              f"{batch['created_at']:%H:%M}" for batch in batches}
+    labels[None] = "Dataset de referencia"
+
+    current = st.session_state.get("batch_id")
+    index = options.index(current) if current in options else 0
+    with st.sidebar:
+        return st.selectbox(label, options, index=index,
+                            format_func=lambda batch_id: labels[batch_id])
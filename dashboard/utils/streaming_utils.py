@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+from config.config import RISK_LEVELS, STREAMING_CONFIG
+from utils.export_utils import ExportWriter
+from utils.ingestion_utils import iter_upload_chunks
+from utils.validation_utils import split_valid_rows
+
+
+class RunningAggregates:
+    """
+    Agregados del análisis masivo que se actualizan bloque a bloque, de modo
+    que la memoria no depende del tamaño del archivo.
+    """
+
+    def __init__(self, top_n=None, reference_profile=None, sketch_layout=None):
+        self.top_n = STREAMING_CONFIG['top_n'] if top_n is None else top_n
+        self.reference_profile = reference_profile
+        self.drift_counts = None if reference_profile is None \
+            else np.zeros_like(reference_profile.counts)
+        self.sketch_layout = sketch_layout
+        self.sketch = None if sketch_layout is None \
+            else np.zeros((len(sketch_layout.segments), sketch_layout.cells), dtype=np.int64)
+        self.total = 0
+        self.tier_counts = np.zeros(len(RISK_LEVELS['labels']), dtype=np.int64)
+        self.top_clients = None
+        self.rejected = 0
+        self.reason_counts = pd.Series(dtype=np.int64, name="Filas")
+
+    def update(self, chunk_results: pd.DataFrame):
+        """
+        Incorpora un bloque de resultados a los agregados.
+        """
+        self.total += len(chunk_results)
+
+        codes = pd.Categorical(
+            chunk_results["Nivel_Riesgo"], categories=RISK_LEVELS['labels']).codes
+        self.tier_counts += np.bincount(codes[codes >= 0],
+                                        minlength=len(self.tier_counts))
+
+        if self.reference_profile is not None:
+            # Histogramas del lote para el drift: se suman bloque a bloque
+            self.drift_counts += self.reference_profile.batch_counts(chunk_results)
+        if self.sketch_layout is not None:
+            self.sketch += self.sketch_layout.summarize(chunk_results)
+
+        chunk_top = chunk_results.nlargest(self.top_n, "Probabilidad_Churn")
+        if self.top_clients is not None:
+            chunk_top = pd.concat([self.top_clients, chunk_top]).nlargest(
+                self.top_n, "Probabilidad_Churn")
+        self.top_clients = chunk_top
+
+    def add_rejections(self, validation):
+        """
+        Suma las filas rechazadas por la validación de un bloque.
+        """
+        self.rejected += validation.rejected
+        if validation.rejected:
+            self.reason_counts = self.reason_counts.add(
+                validation.reason_counts(), fill_value=0).astype(np.int64)
+
+    def tier_series(self) -> pd.Series:
+        """
+        Devuelve el conteo por nivel de riesgo como Series.
+        """
+        return pd.Series(self.tier_counts, index=RISK_LEVELS['labels'])
+
+
+def stream_score_csv(source, score_func, required_cols, output_path, chunk_size=None,
+                     progress_callback=None, output_format="csv", name=None,
+                     quarantine_path=None, reference_profile=None,
+                     sketch_layout=None) -> RunningAggregates:
+    """
+    Lee, valida, puntúa y agrega un archivo (CSV, Parquet o Feather) por bloques.
+
+    Las filas que no superan la validación no se puntúan: se escriben en
+    quarantine_path (CSV, solo si hay alguna) con su código y sus motivos.
+
+    Args:
+        source: Ruta o archivo abierto
+        score_func: Función que recibe un bloque y devuelve el resultado de scoring
+        required_cols: Columnas que debe tener el archivo
+        output_path: Ruta del archivo de resultados, escrito de forma incremental
+        chunk_size: Filas por bloque (por defecto STREAMING_CONFIG)
+        progress_callback: Función (fracción leída, filas procesadas)
+        output_format: Formato del archivo de resultados (ver EXPORT_FORMATS)
+        name: Nombre del archivo de entrada, para detectar su formato
+        quarantine_path: Ruta del CSV de filas rechazadas (None = no se validan las filas)
+        reference_profile: Perfil de referencia para acumular los histogramas de drift
+        sketch_layout: Estructura de los resúmenes diarios a acumular (ver sketch_utils)
+
+    Returns:
+        RunningAggregates con el resumen del archivo completo
+    """
+    chunk_size = STREAMING_CONFIG['chunk_size'] if chunk_size is None else chunk_size
+    total_bytes = getattr(source, "size", None)
+    aggregates = RunningAggregates(reference_profile=reference_profile,
+                                   sketch_layout=sketch_layout)
+
+    # Las columnas requeridas se comprueban en la cabecera, antes del primer bloque
+    reader = iter_upload_chunks(source, required_cols, chunk_size, name=name)
+    quarantine = ExportWriter(quarantine_path, "csv") if quarantine_path else None
+    try:
+        with ExportWriter(output_path, output_format) as writer:
+            for i, chunk in enumerate(reader):
+                if quarantine is not None:
+                    chunk, rejected, validation = split_valid_rows(chunk, required_cols)
+                    if len(rejected):
+                        quarantine.write(rejected)
+                    aggregates.add_rejections(validation)
+
+                if not chunk.empty:
+                    scores = score_func(chunk)
+                    if scores is None:
+                        raise ValueError(f"No se pudo puntuar el bloque {i + 1}")
+
+                    chunk_results = chunk.assign(
+                        **{col: scores[col].values for col in scores.columns})
+                    writer.write(chunk_results)
+                    aggregates.update(chunk_results)
+
+                if progress_callback is not None:
+                    fraction = source.tell() / total_bytes if total_bytes else 0.0
+                    progress_callback(min(fraction, 1.0), aggregates.total)
+    finally:
+        if quarantine is not None:
+            quarantine.close()
+
+    if aggregates.total == 0:
+        raise ValueError("Ninguna fila superó la validación" if aggregates.rejected
+                         else "El archivo no contiene clientes")
+
+    return aggregates
@@ -50,11 +50,11 @@ reverse_value_translation = {v: k for k, v in value_translation.items()}
 
 def translate_dataframe(df):
     """
-    Devuelve una copia traducida de las columnas para mostrar en UI.
+    Devuelve el DataFrame con las columnas traducidas para mostrar en UI.
+
+    Los datos se comparten con el original (no se copian).
     """
-    df_copy = df.copy()
-    df_copy.rename(columns=translation_dict, inplace=True)
-    return df_copy
+    return df.rename(columns=translation_dict, copy=False)
 
 
 def translate_features(features):
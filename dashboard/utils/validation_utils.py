@@ -0,0 +1,173 @@
+"""
+Validación vectorizada de filas contra los dominios de FORM_OPTIONS y los
+rangos de NUMERIC_RANGES.
+
+Cada regla (columna, motivo) ocupa un bit de una máscara uint64 por fila: una
+pasada por columna marca todos los motivos de rechazo y el coste es lineal en
+el número de filas. Las filas válidas se puntúan y las rechazadas se escriben,
+con su código y sus motivos, en un archivo de cuarentena.
+"""
+import numpy as np
+import pandas as pd
+
+from config.config import FORM_OPTIONS, NUMERIC_RANGES
+
+REASON_MISSING = "VALOR_AUSENTE"
+REASON_UNKNOWN = "CATEGORIA_DESCONOCIDA"
+REASON_NOT_NUMERIC = "NO_NUMERICO"
+REASON_OUT_OF_RANGE = "FUERA_DE_RANGO"
+
+CODE_COLUMN = "Codigo_Rechazo"
+REASON_COLUMN = "Motivo_Rechazo"
+
+
+def build_rules(columns) -> list:
+    """
+    Reglas (columna, motivo) de las columnas con dominio o rango configurado.
+    La posición de cada regla es su bit en la máscara de rechazo.
+    """
+    rules = []
+    for col in columns:
+        if col in FORM_OPTIONS:
+            rules += [(col, REASON_MISSING), (col, REASON_UNKNOWN)]
+        elif col in NUMERIC_RANGES:
+            rules += [(col, REASON_MISSING), (col, REASON_NOT_NUMERIC), (col, REASON_OUT_OF_RANGE)]
+    if len(rules) > 64:
+        raise ValueError(f"Demasiadas reglas de validación para una máscara de 64 bits: {len(rules)}")
+    return rules
+
+
+def _domain_flags(values: pd.Series, domain: list):
+    """
+    Marca valores ausentes y fuera del dominio de una columna categórica.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Se evalúan las categorías, no las filas, y se propagan por código
+        codes = values.cat.codes.to_numpy()
+        allowed = np.append(values.cat.categories.isin(domain), True)
+        missing = codes < 0
+        return missing, ~allowed[codes]
+    missing = values.isna().to_numpy()
+    return missing, ~missing & ~values.isin(domain).to_numpy()
+
+
+def _numeric_flags(values: pd.Series, low, high):
+    """
+    Marca valores ausentes, no numéricos y fuera de rango de una columna numérica.
+    """
+    missing = values.isna().to_numpy()
+    if values.dtype == object:
+        # Los textos en blanco cuentan como ausentes, no como no numéricos
+        missing |= values.astype(str).str.strip().eq("").to_numpy()
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        array = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    else:
+        array = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    invalid = np.isnan(array)
+    with np.errstate(invalid="ignore"):
+        out_of_range = ~invalid & ((array < low) | (array > high))
+    return missing, invalid & ~missing, out_of_range
+
+
+class ValidationResult:
+    """
+    Máscara de rechazo por fila (0 = fila válida) y las reglas de cada bit.
+    """
+
+    def __init__(self, rules: list, mask: np.ndarray):
+        self.rules = rules
+        self.mask = mask
+
+    @property
+    def valid(self) -> np.ndarray:
+        return self.mask == 0
+
+    @property
+    def rejected(self) -> int:
+        return int(np.count_nonzero(self.mask))
+
+    def _labels(self) -> list:
+        return [f"{col}:{reason}" for col, reason in self.rules]
+
+    def reason_counts(self) -> pd.Series:
+        """
+        Filas rechazadas por cada regla (una fila puede sumar en varias).
+        """
+        mask = self.mask[self.mask != 0]
+        counts = [int(np.count_nonzero((mask >> np.uint64(bit)) & np.uint64(1)))
+                  for bit in range(len(self.rules))]
+        counts = pd.Series(counts, index=self._labels(), dtype=np.int64, name="Filas")
+        return counts[counts > 0].sort_values(ascending=False)
+
+    def describe(self, mask: np.ndarray) -> np.ndarray:
+        """
+        Motivos legibles de cada máscara, separados por "; ".
+        """
+        reasons = np.full(len(mask), "", dtype=object)
+        for bit, label in enumerate(self._labels()):
+            hit = ((mask >> np.uint64(bit)) & np.uint64(1)).astype(bool)
+            if hit.any():
+                reasons[hit] = reasons[hit] + label + "; "
+        return np.array([reason[:-2] for reason in reasons], dtype=object)
+
+
+def validate_rows(df: pd.DataFrame, columns=None) -> ValidationResult:
+    """
+    Valida todas las filas en una pasada por columna.
+
+    Args:
+        df: Datos de entrada
+        columns: Columnas a validar (por defecto todas las configuradas presentes)
+
+    Returns:
+        ValidationResult
+    """
+    columns = [col for col in (columns or df.columns) if col in df.columns]
+    rules = build_rules(columns)
+    mask = np.zeros(len(df), dtype=np.uint64)
+
+    flags = {}
+    for col in columns:
+        if col in FORM_OPTIONS:
+            missing, unknown = _domain_flags(df[col], FORM_OPTIONS[col])
+            flags[(col, REASON_MISSING)], flags[(col, REASON_UNKNOWN)] = missing, unknown
+        elif col in NUMERIC_RANGES:
+            bounds = NUMERIC_RANGES[col]
+            missing, not_numeric, out_of_range = _numeric_flags(df[col], bounds['min'], bounds['max'])
+            flags[(col, REASON_MISSING)] = missing
+            flags[(col, REASON_NOT_NUMERIC)] = not_numeric
+            flags[(col, REASON_OUT_OF_RANGE)] = out_of_range
+
+    for bit, rule in enumerate(rules):
+        mask |= flags[rule].astype(np.uint64) << np.uint64(bit)
+    return ValidationResult(rules, mask)
+
+
+def split_valid_rows(df: pd.DataFrame, columns=None):
+    """
+    Separa las filas válidas de las rechazadas.
+
+    Returns:
+        tuple: (filas válidas, filas rechazadas con CODE_COLUMN y REASON_COLUMN,
+        ValidationResult)
+    """
+    result = validate_rows(df, columns)
+    valid = result.valid
+    if valid.all():
+        accepted = df
+        rejected = df.iloc[:0].assign(**{CODE_COLUMN: np.uint64(0), REASON_COLUMN: ""})
+    else:
+        rejected_mask = result.mask[~valid]
+        rejected = df[~valid].assign(**{
+            CODE_COLUMN: rejected_mask,
+            REASON_COLUMN: result.describe(rejected_mask)
+        })
+        accepted = df[valid]
+
+    # Numéricas leídas como texto por algún valor inválido: en las filas
+    # válidas ya se pueden convertir
+    text_numeric = [col for col in accepted.columns
+                    if col in NUMERIC_RANGES and accepted[col].dtype == object]
+    if text_numeric:
+        accepted = accepted.assign(**{col: pd.to_numeric(accepted[col]) for col in text_numeric})
+    return accepted, rejected, result